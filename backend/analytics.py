@@ -0,0 +1,261 @@
+"""
+Analytics aggregation queries and result cache
+Totals are computed in SQL (or read from monthly_rollups) so only
+aggregate rows reach Python. Monthly results are cached per (user, month)
+and dropped when a committed write touches that user/month.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from cache import LRUCache
+from classifier import taxonomy_store
+from models import MonthlyRollup, Transaction
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("FINORA_ANALYTICS_CACHE_SIZE", "4096"))
+
+
+def month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """
+    Calendar month range [start, end) for "YYYY-MM"
+
+    Raises:
+        ValueError: if month is not in YYYY-MM format
+    """
+    start_date = datetime.strptime(f"{month}-01", "%Y-%m-%d")
+    if start_date.month == 12:
+        return start_date, start_date.replace(year=start_date.year + 1, month=1)
+    return start_date, start_date.replace(month=start_date.month + 1)
+
+
+def monthly_totals(
+    db: Session,
+    user_id: int,
+    start_date: datetime,
+    end_date: datetime
+) -> Tuple[float, float, Dict[str, float]]:
+    """
+    Aggregate a user's transactions in [start_date, end_date)
+
+    One GROUP BY (transaction_type, category_name) query; the result size
+    depends on the number of categories, not transactions.
+
+    Returns:
+        (total_income, total_spent, spending_by_category) where
+        spending_by_category only covers expenses
+    """
+    rows = db.query(
+        Transaction.transaction_type,
+        Transaction.category_name,
+        func.sum(Transaction.amount)
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= start_date,
+        Transaction.date < end_date
+    ).group_by(
+        Transaction.transaction_type,
+        Transaction.category_name
+    ).all()
+
+    total_income = 0.0
+    total_spent = 0.0
+    spending_by_category = {}
+    for transaction_type, category, amount in rows:
+        if transaction_type == "income":
+            total_income += amount
+        elif transaction_type == "expense":
+            total_spent += amount
+            spending_by_category[category] = amount
+
+    return total_income, total_spent, spending_by_category
+
+
+def monthly_totals_from_rollups(
+    db: Session,
+    user_id: int,
+    month: str
+) -> Tuple[float, float, Dict[str, float]]:
+    """
+    Same result as monthly_totals for a calendar month, read from the
+    pre-aggregated monthly_rollups rows (no transaction scan)
+    """
+    rows = db.query(
+        MonthlyRollup.transaction_type,
+        MonthlyRollup.category_name,
+        MonthlyRollup.total
+    ).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.month == month
+    ).all()
+
+    total_income = 0.0
+    total_spent = 0.0
+    spending_by_category = {}
+    for transaction_type, category, amount in rows:
+        if transaction_type == "income":
+            total_income += amount
+        elif transaction_type == "expense":
+            total_spent += amount
+            spending_by_category[category] = amount
+
+    return total_income, total_spent, spending_by_category
+
+
+
+# ==================== TRENDS ====================
+
+def month_range(start_month: str, end_month: str) -> List[str]:
+    """
+    All months from start_month to end_month inclusive ("YYYY-MM")
+
+    Raises:
+        ValueError: on malformed months
+    """
+    start, _ = month_bounds(start_month)
+    end, _ = month_bounds(end_month)
+    first = start.year * 12 + start.month - 1
+    last = end.year * 12 + end.month - 1
+    return [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in range(first, last + 1)]
+
+
+def month_over_month(series: List[float]) -> List[Optional[float]]:
+    """Difference from the previous month (None for the first month)"""
+    return [None] + [round(b - a, 2) for a, b in zip(series, series[1:])]
+
+
+def moving_average(series: List[float], window: int) -> List[float]:
+    """Trailing moving average over up to `window` months, via prefix sums"""
+    sums = [0.0, *accumulate(series)]
+    return [
+        round((sums[i] - sums[max(0, i - window)]) / min(window, i), 2)
+        for i in range(1, len(sums))
+    ]
+
+
+def trend_series(db: Session, user_id: int, months: List[str]) -> Tuple[List[float], List[float], Dict[str, List[float]]]:
+    """
+    Dense income/spend/per-category series for consecutive months
+
+    One grouped query over monthly_rollups for the whole range; months
+    without rows are zero.
+    """
+    position = {month: i for i, month in enumerate(months)}
+    income = [0.0] * len(months)
+    spend = [0.0] * len(months)
+    categories = defaultdict(lambda: [0.0] * len(months))
+
+    rows = db.query(
+        MonthlyRollup.month,
+        MonthlyRollup.transaction_type,
+        MonthlyRollup.category_name,
+        func.sum(MonthlyRollup.total)
+    ).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.month >= months[0],
+        MonthlyRollup.month <= months[-1]
+    ).group_by(
+        MonthlyRollup.month,
+        MonthlyRollup.transaction_type,
+        MonthlyRollup.category_name
+    )
+
+    for month, transaction_type, category, amount in rows:
+        i = position[month]
+        if transaction_type == "income":
+            income[i] += amount
+        elif transaction_type == "expense":
+            spend[i] += amount
+            categories[category][i] += amount
+
+    return income, spend, dict(categories)
+
+
+# ==================== RESULT CACHE ====================
+
+class AnalyticsCache:
+    """
+    (user_id, month) -> (etag, payload) with write-driven invalidation
+
+    Each user has a generation counter bumped on invalidation; a result is
+    only stored if the generation is unchanged since it started computing,
+    so a slow read racing a write can't cache pre-write numbers. The cache
+    is per process and only sees commits made in this process: with several
+    workers, one that cached a month keeps serving that payload (and
+    answering 304s for its ETag) after another worker writes to it, until
+    the entry is evicted or a write to that month goes through this worker.
+    """
+
+    def __init__(self, maxsize: int):
+        self.entries = LRUCache(maxsize)
+        self._generations = defaultdict(int)
+        self._epoch = 0  # Bumped by clear(), so it covers every user
+        self._lock = threading.Lock()
+        self.invalidations = 0
+        self.clears = 0
+
+    def generation(self, user_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._generations[user_id]
+
+    def get(self, user_id: int, month: str) -> Optional[Tuple[str, Dict]]:
+        return self.entries.get((user_id, month))
+
+    def put(self, user_id: int, month: str, value: Tuple[str, Dict], generation: Tuple[int, int]):
+        with self._lock:
+            if (self._epoch, self._generations[user_id]) != generation:
+                return
+            self.entries.set((user_id, month), value)
+
+    def invalidate(self, keys: Iterable[Tuple[int, str]]):
+        with self._lock:
+            for user_id, month in keys:
+                self._generations[user_id] += 1
+                self.entries.pop((user_id, month))
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry, e.g. when a new taxonomy changes category emoji and colors"""
+        with self._lock:
+            self._epoch += 1
+            self.entries.clear()
+            self.clears += 1
+
+    def stats(self) -> Dict:
+        return {**self.entries.stats(), "invalidations": self.invalidations, "clears": self.clears}
+
+
+analytics_cache = AnalyticsCache(ANALYTICS_CACHE_SIZE)
+# Payloads embed category emoji and colors, so a new taxonomy makes them all stale
+taxonomy_store.subscribe(lambda taxonomy: analytics_cache.clear())
+
+
+def compute_etag(payload: Dict) -> str:
+    """Strong ETag for a JSON-serialisable payload"""
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+def mark_analytics_stale(db: Session, keys: Iterable[Tuple[int, str]]):
+    """Invalidate cached analytics for (user_id, month) keys once db commits"""
+    db.info.setdefault("stale_analytics", set()).update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    keys = session.info.pop("stale_analytics", None)
+    if keys:
+        analytics_cache.invalidate(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop("stale_analytics", None)
@@ -0,0 +1,91 @@
+"""
+Shared helpers for the backend benchmark scripts
+Each benchmark runs against a throwaway SQLite file, never ./finora.db
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+MERCHANTS = [
+    ("TESCO STORES {n}", "expense"), ("SAINSBURYS SUPERMARKET {n}", "expense"),
+    ("UBER *TRIP {n}", "expense"), ("NETFLIX.COM", "expense"), ("SPOTIFY P{n}", "expense"),
+    ("AMAZON MKTPLACE {n}", "expense"), ("PURE GYM LTD", "expense"), ("COSTA COFFEE {n}", "expense"),
+    ("PIZZA EXPRESS {n}", "expense"), ("SHELL GAS STATION {n}", "expense"), ("BRITISH GAS", "expense"),
+    ("THAMES WATER", "expense"), ("LANDLORD RENT OCT", "expense"), ("AIRBNB * HM{n}", "expense"),
+    ("VUE CINEMA {n}", "expense"), ("ZARA CLOTHING", "expense"), ("SALARY ACME LTD", "income"),
+    ("CARD PAYMENT {n}", "expense"), ("TFL TRAVEL CHARGE", "expense"), ("EE PHONE BILL", "expense"),
+]
+
+
+def use_temp_database() -> str:
+    """Point models.py at a fresh temporary SQLite file (call before importing models)"""
+    path = os.path.join(tempfile.mkdtemp(prefix="finora-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+def random_description(rng: random.Random) -> tuple:
+    """Return a (description, transaction_type) pair that looks like a bank feed line"""
+    template, transaction_type = rng.choice(MERCHANTS)
+    return template.format(n=rng.randint(1000, 9999)), transaction_type
+
+
+def generate_transactions(user_id: int, count: int, account_id: int = 1, months: int = 24, seed: int = 7):
+    """Yield transaction rows (dicts) spread over the last `months` months"""
+    rng = random.Random(seed + user_id)
+    end = datetime(2025, 10, 31)
+    span = timedelta(days=30 * months).total_seconds()
+    now = datetime.utcnow()
+    for _ in range(count):
+        description, transaction_type = random_description(rng)
+        yield {
+            "user_id": user_id,
+            "account_id": account_id,
+            "amount": round(rng.uniform(1, 250), 2),
+            "description": description,
+            "category_name": rng.choice(["Groceries", "Dining", "Transportation", "Bills", "Shopping"]),
+            "transaction_type": transaction_type,
+            "date": end - timedelta(seconds=rng.uniform(0, span)),
+            "created_at": now,
+        }
+
+
+def seed_transactions(engine, rows, batch_size: int = 50_000):
+    """Insert rows with executemany in large batches"""
+    from models import Transaction
+
+    batch = []
+    with engine.begin() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.execute(Transaction.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Transaction.__table__.insert(), batch)
+
+
+def measure(fn, repeat: int = 5) -> dict:
+    """Run fn `repeat` times and return median/min latency in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
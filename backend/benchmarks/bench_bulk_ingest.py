@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N single POST /transactions calls vs one POST /transactions/bulk
+
+Runs the FastAPI app in-process (TestClient) against a scratch database.
+
+    python benchmarks/bench_bulk_ingest.py --rows 2000
+"""
+
+import argparse
+import random
+import time
+
+from _common import use_temp_database, random_description
+
+use_temp_database()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+
+def make_rows(count, account_id, seed):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        description, transaction_type = random_description(rng)
+        rows.append({
+            "account_id": account_id,
+            "amount": round(rng.uniform(1, 250), 2),
+            "description": description,
+            "category_name": "",
+            "transaction_type": transaction_type,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    user_id = client.post("/users", json={"username": "bench", "email": "bench@example.com"}).json()["id"]
+    account_id = client.post(
+        f"/users/{user_id}/accounts",
+        json={"name": "Checking", "account_type": "Checking", "balance": 0}
+    ).json()["id"]
+
+    rows = make_rows(args.rows, account_id, seed=1)
+    start = time.perf_counter()
+    for row in rows:
+        response = client.post(f"/transactions?user_id={user_id}", json=row)
+        assert response.status_code == 200, response.text
+    single_s = time.perf_counter() - start
+
+    rows = make_rows(args.rows, account_id, seed=2)
+    start = time.perf_counter()
+    response = client.post(f"/transactions/bulk?user_id={user_id}", json={"transactions": rows})
+    bulk_s = time.perf_counter() - start
+    assert response.status_code == 200 and response.json()["created"] == args.rows, response.text
+
+    print(f"{args.rows:,} rows")
+    print(f"  single POSTs: {single_s:8.3f} s  ({args.rows / single_s:10,.0f} rows/s)")
+    print(f"  bulk POST:    {bulk_s:8.3f} s  ({args.rows / bulk_s:10,.0f} rows/s)")
+    print(f"  speedup:      {single_s / bulk_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled per-user rules vs trying each rule in order
+
+Builds rule sets of growing size (mostly plain-text patterns, some true
+regexes, amount ranges and account rules), checks that CompiledRules picks
+the same rule as a naive first-match loop, and times both per transaction.
+
+    python benchmarks/bench_category_rules.py --transactions 20000
+"""
+
+import argparse
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from _common import random_description
+
+from category_rules import CompiledRules
+
+CATEGORIES = ["Groceries", "Dining", "Transportation", "Bills", "Shopping", "Entertainment"]
+REGEXES = [r"^uber\b", r"gym|fitness", r"\bp\d{4}\b", r"card payment \d+", r"^(tesco|sainsburys)"]
+
+
+def make_rules(count, seed):
+    rng = random.Random(seed)
+    rules = []
+    for rule_id in range(1, count + 1):
+        kind = rng.random()
+        if kind < 0.8:
+            pattern = f"merchant{rule_id}" if rng.random() < 0.9 else random_description(rng)[0].split()[0].lower()
+        elif kind < 0.9:
+            pattern = rng.choice(REGEXES)
+        else:
+            pattern = None
+        low = rng.choice([None, None, round(rng.uniform(0, 100), 2)])
+        rules.append(SimpleNamespace(
+            id=rule_id,
+            priority=rng.randint(1, 200),
+            description_pattern=pattern,
+            min_amount=low,
+            max_amount=low + 50 if low is not None else None,
+            account_id=rng.choice([None, None, None, 1, 2]),
+            category_name=rng.choice(CATEGORIES),
+        ))
+    return rules
+
+
+def naive_match(rules, description, amount, account_id):
+    for rule in sorted(rules, key=lambda r: (r.priority, r.id)):
+        if rule.account_id is not None and rule.account_id != account_id:
+            continue
+        if rule.min_amount is not None and amount < rule.min_amount:
+            continue
+        if rule.max_amount is not None and amount > rule.max_amount:
+            continue
+        if rule.description_pattern and not re.search(rule.description_pattern, description, re.IGNORECASE):
+            continue
+        return rule.category_name
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    transactions = [
+        (random_description(rng)[0], round(rng.uniform(1, 250), 2), rng.choice([1, 2, 3]))
+        for _ in range(args.transactions)
+    ]
+
+    print(f"{'rules':>6} {'naive µs/tx':>12} {'compiled µs/tx':>15} {'speedup':>8}")
+    for count in (10, 100, 300, 1000):
+        rules = make_rules(count, seed=count)
+        compiled = CompiledRules(rules)
+        sample = transactions[:2000]
+        expected = [naive_match(rules, d, a, acc) for d, a, acc in sample]
+        assert [compiled.category_for(d, a, acc) for d, a, acc in sample] == expected
+        for description, amount, account_id in transactions:  # Warm the per-bucket caches
+            compiled.category_for(description, amount, account_id)
+
+        start = time.perf_counter()
+        for description, amount, account_id in sample:
+            naive_match(rules, description, amount, account_id)
+        naive_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        for description, amount, account_id in transactions:
+            compiled.category_for(description, amount, account_id)
+        compiled_us = (time.perf_counter() - start) / len(transactions) * 1e6
+        print(f"{count:>6} {naive_us:>12.1f} {compiled_us:>15.1f} {naive_us / compiled_us:>7.1f}x")
+
+    print("\n✅ Compiled rules agree with the first-match loop")
+
+
+if __name__ == "__main__":
+    main()
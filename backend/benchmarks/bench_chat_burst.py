@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Load test: bursts of identical chat questions with and without single-flight
+
+Simulates the traffic after a push notification: --bursts times, --users
+new users all ask about the same topic at once (phrased a few ways), through
+FinoraChat against benchmarks/mock_hf_server.py. Each burst is about a new
+topic, so it starts on a cold cache. Compares upstream calls and latency with
+the response cache alone (every concurrent miss calls upstream) against the
+cache with in-flight coalescing, and checks every user got the reply in their
+own history.
+
+    python benchmarks/bench_chat_burst.py --users 500 --bursts 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from _common import percentile
+from mock_hf_server import start_mock_server
+
+TOPICS = [
+    "the new energy price cap", "this month's interest rate cut", "the council tax rise",
+    "the change to student loan repayments", "the new ISA allowance",
+]
+PHRASINGS = ["what does {} mean for me", "What does {} mean for me?", "hi, what does {} mean for me??"]
+
+
+async def burst(chat, topic, users, first_user):
+    latencies = []
+
+    async def ask(user_id):
+        start = time.perf_counter()
+        await chat.get_response(str(user_id), PHRASINGS[user_id % len(PHRASINGS)].format(topic))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(ask(first_user + i) for i in range(users)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--bursts", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency_ms=args.latency_ms, per_item_ms=0)
+    os.environ["HF_CHAT_URL"] = server.url
+    os.environ["HUGGINGFACE_API_KEY"] = "bench"
+
+    import chatbot_enhanced
+    from chatbot_enhanced import (
+        FinoraChat, ResponseCache, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL
+    )
+    from chat_client import chat_upstream, MAX_CONCURRENCY
+
+    class CacheOnly(ResponseCache):
+        """The response cache without coalescing: every concurrent miss calls upstream"""
+
+        async def get_or_fetch(self, key, fetch):
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            self.fetches += 1
+            return await self._fetch_and_store(key, fetch)
+
+    print(f"{args.bursts} bursts of {args.users} users asking at once, upstream latency {args.latency_ms:.0f} ms, "
+          f"pool size {MAX_CONCURRENCY}\n")
+    print(f"{'':>14} {'upstream':>9} {'coalesced':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+    async def compare():
+        results = {}
+        for label, cache_class in (("cache only", CacheOnly), ("single-flight", ResponseCache)):
+            cache = cache_class(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+            chatbot_enhanced.response_cache = cache
+            chat = FinoraChat()
+            before = server.requests
+            latencies = []
+            for i in range(args.bursts):
+                latencies += await burst(chat, TOPICS[i % len(TOPICS)], args.users, i * args.users)
+            calls = server.requests - before
+
+            replies = {chat.get_conversation_history(str(u))[-1]["content"] for u in range(args.bursts * args.users)}
+            assert all(len(chat.get_conversation_history(str(u))) == 2 for u in range(args.bursts * args.users))
+            assert len(replies) == 1 and cache.stats()["in_flight"] == 0, replies
+
+            results[label] = calls
+            print(f"{label:>14} {calls:>9} {cache.coalesced:>10} {statistics.median(latencies):>8.0f} "
+                  f"{percentile(latencies, 99):>8.0f} {max(latencies):>8.0f}")
+        await chat_upstream.close()
+        return results
+
+    results = asyncio.run(compare())
+    print(f"\n✅ every user got the reply in their own history")
+    print(f"Upstream calls {results['cache only']} -> {results['single-flight']} "
+          f"({results['cache only'] / results['single-flight']:.0f}x fewer)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
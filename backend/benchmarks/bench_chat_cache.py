@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chat replies with and without the response cache
+
+Starts benchmarks/mock_hf_server.py as the text-generation upstream and
+sends --messages opening messages, each from a new user, drawn from a few
+intents phrased many ways (Zipf-weighted, some users sending a spending
+context), through --concurrency workers. Compares latency, upstream
+requests and the cache hit ratio. Also checks that failed upstream calls
+are not cached and that users with different contexts don't share replies.
+
+    python benchmarks/bench_chat_cache.py --messages 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from _common import percentile
+from mock_hf_server import start_mock_server
+
+INTENTS = [
+    "pay off my overdraft", "build an emergency fund", "lower my energy bills", "cut my grocery bill",
+    "pay less interest on my credit card", "plan for a holiday", "split rent with flatmates",
+    "get a better mortgage rate", "stop impulse buying online", "start a pension",
+]
+OPENERS = ["how do I", "How do I", "hi, how do I", "please, how can I", "hey how can i", "How can I"]
+ENDINGS = ["", "?", "??", " please", " thanks!"]
+CONTEXTS = [
+    {"total_spent": 1250.0, "monthly_budget": 1500.0, "spending_by_category": {"Groceries": 300}, "goals": []},
+    {"total_spent": 2400.0, "monthly_budget": 2000.0, "spending_by_category": {"Dining": 650}, "goals": ["Holiday"]},
+]
+
+
+def make_messages(count, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(INTENTS))]
+    messages = []
+    for _ in range(count):
+        intent = rng.choices(INTENTS, weights)[0]
+        context = rng.choice(CONTEXTS) if rng.random() < 0.2 else None
+        messages.append((f"{rng.choice(OPENERS)} {intent}{rng.choice(ENDINGS)}", context))
+    return messages
+
+
+async def run(chat, messages, concurrency):
+    queue = list(enumerate(messages))
+    latencies = []
+
+    async def worker():
+        while queue:
+            user_id, (message, context) = queue.pop()
+            start = time.perf_counter()
+            await chat.get_response(str(user_id), message, context)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency_ms=args.latency_ms, per_item_ms=0)
+    os.environ["HF_CHAT_URL"] = server.url
+    os.environ["HUGGINGFACE_API_KEY"] = "bench"
+    os.environ.setdefault("FINORA_CHAT_MAX_CONCURRENCY", str(args.concurrency))
+
+    import chatbot_enhanced
+    from chatbot_enhanced import FinoraChat, ResponseCache, response_cache
+    from chat_client import chat_upstream
+
+    class NoCache(ResponseCache):
+        """What get_response did before: every message calls upstream"""
+
+        async def get_or_fetch(self, key, fetch):
+            reply, _ = await fetch()
+            return reply
+
+    messages = make_messages(args.messages, seed=5)
+    distinct = {(ResponseCache.normalize(m), ResponseCache.fingerprint(c, [])) for m, c in messages}
+    print(f"{len(messages)} opening messages ({len({m for m, _ in messages})} distinct texts, "
+          f"{len(distinct)} after normalization), {args.concurrency} workers, upstream latency "
+          f"{args.latency_ms:.0f} ms\n")
+
+    async def checks():
+        chat = FinoraChat()
+        server.fail_rate = 1.0
+        await chat.get_response("a", "how do I pay off my overdraft")
+        assert len(response_cache) == 0, "failed reply was cached"
+        server.fail_rate = 0.0
+        await chat.get_response("b", "how do I pay off my overdraft", CONTEXTS[0])
+        await chat.get_response("c", "How can I pay off my overdraft?", CONTEXTS[1])
+        await chat.get_response("d", "Hi, how do I pay off my overdraft? Thanks!", CONTEXTS[0])
+        assert len(response_cache) == 2 and response_cache.stats()["hits"] == 1, response_cache.stats()
+        response_cache.clear()
+        print("✅ failed replies not cached, contexts share entries only when they match\n")
+
+    async def compare():
+        await checks()
+        print(f"{'':>10} {'wall s':>7} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9} {'hit ratio':>10}")
+        results = {}
+        for label, cache in (("no cache", NoCache(0, 1, 1)), ("cache", response_cache)):
+            chatbot_enhanced.response_cache = cache
+            before = server.requests
+            wall, latencies = await run(FinoraChat(), messages, args.concurrency)
+            results[label] = latencies
+            print(f"{label:>10} {wall:>7.2f} {statistics.median(latencies):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {server.requests - before:>9} "
+                  f"{cache.stats()['hit_ratio']:>10.2%}")
+        await chat_upstream.close()
+        return results
+
+    results = asyncio.run(compare())
+    naive, cached = results["no cache"], results["cache"]
+    print(f"\nmean latency {statistics.mean(naive) / statistics.mean(cached):.1f}x lower with the cache")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: new httpx.AsyncClient per chat message vs the shared pooled client
+
+Starts benchmarks/mock_hf_server.py in-process as the text-generation
+upstream (plain HTTP, so the TLS handshake a real upstream adds per new
+connection is not included) and runs `--concurrency` chat sessions that
+each send `--messages` messages through FinoraChat. Compares latency
+percentiles, wall time and TCP connections opened.
+
+    python benchmarks/bench_chat_client.py --concurrency 200 --messages 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from _common import percentile
+from mock_hf_server import start_mock_server
+
+
+async def run_sessions(chat, concurrency: int, messages: int):
+    latencies = []
+
+    async def session(user_id):
+        for i in range(messages):
+            start = time.perf_counter()
+            await chat.get_response(str(user_id), f"what should I do about my rent this month {i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(user_id) for user_id in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency_ms=args.latency_ms, per_item_ms=0)
+    os.environ["HF_CHAT_URL"] = server.url
+    os.environ["HUGGINGFACE_API_KEY"] = "bench"
+    os.environ.setdefault("FINORA_CHAT_MAX_CONCURRENCY", str(args.concurrency))
+
+    import chatbot_enhanced
+    from chat_client import chat_upstream, MAX_CONCURRENCY, USE_HTTP2
+
+    class PerMessageClient:
+        """What _call_hf_api did before: a fresh client (and pool) per message"""
+
+        async def post(self, url, json, headers=None, timeout=None):
+            async with httpx.AsyncClient() as client:
+                return await client.post(url, json=json, headers=headers, timeout=timeout)
+
+    print(f"{args.concurrency} concurrent chats x {args.messages} messages, mock latency {args.latency_ms:.0f} ms, "
+          f"pool size {MAX_CONCURRENCY}, HTTP/2 {'on' if USE_HTTP2 else 'off (h2 not installed)'}\n")
+    print(f"{'':>22} {'wall s':>7} {'msg/s':>7} {'p50 ms':>8} {'p99 ms':>8} {'conns':>6}")
+
+    async def compare():
+        results = {}
+        for label, client in (("client per message", PerMessageClient()), ("shared pooled client", chat_upstream)):
+            chatbot_enhanced.chat_upstream = client
+            chat = chatbot_enhanced.FinoraChat()
+            connections = server.connections
+            wall, latencies = await run_sessions(chat, args.concurrency, args.messages)
+            opened = server.connections - connections
+            results[label] = latencies
+            print(f"{label:>22} {wall:>7.2f} {len(latencies) / wall:>7.0f} {statistics.median(latencies):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {opened:>6}")
+        await chat_upstream.close()
+        return results
+
+    results = asyncio.run(compare())
+    naive, pooled = results["client per message"], results["shared pooled client"]
+    print(f"\np50 {statistics.median(naive) / statistics.median(pooled):.1f}x lower, "
+          f"p99 {percentile(naive, 99) / percentile(pooled, 99):.1f}x lower with the shared client")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chatbot session memory as distinct users accumulate
+
+Each of --users users has one exchange (every fifth also sends a spending
+context), recorded the way FinoraChat records them. Compares memory traced
+by tracemalloc for the old per-instance dicts of dict lists with
+ConversationStore under a --max-mb budget, memory-only and with the SQLite
+tier. Then checks that an evicted user's history comes back from disk and
+that idle sessions expire.
+
+    python benchmarks/bench_chat_sessions.py --users 200000 --max-mb 16
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import _common  # noqa: F401  (puts backend/ on sys.path)
+
+from conversation_store import ASSISTANT, USER, ConversationStore
+
+QUESTION = "what should I do about my rent this month, it went up by {} pounds"
+REPLY = ("Track every purchase for a month, then trim the categories that surprise you. "
+         "Move whatever you free up into savings on payday. (ref {})")
+CONTEXT = {"total_spent": 1250.0, "spending_by_category": {"Groceries": 300.0, "Dining": 120.0},
+           "monthly_budget": 1500.0, "goals": ["Holiday"], "timestamp": "2026-01-01T00:00:00"}
+
+
+class DictSessions:
+    """What FinoraChat kept before: dicts of per-user lists, never shrinking"""
+
+    def __init__(self):
+        self.conversation_history = {}
+        self.user_context = {}
+
+    def append(self, user_id, *messages):
+        history = self.conversation_history.setdefault(user_id, [])
+        history.extend({"role": role, "content": content} for role, content in messages)
+        if len(history) > 20:
+            self.conversation_history[user_id] = history[-20:]
+
+    def set_context(self, user_id, context):
+        self.user_context[user_id] = dict(context)
+
+
+def fill(sessions, users, checkpoints):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    readings = []
+    start = time.perf_counter()
+    for i in range(1, users + 1):
+        user_id = str(i)
+        if i % 5 == 0:
+            sessions.set_context(user_id, CONTEXT)
+        sessions.append(user_id, (USER, QUESTION.format(i)), (ASSISTANT, REPLY.format(i)))
+        if i in checkpoints:
+            readings.append((tracemalloc.get_traced_memory()[0] - base) / 2**20)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return readings, users / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--max-mb", type=float, default=16)
+    args = parser.parse_args()
+
+    checkpoints = [args.users * n // 4 for n in range(1, 5)]
+    max_bytes = int(args.max_mb * 2**20)
+    disk_path = os.path.join(tempfile.mkdtemp(prefix="finora-bench-"), "sessions.db")
+
+    print(f"Traced MB after N distinct users (one exchange each), store budget {args.max_mb:.0f} MB\n")
+    print(f"{'':>20}" + "".join(f"{n:>10,}" for n in checkpoints) + f"{'users/s':>10}")
+    variants = (
+        ("dicts (before)", DictSessions()),
+        ("store", ConversationStore(20, 24 * 3600, max_bytes)),
+        ("store + SQLite", ConversationStore(20, 24 * 3600, max_bytes, disk_path)),
+    )
+    for label, sessions in variants:
+        readings, rate = fill(sessions, args.users, set(checkpoints))
+        print(f"{label:>20}" + "".join(f"{mb:>10.1f}" for mb in readings) + f"{rate:>10,.0f}")
+
+    store = variants[2][1]
+    assert store.stats()["evictions"] > 0 and store.bytes <= max_bytes
+    history = store.history("5")
+    assert [m["role"] for m in history] == [USER, ASSISTANT] and history[1]["content"] == REPLY.format(5)
+    assert store.context("5")["goals"] == ["Holiday"] and store.stats()["disk_loads"] == 1
+    store.close()
+    print(f"\n✅ evicted user 5 reloaded from disk ({store._disk.count():,} sessions on disk, "
+          f"{store.stats()['flushes']:,} background flushes)")
+
+    short = ConversationStore(20, 0.05, max_bytes)
+    short.append("idle", (USER, "hello"), (ASSISTANT, "hi"))
+    time.sleep(0.1)
+    assert short.history("idle") == [] and short.stats()["expirations"] == 1 and short.bytes == 0
+    print("✅ idle sessions expire")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time to first byte for POST /chat vs POST /chat/stream
+
+Uses benchmarks/mock_hf_server.py as the text-generation upstream, with a
+first-token delay of --latency-ms and one token every --token-ms after that.
+Checks that /chat/stream sends token events and a done event matching the
+streamed text and that the exchange lands in the conversation history (and
+that a stream the upstream drops ends with "status": "error" instead), then
+times the first byte and full reply of both paths at --concurrency
+concurrent chats, each asking a different question so the response cache
+doesn't answer them.
+
+    python benchmarks/bench_chat_stream.py --latency-ms 300 --token-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from _common import percentile, use_temp_database
+from mock_hf_server import start_mock_server
+
+
+async def timed(label, chat, concurrency, streaming):
+    first_byte, total = [], []
+
+    async def one(user_id):
+        start = time.perf_counter()
+        if streaming:
+            first = None
+            async for _ in chat.stream_response(str(user_id), f"what should I do about my rent in {user_id} weeks"):
+                if first is None:
+                    first = time.perf_counter() - start
+        else:
+            await chat.get_response(str(user_id), f"what should I do about my rent in {user_id} weeks")
+            first = time.perf_counter() - start
+        first_byte.append(first * 1000)
+        total.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(user_id) for user_id in range(concurrency)))
+    print(f"{label:>14} {statistics.median(first_byte):>9.0f} {percentile(first_byte, 99):>9.0f} "
+          f"{statistics.median(total):>9.0f}")
+    return statistics.median(first_byte)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=40.0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency_ms=args.latency_ms, per_item_ms=0, token_ms=args.token_ms)
+    use_temp_database()
+    os.environ["HF_CHAT_URL"] = server.url
+    os.environ["HUGGINGFACE_API_KEY"] = "bench"
+    os.environ["FINORA_CLASSIFIER_CACHE_PATH"] = ""
+    os.environ.setdefault("FINORA_CHAT_MAX_CONCURRENCY", str(args.concurrency))
+
+    from fastapi.testclient import TestClient
+    from main import app
+    from chatbot_enhanced import FinoraChat, finora_chat, response_cache
+    from chat_client import chat_upstream
+
+    with TestClient(app) as client:
+        response = client.post("/chat/stream?user_id=7", json={"message": "what should I do about my rent this month"})
+        assert response.headers["content-type"].startswith("text/event-stream"), response.headers
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        tokens = [json.loads(data[6:])["text"] for kind, data in events if kind == "event: token"]
+        done = json.loads(events[-1][1][6:])
+        assert events[-1][0] == "event: done" and done["reply"] == "".join(tokens).strip(), events[-1]
+        history = finora_chat.get_conversation_history("7")
+        assert [m["role"] for m in history] == ["user", "assistant"] and history[1]["content"] == done["reply"]
+        print(f"✅ /chat/stream sent {len(tokens)} token events, done event and history match")
+
+        server.break_stream_after = 5
+        response = client.post("/chat/stream?user_id=8", json={"message": "what should I do about my council tax"})
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        done = json.loads(events[-1][1][6:])
+        assert done["status"] == "error" and len(events) == 6, events[-1]
+        assert finora_chat.get_conversation_history("8") == []
+        server.break_stream_after = 0
+        print("✅ an interrupted stream ends with status error and stays out of the history\n")
+
+    print(f"{args.concurrency} concurrent chats, first token after {args.latency_ms:.0f} ms, "
+          f"then 1 token / {args.token_ms:.0f} ms\n")
+    print(f"{'':>14} {'TTFB p50':>9} {'TTFB p99':>9} {'full p50':>9}   (ms)")
+
+    async def compare():
+        whole = await timed("/chat", FinoraChat(), args.concurrency, streaming=False)
+        response_cache.clear()
+        streamed = await timed("/chat/stream", FinoraChat(), args.concurrency, streaming=True)
+        await chat_upstream.close()
+        return whole, streamed
+
+    whole, streamed = asyncio.run(compare())
+    print(f"\nTime to first byte: {whole / streamed:.1f}x lower when streaming")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
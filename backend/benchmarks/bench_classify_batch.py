@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N POST /classify calls vs one POST /classify/batch
+
+Runs the FastAPI app in-process (TestClient). The classification cache is
+disabled by default so both sides pay for matching; pass --with-cache to
+measure the warm-cache path instead. Also checks that the vectorized
+matcher agrees with per-description classification.
+
+    python benchmarks/bench_classify_batch.py --items 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from _common import use_temp_database, random_description
+
+use_temp_database()
+if "--with-cache" not in sys.argv:
+    os.environ["FINORA_CLASSIFIER_CACHE_SIZE"] = "0"
+    os.environ["FINORA_CLASSIFIER_CACHE_PATH"] = ""
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+from classifier import get_taxonomy  # noqa: E402
+
+WORDS = ["gas station", "market", "coffee", "online", "hotel", "water", "ref", "pos", "card", "uk"]
+
+
+def make_descriptions(count, seed):
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(count):
+        description, _ = random_description(rng)
+        descriptions.append(f"{description} {rng.choice(WORDS).upper()} {rng.choice(WORDS).upper()}")
+    return descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--with-cache", action="store_true")
+    args = parser.parse_args()
+
+    texts = [get_taxonomy().match_key(d) for d in make_descriptions(args.items, seed=3)]
+    taxonomy = get_taxonomy()
+    assert taxonomy.classify_many(texts) == [taxonomy.classify(t) for t in texts]
+    print("✅ Vectorized matcher agrees with per-description classification")
+
+    client = TestClient(app)
+    descriptions = make_descriptions(args.items, seed=1)
+    start = time.perf_counter()
+    singles = []
+    for description in descriptions:
+        response = client.post("/classify", params={"description": description})
+        assert response.status_code == 200, response.text
+        singles.append(response.json())
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post("/classify/batch", json={"items": [{"description": d} for d in descriptions]})
+    batch_s = time.perf_counter() - start
+    assert response.status_code == 200, response.text
+    assert response.json()["results"] == singles
+
+    print(f"\n{args.items:,} descriptions ({'warm cache' if args.with_cache else 'no cache'})")
+    print(f"  single POSTs: {single_s:8.3f} s  ({single_s / args.items * 1e6:8.1f} µs/item)")
+    print(f"  batch POST:   {batch_s:8.3f} s  ({batch_s / args.items * 1e6:8.1f} µs/item)")
+    print(f"  speedup:      {single_s / batch_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
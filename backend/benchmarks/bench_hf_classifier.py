@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: remote classification under 500 concurrent requests
+
+Against the local mock inference server (benchmarks/mock_hf_server.py),
+compares one HTTP request per description on a fresh client each time
+(what the chatbot does today) with hf_classifier: micro-batches over one
+pooled keep-alive client. Then repeats with the server failing every
+request, to show the deadline/circuit breaker fallback.
+
+    python benchmarks/bench_hf_classifier.py --concurrency 500 --latency-ms 80
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from _common import percentile
+from mock_hf_server import start_mock_server
+
+WORDS = ["tesco", "uber", "netflix", "pizza", "hotel", "gym", "water", "amazon", "cafe", "parking",
+         "market", "cinema", "lease", "flight", "yoga", "store", "lunch", "taxi", "phone", "resort"]
+
+
+def make_descriptions(count: int, seed: int):
+    # Distinct word combinations so the result cache can't answer
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(WORDS, 4)) + f" ref{'x' * (i % 7)}{chr(97 + i % 26)}" for i in range(count)]
+
+
+async def naive(url: str, descriptions, labels):
+    import httpx
+
+    async def one(description):
+        start = time.perf_counter()
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                url, json={"inputs": description, "parameters": {"candidate_labels": labels}}, timeout=30.0
+            )
+            response.raise_for_status()
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(d) for d in descriptions))
+
+
+async def batched(descriptions):
+    from hf_classifier import hf_classifier
+
+    async def one(description):
+        start = time.perf_counter()
+        await hf_classifier.classify(description)
+        return time.perf_counter() - start
+
+    await hf_classifier.start()
+    try:
+        return await asyncio.gather(*(one(d) for d in descriptions))
+    finally:
+        await hf_classifier.close()
+
+
+def report(label, wall_s, latencies, server=None):
+    latencies_ms = sorted(x * 1000 for x in latencies)
+    line = (f"{label:>22} {wall_s:>7.2f} s {len(latencies) / wall_s:>9,.0f}/s "
+            f"{percentile(latencies_ms, 50):>8.1f} {percentile(latencies_ms, 95):>8.1f} {percentile(latencies_ms, 99):>8.1f}")
+    if server is not None:
+        line += f" {server.requests:>9,} {server.connections:>6,}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency_ms=args.latency_ms)
+    os.environ["HF_CLASSIFIER_URL"] = server.url
+    os.environ["FINORA_CLASSIFIER_CACHE_PATH"] = ""
+
+    from classifier import get_taxonomy
+    from hf_classifier import hf_classifier
+
+    labels = get_taxonomy().categories
+    print(f"{args.concurrency} concurrent requests, mock latency {args.latency_ms:.0f} ms + 1 ms/item\n")
+    print(f"{'':>22} {'wall':>9} {'throughput':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'HTTP reqs':>9} {'conns':>6}")
+
+    descriptions = make_descriptions(args.concurrency, seed=1)
+    start = time.perf_counter()
+    latencies = asyncio.run(naive(server.url, descriptions, labels))
+    report("client per request", time.perf_counter() - start, latencies, server)
+
+    server.requests = server.connections = 0
+    descriptions = make_descriptions(args.concurrency, seed=2)
+    start = time.perf_counter()
+    latencies = asyncio.run(batched(descriptions))
+    report("pooled micro-batches", time.perf_counter() - start, latencies, server)
+    stats = hf_classifier.stats()
+    print(f"{'':>22} mean batch {stats['mean_batch_size']}, remote results {stats['remote_results']}, "
+          f"fallbacks {stats['fallbacks']}")
+
+    server.requests = server.connections = 0
+    server.fail_rate = 1.0
+    descriptions = make_descriptions(args.concurrency, seed=3)
+    start = time.perf_counter()
+    latencies = asyncio.run(batched(descriptions))
+    report("upstream failing", time.perf_counter() - start, latencies, server)
+    stats = hf_classifier.stats()
+    print(f"{'':>22} breaker {stats['breaker']['state']}, breaker rejections {stats['breaker_rejections']}, "
+          f"http errors {stats['http_errors']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark: learned classifier training time and per-item inference latency
+
+Trains a LinearModel on synthetic (description, category) pairs the way
+LearnedClassifier does, then times predict() and reports accuracy on
+held-out descriptions (random store numbers, so unseen exact strings).
+
+    python benchmarks/bench_learned_classifier.py --examples 5000
+"""
+
+import argparse
+import random
+import time
+
+from _common import random_description
+
+from classifier import get_taxonomy, normalize_description
+from learned_classifier import LinearModel
+
+# What users "correct" each merchant to; anything else keeps its keyword category
+CORRECTIONS = {"tesco stores #": "Groceries", "card payment #": "Bills", "tfl travel charge": "Transportation"}
+
+
+def make_examples(count, seed):
+    rng = random.Random(seed)
+    taxonomy = get_taxonomy()
+    examples = []
+    for _ in range(count):
+        text = normalize_description(random_description(rng)[0])
+        label = CORRECTIONS.get(text) or taxonomy.classify(text)["category"]
+        if label in taxonomy.info:
+            examples.append((text, label))
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, default=5000)
+    parser.add_argument("--predictions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    training = make_examples(args.examples, seed=1)
+    model = LinearModel()
+    start = time.perf_counter()
+    model.fit(training)
+    train_s = time.perf_counter() - start
+
+    held_out = make_examples(args.predictions, seed=2)
+    start = time.perf_counter()
+    predictions = [model.predict(text) for text, _ in held_out]
+    predict_s = time.perf_counter() - start
+    accuracy = sum(label == expected for (label, _), (_, expected) in zip(predictions, held_out)) / len(held_out)
+
+    print(f"training:  {len(training):,} examples in {train_s:.2f} s, {len(model.weights):,} features")
+    print(f"inference: {predict_s / len(held_out) * 1e6:.1f} µs/item over {len(held_out):,} items")
+    print(f"accuracy:  {accuracy:.1%} on held-out descriptions")
+
+
+if __name__ == "__main__":
+    main()
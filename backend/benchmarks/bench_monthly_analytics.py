@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: monthly analytics aggregation, Python loops vs SQL GROUP BY
+
+For users with 1k, 100k and 1M transactions in one month, compares the
+previous approach (load every row as an ORM object, then loop in Python)
+with analytics.monthly_totals (one grouped query returning aggregate rows).
+
+    python benchmarks/bench_monthly_analytics.py --sizes 1000 100000 1000000
+"""
+
+import argparse
+import math
+
+from _common import use_temp_database, generate_transactions, seed_transactions, measure
+
+use_temp_database()
+
+from datetime import datetime, timedelta  # noqa: E402
+
+from models import init_db, engine, SessionLocal, Transaction  # noqa: E402
+from analytics import monthly_totals  # noqa: E402
+
+START = datetime(2025, 10, 1)
+END = START + timedelta(days=31)
+
+
+def python_loop_totals(db, user_id):
+    """The pre-SQL implementation from get_monthly_analytics"""
+    transactions = db.query(Transaction).filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= START,
+        Transaction.date < END
+    ).all()
+    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
+    total_spent = sum(t.amount for t in transactions if t.transaction_type == "expense")
+    by_category = {}
+    for transaction in transactions:
+        if transaction.transaction_type == "expense":
+            by_category[transaction.category_name] = by_category.get(transaction.category_name, 0) + transaction.amount
+    return total_income, total_spent, by_category
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    for user_id, size in enumerate(args.sizes, start=1):
+        print(f"Seeding {size:,} transactions for user {user_id}...")
+        seed_transactions(engine, generate_transactions(user_id, size, months=1))
+
+    print(f"\n{'rows/month':>12} {'python loops':>14} {'SQL GROUP BY':>14} {'speedup':>9}")
+    db = SessionLocal()
+    try:
+        for user_id, size in enumerate(args.sizes, start=1):
+            legacy = python_loop_totals(db, user_id)
+            db.expunge_all()
+            grouped = monthly_totals(db, user_id, START, END)
+            assert math.isclose(legacy[0], grouped[0], rel_tol=1e-9)
+            assert math.isclose(legacy[1], grouped[1], rel_tol=1e-9)
+            assert legacy[2].keys() == grouped[2].keys()
+
+            def run_legacy():
+                python_loop_totals(db, user_id)
+                db.expunge_all()
+
+            loop_ms = measure(run_legacy, repeat=args.repeat)["median_ms"]
+            sql_ms = measure(lambda: monthly_totals(db, user_id, START, END), repeat=args.repeat)["median_ms"]
+            print(f"{size:>12,} {loop_ms:>11.1f} ms {sql_ms:>11.1f} ms {loop_ms / sql_ms:>8.1f}x")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk re-classification job vs updating rows one at a time
+
+Seeds transactions with random (stale) categories, marks a few as manual,
+then re-classifies them with reclassify.run_reclassify. The job is
+interrupted part-way and resumed, and rollups/budgets must show no drift
+afterwards. The baseline classifies and UPDATEs each row separately, the
+way repeated PUT /transactions calls would.
+
+    python benchmarks/bench_reclassify.py --rows 100000
+"""
+
+import argparse
+import os
+import random
+import time
+
+from _common import use_temp_database, generate_transactions, seed_transactions
+
+use_temp_database()
+os.environ["FINORA_RECLASSIFY_PAUSE_RATIO"] = "0"
+os.environ["FINORA_CLASSIFIER_CACHE_PATH"] = ""
+
+from models import init_db, engine, SessionLocal, Budget, ReclassifyJob, Transaction  # noqa: E402
+from classifier import classify_transaction  # noqa: E402
+from reclassify import create_job, describe_job, run_reclassify  # noqa: E402
+from rollups import rebuild_rollups, sync_budget_spent, verify_budget_spent, verify_rollups  # noqa: E402
+
+
+class Interrupt(Exception):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--baseline-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    init_db()
+    for user_id in range(1, args.users + 1):
+        seed_transactions(engine, generate_transactions(user_id, args.rows // args.users))
+
+    db = SessionLocal()
+    rng = random.Random(5)
+    manual_ids = rng.sample(range(1, args.rows + 1), 100)
+    db.query(Transaction).filter(Transaction.id.in_(manual_ids)).update(
+        {Transaction.classification_status: "manual", Transaction.category_name: "Health"},
+        synchronize_session=False
+    )
+    for user_id in range(1, args.users + 1):
+        for month in ("2025-08", "2025-09", "2025-10"):
+            for category in ("Groceries", "Transportation", "Entertainment"):
+                db.add(Budget(user_id=user_id, category_name=category, month=month, allocated=500))
+    db.flush()
+    rebuild_rollups(db)
+    sync_budget_spent(db)
+    db.commit()
+    print(f"Seeded {args.rows:,} transactions for {args.users} users (100 marked manual)\n")
+
+    job = create_job(db)
+    batches = 0
+
+    def interrupt_after_three(status):
+        nonlocal batches
+        batches += 1
+        if batches == 3:
+            raise Interrupt("simulated crash")
+
+    start = time.perf_counter()
+    run_reclassify(job.id, progress=interrupt_after_three)
+    db.expire_all()
+    interrupted = describe_job(db.get(ReclassifyJob, job.id))
+    assert interrupted["status"] == "failed", interrupted
+    run_reclassify(job.id)
+    job_s = time.perf_counter() - start
+
+    db.expire_all()
+    final = describe_job(db.get(ReclassifyJob, job.id))
+    assert final["status"] == "completed", final
+    assert final["rows_processed"] == final["total_rows"] == args.rows - 100, final
+    manual_left = db.query(Transaction).filter(
+        Transaction.id.in_(manual_ids), Transaction.category_name == "Health"
+    ).count()
+    assert manual_left == 100, manual_left
+    print(f"✅ Interrupted after {interrupted['rows_processed']:,} rows, resumed to "
+          f"{final['rows_processed']:,} (manual rows untouched)")
+
+    drifted, drifted_budgets = verify_rollups(db), verify_budget_spent(db)
+    assert not drifted and not drifted_budgets, (drifted[:3], drifted_budgets[:3])
+    print("✅ No rollup or budget drift")
+
+    # Baseline: classify and UPDATE + commit one row at a time, on a sample
+    db.query(Transaction).filter(Transaction.id <= args.baseline_rows).update(
+        {Transaction.category_name: "Shopping"}, synchronize_session=False
+    )
+    db.commit()
+    start = time.perf_counter()
+    for transaction in db.query(Transaction).filter(Transaction.id <= args.baseline_rows).all():
+        transaction.category_name = classify_transaction(transaction.description)["category"]
+        db.commit()
+    single_s = time.perf_counter() - start
+    db.close()
+
+    job_rate = final["rows_processed"] / job_s
+    single_rate = args.baseline_rows / single_s
+    print(f"\n{'':>24} {'rows/s':>10}")
+    print(f"{'row-by-row UPDATEs':>24} {single_rate:>10,.0f}")
+    print(f"{'reclassify job':>24} {job_rate:>10,.0f}   ({final['rows_changed']:,} rows changed)")
+    print(f"\nSpeedup: {job_rate / single_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
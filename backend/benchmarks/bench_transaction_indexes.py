@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-user transaction queries before/after migration 1
+(composite indexes on transactions)
+
+Builds a database without the composite indexes, loads one heavy user
+(1M rows by default) plus background users, prints the SQLite query plan
+and latency of the listing/analytics queries, applies the migration and
+repeats.
+
+    python benchmarks/bench_transaction_indexes.py --rows 1000000
+"""
+
+import argparse
+
+from _common import use_temp_database, generate_transactions, seed_transactions, measure
+
+use_temp_database()
+
+from datetime import datetime, timedelta  # noqa: E402
+from sqlalchemy import select, text  # noqa: E402
+
+from models import Base, engine, SessionLocal, Transaction  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+MONTH_START = datetime(2025, 6, 1)
+MONTH_END = MONTH_START + timedelta(days=30)
+
+
+def month_listing(user_id):
+    """Same filter/sort as get_user_transactions(month=...)"""
+    return select(Transaction).where(
+        Transaction.user_id == user_id,
+        Transaction.date >= MONTH_START,
+        Transaction.date < MONTH_END
+    ).order_by(Transaction.date.desc())
+
+
+def category_listing(user_id):
+    """Same filter/sort as get_user_transactions(month=..., category=...)"""
+    return month_listing(user_id).where(Transaction.category_name == "Groceries")
+
+
+QUERIES = {
+    "month listing (user_id + date range, ORDER BY date)": month_listing,
+    "category listing (user_id + category + date range)": category_listing,
+}
+
+
+def print_plans_and_timings(label, user_id, repeat):
+    print(f"\n=== {label} ===")
+    db = SessionLocal()
+    try:
+        for name, build in QUERIES.items():
+            statement = build(user_id)
+            compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+
+            def run():
+                db.execute(statement).scalars().all()
+                db.expunge_all()
+
+            timing = measure(run, repeat=repeat)
+            print(f"\n{name}")
+            for row in plan:
+                print(f"  plan: {row[-1]}")
+            print(f"  latency: median {timing['median_ms']:.2f} ms, min {timing['min_ms']:.2f} ms")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions for the benchmarked user")
+    parser.add_argument("--other-users", type=int, default=20, help="background users")
+    parser.add_argument("--other-rows", type=int, default=10_000, help="transactions per background user")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Simulate a pre-migration finora.db: tables exist, composite indexes do not
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_transactions_user_date"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_transactions_user_category_date"))
+
+    print(f"Seeding {args.rows:,} transactions for user 1 "
+          f"and {args.other_users} x {args.other_rows:,} for other users...")
+    seed_transactions(engine, generate_transactions(1, args.rows))
+    for user_id in range(2, args.other_users + 2):
+        seed_transactions(engine, generate_transactions(user_id, args.other_rows))
+
+    print_plans_and_timings("BEFORE migration", 1, args.repeat)
+    applied = run_migrations(engine)
+    print(f"\nApplied migrations: {applied}")
+    print_plans_and_timings("AFTER migration", 1, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
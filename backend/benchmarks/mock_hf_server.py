@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Hugging Face Inference API
+
+Zero-shot classification: {"inputs": [...], "parameters": {"candidate_labels": [...]}}
+gets one {"sequence", "labels", "scores"} per input, labelled by the keyword
+classifier. Text generation (no candidate_labels) gets [{"generated_text"}]
+echoing the prompt plus a canned reply, or with "stream": true, the reply's
+tokens as Text Generation Inference server-sent events, one every
+--token-ms. Both answer after a configurable delay. Used by the benchmarks; point the app at it with
+HF_CLASSIFIER_URL / HF_CHAT_URL=http://127.0.0.1:8765/ to try it by hand.
+
+    python benchmarks/mock_hf_server.py --port 8765 --latency-ms 80
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import _common  # noqa: F401  (puts backend/ on sys.path)
+
+
+GENERATED_REPLY = (
+    "Track every purchase for a month, then trim the categories that surprise you. "
+    "Move whatever you free up into savings on payday so it never sits in your current account."
+)
+
+
+class MockInferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 500 clients connect at once in the benchmarks
+
+    def __init__(self, address, latency_ms: float = 80.0, per_item_ms: float = 1.0, fail_rate: float = 0.0,
+                 token_ms: float = 0.0, break_stream_after: int = 0):
+        super().__init__(address, MockInferenceHandler)
+        self.break_stream_after = break_stream_after  # Drop streams after this many tokens (0 = never)
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.token_ms = token_ms
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.items = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+class MockInferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        from classifier import classify_batch
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        inputs = body["inputs"] if isinstance(body["inputs"], list) else [body["inputs"]]
+        labels = body.get("parameters", {}).get("candidate_labels", [])
+        with self.server._lock:
+            self.server.requests += 1
+            self.server.items += len(inputs)
+
+        time.sleep((self.server.latency_ms + self.server.per_item_ms * len(inputs)) / 1000)
+        if random.random() < self.server.fail_rate:
+            self._reply(503, {"error": "Model is currently loading"})
+            return
+
+        if not labels:
+            tokens = [" " + word for word in GENERATED_REPLY.split()]
+            if body.get("stream"):
+                self._stream_tokens(tokens)
+                return
+            time.sleep(self.server.token_ms * len(tokens) / 1000)
+            self._reply(200, [{"generated_text": f"{text}\n{GENERATED_REPLY}"} for text in inputs])
+            return
+
+        results = []
+        for text, classification in zip(inputs, classify_batch(inputs)):
+            top = classification["category"]
+            others = [label for label in labels if label != top]
+            rest = 0.1 / max(len(others), 1)
+            results.append({"sequence": text, "labels": [top, *others], "scores": [0.9, *[rest] * len(others)]})
+        self._reply(200, results if isinstance(body["inputs"], list) else results[0])
+
+    def _stream_tokens(self, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, text in enumerate(tokens):
+            if self.server.break_stream_after and i == self.server.break_stream_after:
+                self.close_connection = True  # Truncated chunked body, like an upstream crash
+                return
+            if i:
+                time.sleep(self.server.token_ms / 1000)
+            last = i == len(tokens) - 1
+            event = {"token": {"id": i, "text": text, "special": False},
+                     "generated_text": GENERATED_REPLY if last else None}
+            data = f"data: {json.dumps(event)}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _reply(self, status: int, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_mock_server(port: int = 0, **options) -> MockInferenceServer:
+    """Serve in a daemon thread; port 0 picks a free port (see server.url)"""
+    server = MockInferenceServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--per-item-ms", type=float, default=1.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--break-stream-after", type=int, default=0, help="drop streams after N tokens")
+    args = parser.parse_args()
+
+    server = MockInferenceServer(
+        ("127.0.0.1", args.port),
+        latency_ms=args.latency_ms, per_item_ms=args.per_item_ms, fail_rate=args.fail_rate,
+        token_ms=args.token_ms, break_stream_after=args.break_stream_after
+    )
+    print(f"Mock inference server on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,214 @@
+"""
+Caching primitives: an in-process LRU and a persistent SQLite key/value tier
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+def _approx_size(key: Hashable, value: Any) -> int:
+    """Shallow sys.getsizeof of key and value (exact for strings, pass sizeof for containers)"""
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU mapping with hit/miss/eviction counters
+
+    Optionally entries expire `ttl` seconds after they were set (expired
+    entries count as misses and are dropped when looked up or evicted), and
+    the cache holds at most `max_bytes` as measured by `sizeof(key, value)`.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Hashable, Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or _approx_size
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, size = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        size = self._sizeof(key, value) if self.max_bytes is not None else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # Would evict everything else and still not fit
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.bytes -= entry[2]
+            return entry[0]
+
+    def pop_many(self, keys: Iterable[Hashable]):
+        with self._lock:
+            for key in keys:
+                entry = self._data.pop(key, None)
+                if entry is not None:
+                    self.bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.ttl is not None:
+            stats.update(ttl_seconds=self.ttl, expirations=self.expirations)
+        if self.max_bytes is not None:
+            stats.update(bytes=self.bytes, max_bytes=self.max_bytes)
+        return stats
+
+
+class SQLiteCache:
+    """
+    Persistent string -> JSON value store in its own SQLite file
+
+    Entries belong to a namespace (e.g. a taxonomy fingerprint); switching
+    namespace deletes everything written under other namespaces, so stale
+    results never survive a change in how they were computed. The table
+    is capped at max_rows, evicting the oldest writes first. Uses stdlib
+    sqlite3 rather than the app's SQLAlchemy engine so it works with any
+    DATABASE_URL and never joins the request's transaction.
+    """
+
+    def __init__(self, path: str, namespace: str, max_rows: int):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.namespace = None
+        self.set_namespace(namespace)
+
+    def set_namespace(self, namespace: str):
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            self.namespace = namespace
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace != ?", (namespace,))
+            self._size = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache_entries WHERE namespace = ? AND key IN ({placeholders})",
+                    [self.namespace, *chunk]
+                )
+                found.update((key, json.loads(value)) for key, value in rows)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, Any], namespace: Optional[str] = None):
+        """Store items; writes computed under a namespace that is no longer current are dropped"""
+        if not items:
+            return
+        with self._lock:
+            if namespace is not None and namespace != self.namespace:
+                return
+            self._conn.execute("BEGIN")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO cache_entries (namespace, key, value) VALUES (?, ?, ?)",
+                    [(self.namespace, key, json.dumps(value)) for key, value in items.items()]
+                )
+                self._size += self._conn.total_changes - before
+                overflow = self._size - self.max_rows
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE rowid IN "
+                        "(SELECT rowid FROM cache_entries ORDER BY rowid LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._size -= overflow
+                    self.evictions += overflow
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+            self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": self._size,
+            "maxsize": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
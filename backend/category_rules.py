@@ -0,0 +1,274 @@
+"""
+User-defined categorization rules
+A rule sets a category when all of its conditions hold: the description
+matches a regex (case-insensitive), the amount is within [min, max], the
+transaction is on a given account. Rules are tried in (priority, id) order
+and the first match wins. They run before merchant overrides and the
+classifier, both for new transactions and for apply_rules_to_history.
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, or_, true, update
+from sqlalchemy.orm import Session
+
+from cache import LRUCache
+from classifier import _trie_pattern
+from models import CategoryRule, Transaction
+from rollups import rebuild_rollups, sync_budget_spent
+
+# Users whose compiled rules are kept in memory
+RULE_CACHE_USERS = int(os.getenv("FINORA_RULE_CACHE_USERS", "1000"))
+
+REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def validate_pattern(pattern: str):
+    """
+    Check a rule's description pattern
+
+    A user's rules are combined into one regex, so named groups and
+    backreferences (which would clash between rules) aren't allowed.
+
+    Raises:
+        ValueError: if it isn't a valid regular expression
+    """
+    try:
+        compiled = re.compile(f"(?:{pattern})", re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern {pattern!r}: {str(e)}")
+    if compiled.groupindex or BACKREFERENCE.search(pattern):
+        raise ValueError(f"Invalid pattern {pattern!r}: named groups and backreferences aren't supported")
+
+
+class CompiledRules:
+    """
+    One user's rules as a decision structure
+
+    Account and amount conditions only depend on which account bucket and
+    which interval between the rules' amount bounds a transaction falls in,
+    so the rules that can apply are worked out once per (account, interval)
+    and cached. Description patterns are then checked in at most two
+    scans: plain-text patterns (most rules) are found together by one trie
+    regex, and the remaining true regexes are combined into one ordered
+    alternation whose first matching branch is the highest-priority one.
+    Per-transaction cost doesn't grow with the number of plain-text rules.
+    """
+
+    def __init__(self, rules: List):
+        self.rules = sorted(rules, key=lambda r: (r.priority, r.id))
+        self.categories = [rule.category_name for rule in self.rules]
+
+        # Rule position -> lowercase literal / regex source
+        self.literals = {}
+        self.regexes = {}
+        for position, rule in enumerate(self.rules):
+            pattern = rule.description_pattern or ""
+            if not pattern:
+                continue
+            if REGEX_METACHARACTERS.isdisjoint(pattern):
+                self.literals[position] = pattern.lower()
+            else:
+                self.regexes[position] = pattern
+
+        words = sorted(set(self.literals.values()))
+        self.literal_positions = {}
+        for position, literal in self.literals.items():
+            self.literal_positions.setdefault(literal, []).append(position)
+        self.prefixes = {word: [w for w in words if word.startswith(w)] for word in words}
+        self.literal_pattern = re.compile("(?=(" + _trie_pattern(words) + "))") if words else None
+
+        bounds = set()
+        for rule in self.rules:
+            bounds.update(b for b in (rule.min_amount, rule.max_amount) if b is not None)
+        self.bounds = sorted(bounds)
+        self._buckets = {}
+        self._combined = {}  # Buckets with the same regex rules share one compiled regex
+
+    def _bucket(self, account_id: Optional[int], amount: float) -> Tuple:
+        """(allowed positions, first pattern-less rule, combined regex, its first rule) for an account/amount"""
+        index = bisect_left(self.bounds, amount)
+        key = (account_id, index, index < len(self.bounds) and self.bounds[index] == amount)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            allowed = [
+                position for position, rule in enumerate(self.rules)
+                if (rule.account_id is None or rule.account_id == account_id)
+                and (rule.min_amount is None or amount >= rule.min_amount)
+                and (rule.max_amount is None or amount <= rule.max_amount)
+            ]
+            regex_positions = tuple(p for p in allowed if p in self.regexes)
+            combined = self._combined.get(regex_positions)
+            if regex_positions and combined is None:
+                # Each branch ends in an empty marker group; the first branch
+                # to match is the highest-priority rule, and lastindex is its marker
+                branches, markers, groups = [], {}, 0
+                for position in regex_positions:
+                    pattern = self.regexes[position]
+                    groups += re.compile(pattern).groups + 1
+                    markers[groups] = position
+                    branches.append(f"(?=[\\s\\S]*?(?:{pattern}))()")
+                combined = (re.compile("|".join(branches), re.IGNORECASE), markers)
+                self._combined[regex_positions] = combined
+            # Rules without a pattern match every description
+            catch_all = next((p for p in allowed if p not in self.literals and p not in self.regexes), None)
+            bucket = (set(allowed), catch_all, combined, regex_positions[0] if regex_positions else None)
+            self._buckets[key] = bucket
+        return bucket
+
+    def match(self, description: str, amount: float = 0.0, account_id: Optional[int] = None) -> Optional[int]:
+        """Position of the first rule that applies, or None"""
+        allowed, catch_all, combined, first_regex = self._bucket(account_id, amount or 0.0)
+        if not allowed:
+            return None
+        text = (description or "").lower()
+        best = catch_all
+
+        if self.literal_pattern is not None:
+            for found in self.literal_pattern.finditer(text):
+                for word in self.prefixes[found.group(1)]:
+                    for position in self.literal_positions[word]:
+                        if position in allowed and (best is None or position < best):
+                            best = position
+
+        if combined is not None and (best is None or first_regex < best):
+            regex, markers = combined
+            found = regex.match(description or "")
+            if found is not None:
+                position = markers[found.lastindex]
+                if best is None or position < best:
+                    best = position
+        return best
+
+    def category_for(self, description: str, amount: float = 0.0, account_id: Optional[int] = None) -> Optional[str]:
+        position = self.match(description, amount, account_id)
+        return self.categories[position] if position is not None else None
+
+
+class RuleIndex:
+    """
+    user_id -> CompiledRules for recently active users (dropped when their rules change)
+
+    Same generation guard as MerchantOverrideIndex: rules compiled from a
+    query that raced a rule commit are used but not cached.
+    """
+
+    def __init__(self, max_users: int):
+        self.users = LRUCache(max_users)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def for_user(self, db: Session, user_id: int) -> CompiledRules:
+        compiled = self.users.get(user_id)
+        if compiled is None:
+            generation = self._generation
+            # Plain rows rather than ORM objects: they outlive the session
+            rules = db.query(
+                CategoryRule.id, CategoryRule.priority, CategoryRule.description_pattern, CategoryRule.min_amount,
+                CategoryRule.max_amount, CategoryRule.account_id, CategoryRule.category_name
+            ).filter(
+                CategoryRule.user_id == user_id, CategoryRule.is_active.is_(True)
+            ).all()
+            compiled = CompiledRules(rules)
+            with self._lock:
+                if self._generation == generation:
+                    self.users.set(user_id, compiled)
+        return compiled
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self._generation += 1
+            self.users.pop_many(user_ids)
+
+    def stats(self) -> Dict:
+        return self.users.stats()
+
+
+rule_index = RuleIndex(RULE_CACHE_USERS)
+
+
+def rules_changed(db: Session, user_id: int):
+    """Recompile the user's rules once db commits"""
+    db.info.setdefault("category_rules", set()).add(user_id)
+
+
+def match_rules(db: Session, user_id: int, descriptions: List[str],
+                amounts: Optional[List[float]] = None, account_ids: Optional[List[int]] = None) -> List[Optional[str]]:
+    """Category from the user's first matching rule for each description (None where no rule applies)"""
+    compiled = rule_index.for_user(db, user_id)
+    if not compiled.rules:
+        return [None] * len(descriptions)
+    amounts = amounts or [0.0] * len(descriptions)
+    account_ids = account_ids or [None] * len(descriptions)
+    return [
+        compiled.category_for(description, amount, account_id)
+        for description, amount, account_id in zip(descriptions, amounts, account_ids)
+    ]
+
+
+def _rule_condition(rule):
+    """SQL expression for a rule's conditions (REGEXP is provided by SQLAlchemy on SQLite)"""
+    conditions = []
+    if rule.description_pattern:
+        conditions.append(Transaction.description.regexp_match("(?i)" + rule.description_pattern))
+    if rule.min_amount is not None:
+        conditions.append(Transaction.amount >= rule.min_amount)
+    if rule.max_amount is not None:
+        conditions.append(Transaction.amount <= rule.max_amount)
+    if rule.account_id is not None:
+        conditions.append(Transaction.account_id == rule.account_id)
+    return and_(*conditions) if conditions else true()
+
+
+def apply_rules_to_history(db: Session, user_id: int) -> int:
+    """
+    Re-categorize the user's existing transactions with their rules
+
+    One UPDATE with a CASE expression (first matching rule wins), then the
+    user's rollups and budget totals are rebuilt with GROUP BY queries.
+    Transactions the user categorized by hand, and ones still pending
+    deferred classification, are left alone. Nothing is committed.
+
+    Returns:
+        Number of transactions whose category changed
+    """
+    compiled = rule_index.for_user(db, user_id)
+    if not compiled.rules:
+        return 0
+
+    whens = [(_rule_condition(rule), rule.category_name) for rule in compiled.rules]
+    new_category = case(*whens, else_=Transaction.category_name)
+    status = Transaction.classification_status
+    changed = db.execute(
+        update(Transaction)
+        .where(
+            Transaction.user_id == user_id,
+            or_(status.is_(None), status == "refined"),
+            or_(*(condition for condition, _ in whens)),
+            func.coalesce(Transaction.category_name, "") != new_category
+        )
+        .values(category_name=new_category)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if changed:
+        rebuild_rollups(db, user_id)
+        sync_budget_spent(db, user_id)
+    return changed
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    user_ids = session.info.pop("category_rules", None)
+    if user_ids:
+        rule_index.invalidate(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop("category_rules", None)
@@ -0,0 +1,149 @@
+"""
+Shared HTTP client for the chatbot's text-generation upstream
+One pooled httpx.AsyncClient per process instead of one per chat message,
+so messages reuse warm keep-alive connections (no TCP/TLS handshake each
+time). HTTP/2 is used when the optional `h2` package is installed. A
+semaphore caps requests in flight; callers beyond the cap wait for a slot
+rather than opening more connections.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from hf_classifier import aclose_client
+
+MAX_CONCURRENCY = int(os.getenv("FINORA_CHAT_MAX_CONCURRENCY", "32"))  # Requests in flight
+MAX_KEEPALIVE = int(os.getenv("FINORA_CHAT_MAX_KEEPALIVE", str(MAX_CONCURRENCY)))
+KEEPALIVE_EXPIRY = float(os.getenv("FINORA_CHAT_KEEPALIVE_SECONDS", "60"))  # Idle connection lifetime
+CONNECT_TIMEOUT = float(os.getenv("FINORA_CHAT_CONNECT_TIMEOUT", "5.0"))
+REQUEST_TIMEOUT = float(os.getenv("FINORA_CHAT_TIMEOUT", "30.0"))
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+USE_HTTP2 = HTTP2_AVAILABLE and os.getenv("FINORA_CHAT_HTTP2", "1") == "1"
+
+
+class UpstreamClient:
+    """
+    Process-wide pooled client (started at app startup, closed at shutdown)
+
+    Like the classifier's client, the httpx client and semaphore belong to
+    the event loop that created them; a call from a different running loop
+    gets fresh ones and the old client is closed.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._semaphore = None
+        self._loop = None
+        self.in_flight = 0
+        self.stats_counters = {
+            "requests": 0, "errors": 0, "waited_for_slot": 0, "max_in_flight": 0,
+            "clients_created": 0, "total_seconds": 0.0,
+        }
+        self.http_versions: Dict[str, int] = {}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.client is None or self._loop is not loop:
+            stale, stale_loop = self.client, self._loop
+            self._loop = loop
+            self.client = httpx.AsyncClient(
+                http2=USE_HTTP2,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONCURRENCY,
+                    max_keepalive_connections=MAX_KEEPALIVE,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+            self.stats_counters["clients_created"] += 1
+            if stale is not None:
+                await aclose_client(stale, stale_loop)
+
+    async def close(self):
+        if self.client is not None:
+            client, loop = self.client, self._loop
+            self.client = self._loop = None
+            await aclose_client(client, loop)
+
+    async def post(self, url: str, json: Dict, headers: Optional[Dict] = None,
+                   timeout: Optional[float] = None) -> httpx.Response:
+        """POST through the shared pool; raises httpx errors like client.post"""
+        await self.start()
+        counters = self.stats_counters
+        if self._semaphore.locked():
+            counters["waited_for_slot"] += 1
+        async with self._semaphore:
+            self.in_flight += 1
+            counters["requests"] += 1
+            counters["max_in_flight"] = max(counters["max_in_flight"], self.in_flight)
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(
+                    url, json=json, headers=headers, timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                )
+            except httpx.HTTPError:
+                counters["errors"] += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                counters["total_seconds"] += time.perf_counter() - started
+        self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+        return response
+
+    @asynccontextmanager
+    async def stream(self, url: str, json: Dict, headers: Optional[Dict] = None,
+                     timeout: Optional[float] = None) -> AsyncIterator[httpx.Response]:
+        """
+        POST and read the response body incrementally (async with ... as response)
+
+        The request keeps its concurrency slot until the body is consumed
+        or the caller leaves the block.
+        """
+        await self.start()
+        counters = self.stats_counters
+        if self._semaphore.locked():
+            counters["waited_for_slot"] += 1
+        async with self._semaphore:
+            self.in_flight += 1
+            counters["requests"] += 1
+            counters["max_in_flight"] = max(counters["max_in_flight"], self.in_flight)
+            started = time.perf_counter()
+            try:
+                async with self.client.stream(
+                    "POST", url, json=json, headers=headers,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                ) as response:
+                    self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+                    yield response
+            except httpx.HTTPError:
+                counters["errors"] += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                counters["total_seconds"] += time.perf_counter() - started
+
+    def stats(self) -> Dict:
+        counters = self.stats_counters
+        return {
+            "http2": USE_HTTP2,
+            "max_concurrency": MAX_CONCURRENCY,
+            "in_flight": self.in_flight,
+            **{k: v for k, v in counters.items() if k != "total_seconds"},
+            "mean_request_ms": round(counters["total_seconds"] / counters["requests"] * 1000, 1)
+            if counters["requests"] else 0.0,
+            "http_versions": dict(self.http_versions),
+        }
+
+
+chat_upstream = UpstreamClient()
@@ -3,19 +3,35 @@ Enhanced Finora Chatbot with LangChain integration
 Provides financial advice based on user's spending patterns
 """
 
+import asyncio
+import functools
+import hashlib
 import httpx
 import os
 from datetime import datetime, timedelta
 import json
 import re
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from cache import LRUCache
+from chat_client import chat_upstream
+from conversation_store import ASSISTANT, USER, ConversationStore
 
 HF_API_TOKEN = os.getenv("HUGGINGFACE_API_KEY", "")
 HF_MODEL = "meta-llama/Llama-2-7b-chat-hf"
-HF_API_URL = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
+# Point at a local stand-in (benchmarks/mock_hf_server.py) for tests and benchmarks
+HF_API_URL = os.getenv("HF_CHAT_URL", f"https://api-inference.huggingface.co/models/{HF_MODEL}")
+
+# Model replies shared between users asking the same thing (see ResponseCache)
+RESPONSE_CACHE_SIZE = int(os.getenv("FINORA_CHAT_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("FINORA_CHAT_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("FINORA_CHAT_CACHE_TTL_SECONDS", "3600"))
 
-# Store conversation history (in production, use database)
-conversation_history = {}
+# Per-user sessions (history + spending context), see conversation_store.py
+HISTORY_MESSAGES = int(os.getenv("FINORA_CHAT_HISTORY_MESSAGES", "20"))
+SESSION_IDLE_TTL = float(os.getenv("FINORA_CHAT_SESSION_TTL_SECONDS", str(24 * 3600)))
+SESSIONS_MAX_BYTES = int(os.getenv("FINORA_CHAT_SESSIONS_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_STORE_PATH = os.getenv("FINORA_CHAT_SESSION_PATH", "")  # SQLite file; "" keeps sessions in memory only
 
 # Pre-built helpful responses for common queries
 QUICK_RESPONSES = {
@@ -53,32 +69,139 @@ BUDGET ADVICE:
 Be concise and helpful. Always encourage tracking expenses."""
 
 
+# Articles and politeness that don't change what is being asked ("Hi, how do I
+# save money? Thanks!" ~ "how do I save money"). Pronouns, verbs and
+# quantifiers stay: "do I have any more money" is not "have money".
+FILLER_WORDS = frozenset("a an the please hi hello hey thanks thank".split())
+
+
+class ChatStreamError(Exception):
+    """The upstream failed after part of a streamed reply was sent"""
+
+    def __init__(self, message: str, partial_reply: str):
+        super().__init__(message)
+        self.partial_reply = partial_reply
+
+
+class ResponseCache:
+    """
+    Upstream model replies keyed by normalized prompt plus context fingerprint
+
+    The fingerprint covers everything else the reply depends on: the user's
+    spending context and the earlier turns that go into the prompt. Users
+    without context asking the same opening question share an entry;
+    personalized ones only when their context hashes match. Only complete,
+    successful replies are stored.
+
+    get_or_fetch also coalesces misses: concurrent callers with the same key
+    await one upstream call instead of each making their own.
+    """
+
+    def __init__(self, maxsize: int, max_bytes: int, ttl: float):
+        self.entries = LRUCache(maxsize, ttl=ttl, max_bytes=max_bytes)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.fetches = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        words = re.sub(r"[^\w\s']", " ", message.lower()).split()
+        return " ".join(word for word in words if word not in FILLER_WORDS)
+
+    @staticmethod
+    def fingerprint(context: Optional[dict], previous_turns: list) -> str:
+        if not context and not previous_turns:
+            return ""
+        context = {k: v for k, v in (context or {}).items() if k != "timestamp"}
+        raw = json.dumps({"context": context, "turns": previous_turns}, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    def key(self, message: str, context: Optional[dict], previous_turns: list) -> str:
+        return f"{self.fingerprint(context, previous_turns)}:{self.normalize(message)}"
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def set(self, key: str, reply: str):
+        self.entries.set(key, reply)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Tuple[str, bool]]]) -> str:
+        """
+        Cached reply, else the reply from fetch() -> (reply, cacheable)
+
+        The upstream call runs as its own task that every waiter shields, so
+        a caller that disconnects doesn't cancel it for the others (and its
+        reply is still cached). Errors from fetch() reach every waiter.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        task = self._in_flight.get(key)
+        # Tasks belong to the loop that created them, like chat_upstream's client
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.fetches += 1
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._landed, key))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Tuple[str, bool]]]) -> str:
+        reply, cacheable = await fetch()
+        if cacheable:
+            self.set(key, reply)
+        return reply
+
+    def _landed(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved, so an error every waiter abandoned isn't logged
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict:
+        return {
+            **self.entries.stats(),
+            "upstream_fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+
+
 class FinoraChat:
     """Enhanced chatbot with conversation memory"""
     
-    def __init__(self):
-        self.conversation_history = {}
-        self.user_context = {}
+    def __init__(self, sessions: Optional[ConversationStore] = None):
+        self.sessions = sessions if sessions is not None else ConversationStore(
+            HISTORY_MESSAGES, SESSION_IDLE_TTL, SESSIONS_MAX_BYTES, SESSION_STORE_PATH
+        )
     
     def add_user_context(self, user_id: str, context: dict):
         """Add user spending context for personalized advice"""
-        self.user_context[user_id] = {
+        self.sessions.set_context(user_id, {
             "total_spent": context.get("total_spent", 0),
             "spending_by_category": context.get("spending_by_category", {}),
             "monthly_budget": context.get("monthly_budget", 0),
             "goals": context.get("goals", []),
-            "timestamp": datetime.utcnow()
-        }
+            "timestamp": datetime.utcnow().isoformat()
+        })
     
-    def get_conversation_history(self, user_id: str):
-        """Get user's conversation history"""
-        if user_id not in self.conversation_history:
-            self.conversation_history[user_id] = []
-        return self.conversation_history[user_id]
+    def get_conversation_history(self, user_id: str) -> list:
+        """Get user's conversation history (a copy, oldest first)"""
+        return self.sessions.history(user_id)
     
     def build_context_prompt(self, user_id: str) -> str:
         """Build a context-aware system prompt with user's spending data"""
-        context = self.user_context.get(user_id, {})
+        context = self.sessions.context(user_id) or {}
         
         context_str = SYSTEM_PROMPT
         
@@ -108,17 +231,13 @@ Current User Context:
             Chatbot response
         """
         
+        await self.sessions.restore(user_id)  # An evicted session comes back from disk off the event loop
         lower_msg = user_message.lower()
         
         # Check for quick responses to common queries
         for keyword, response in QUICK_RESPONSES.items():
             if keyword in lower_msg:
-                # Add to history
-                history = self.get_conversation_history(user_id)
-                history.append({"role": "user", "content": user_message})
-                history.append({"role": "assistant", "content": response})
-                if len(history) > 20:
-                    self.conversation_history[user_id] = history[-20:]
+                self._remember(user_id, user_message, response)
                 return response
         
         # If no quick match and no API key, provide helpful fallback
@@ -136,21 +255,17 @@ What would you like help with?"""
         if user_context:
             self.add_user_context(user_id, user_context)
         
-        # Get conversation history
-        history = self.get_conversation_history(user_id)
-        history.append({"role": "user", "content": user_message})
+        # Conversation so far plus the new message (recorded with the reply)
+        history = self.get_conversation_history(user_id) + [{"role": "user", "content": user_message}]
         
-        # Use AI API for more complex queries
+        # Use AI API for more complex queries; identical concurrent questions
+        # share one call (same key = same prompt), each user gets their own history entry
         try:
-            response = await self._call_hf_api(user_id, user_message, history)
-            
-            # Add to history
-            history.append({"role": "assistant", "content": response})
-            
-            # Keep history size manageable
-            if len(history) > 20:
-                self.conversation_history[user_id] = history[-20:]
-            
+            response = await response_cache.get_or_fetch(
+                self._cache_key(user_id, user_message),
+                lambda: self._call_hf_api(user_id, user_message, history)
+            )
+            self._remember(user_id, user_message, response)
             return response
         
         except Exception as e:
@@ -164,8 +279,13 @@ Common topics I can help with:
 
 Try asking about budgets, saving, categories, affordability, or goals!"""
     
-    async def _call_hf_api(self, user_id: str, user_message: str, history: list) -> str:
-        """Call HuggingFace API with better error handling and response extraction"""
+    def _cache_key(self, user_id: str, user_message: str) -> str:
+        """ResponseCache key; the two previous messages are part of the prompt (see _build_payload)"""
+        previous_turns = self.get_conversation_history(user_id)[-2:]
+        return response_cache.key(user_message, self.sessions.context(user_id), previous_turns)
+    
+    def _build_payload(self, history: list) -> dict:
+        """Text-generation request for the last few turns of the conversation"""
         
         # Build a more targeted prompt
         recent_context = "\n".join([f"{m['role'].capitalize()}: {m['content']}" for m in history[-3:]])
@@ -177,8 +297,7 @@ Conversation:
 
 Provide a helpful, concise response (under 200 words):"""
         
-        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
-        payload = {
+        return {
             "inputs": full_prompt,
             "parameters": {
                 "max_new_tokens": 200,
@@ -187,52 +306,162 @@ Provide a helpful, concise response (under 200 words):"""
                 "do_sample": True
             }
         }
+    
+    def _remember(self, user_id: str, user_message: str, response: str):
+        """Record a finished exchange (the store keeps the last HISTORY_MESSAGES)"""
+        self.sessions.append(user_id, (USER, user_message), (ASSISTANT, response))
+    
+    async def stream_response(self, user_id: str, user_message: str,
+                              user_context: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        get_response, yielding the reply in pieces as the upstream generates it
+        
+        Quick responses and fallbacks come as a single piece. The exchange is
+        added to the conversation history only once the whole reply has been
+        streamed; an interrupted stream leaves the history as it was.
+        
+        Raises:
+            ChatStreamError: the upstream failed (or ended without its final
+                event) after some pieces were yielded; the partial reply is
+                neither remembered nor cached
+        
+        Args:
+            user_id: User identifier
+            user_message: User's question/statement
+            user_context: Optional user's spending data
+        
+        Yields:
+            Chunks of the chatbot response
+        """
+        
+        await self.sessions.restore(user_id)
+        lower_msg = user_message.lower()
+        for keyword, response in QUICK_RESPONSES.items():
+            if keyword in lower_msg:
+                yield response
+                self._remember(user_id, user_message, response)
+                return
+        
+        if not HF_API_TOKEN:
+            yield await self.get_response(user_id, user_message, user_context)
+            return
+        
+        if user_context:
+            self.add_user_context(user_id, user_context)
         
+        cache_key = self._cache_key(user_id, user_message)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            self._remember(user_id, user_message, cached)
+            return
+        
+        # The new message is only in a copy until the reply is complete
+        history = self.get_conversation_history(user_id) + [{"role": "user", "content": user_message}]
+        payload = self._build_payload(history)
+        payload["stream"] = True
+        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+        
+        pieces = []
+        finished = False
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    HF_API_URL,
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, list) and len(result) > 0:
-                        text = result[0].get("generated_text", "")
-                        
-                        # Better response extraction - remove the original prompt
-                        # Find where the prompt ends and the response begins
-                        if "Provide a helpful, concise response (under 200 words):" in text:
-                            response_text = text.split("Provide a helpful, concise response (under 200 words):")[-1].strip()
-                        else:
-                            response_text = text.strip()
-                        
-                        # Clean up any remaining artifacts
-                        response_text = response_text.replace("\n\nAssistant:", "").strip()
-                        response_text = re.sub(r'^[:\s]+', '', response_text).strip()
-                        
-                        # Ensure we have actual content
-                        if response_text and len(response_text.strip()) > 10:
-                            return response_text
-                        else:
-                            return "Let me help you with your finance question. Can you provide more details about what you'd like to know?"
+            async with chat_upstream.stream(HF_API_URL, json=payload, headers=headers, timeout=30.0) as response:
+                if response.status_code == 429:
+                    yield "The AI is busy right now. Please try again in a moment, or ask me about budgeting basics!"
+                    return
+                elif response.status_code == 401:
+                    yield "Chatbot authentication error. Please check your API configuration."
+                    return
+                elif response.status_code != 200:
+                    yield "Temporary issue connecting to AI. Try asking about budgeting basics or the 50/30/20 rule!"
+                    return
+                # Text Generation Inference SSE: data: {"token": {"text": ..., "special": ...}, ...}
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if event.get("error"):
+                        raise ValueError(event["error"])
+                    # The last event carries the whole generated_text
+                    finished = event.get("generated_text") is not None
+                    token = event.get("token") or {}
+                    text = token.get("text", "")
+                    if not text or token.get("special"):
+                        continue
+                    if not pieces:
+                        text = text.lstrip()
+                    pieces.append(text)
+                    yield text
+                if not finished:
+                    raise ValueError("stream ended before the final event")
+        except (httpx.HTTPError, ValueError) as e:
+            if pieces:
+                raise ChatStreamError(str(e) or type(e).__name__, "".join(pieces).strip()) from e
+            yield "The chatbot took too long to respond. Try asking about budgets or money-saving tips instead!"
+            return
+        
+        reply = "".join(pieces).strip()
+        if reply:
+            self._remember(user_id, user_message, reply)
+            if len(reply) > 10:
+                response_cache.set(cache_key, reply)
+    
+    async def _call_hf_api(self, user_id: str, user_message: str, history: list) -> Tuple[str, bool]:
+        """
+        Call HuggingFace API with better error handling and response extraction
+        
+        Returns:
+            (reply, cacheable) - cacheable is False for fallbacks and error messages
+        """
+        
+        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+        payload = self._build_payload(history)
+        
+        try:
+            # Shared keep-alive pool (chat_client.py) instead of a new client per message
+            response = await chat_upstream.post(
+                HF_API_URL,
+                json=payload,
+                headers=headers,
+                timeout=30.0
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                if isinstance(result, list) and len(result) > 0:
+                    text = result[0].get("generated_text", "")
+                    
+                    # Better response extraction - remove the original prompt
+                    # Find where the prompt ends and the response begins
+                    if "Provide a helpful, concise response (under 200 words):" in text:
+                        response_text = text.split("Provide a helpful, concise response (under 200 words):")[-1].strip()
+                    else:
+                        response_text = text.strip()
+                    
+                    # Clean up any remaining artifacts
+                    response_text = response_text.replace("\n\nAssistant:", "").strip()
+                    response_text = re.sub(r'^[:\s]+', '', response_text).strip()
                     
-                    return "I couldn't generate a response. Please try again."
+                    # Ensure we have actual content
+                    if response_text and len(response_text.strip()) > 10:
+                        return response_text, True
+                    else:
+                        return "Let me help you with your finance question. Can you provide more details about what you'd like to know?", False
                 
-                elif response.status_code == 429:
-                    return "The AI is busy right now. Please try again in a moment, or ask me about budgeting basics!"
-                elif response.status_code == 401:
-                    return "Chatbot authentication error. Please check your API configuration."
-                else:
-                    return f"Temporary issue connecting to AI. Try asking about budgeting basics or the 50/30/20 rule!"
+                return "I couldn't generate a response. Please try again.", False
+            
+            elif response.status_code == 429:
+                return "The AI is busy right now. Please try again in a moment, or ask me about budgeting basics!", False
+            elif response.status_code == 401:
+                return "Chatbot authentication error. Please check your API configuration.", False
+            else:
+                return f"Temporary issue connecting to AI. Try asking about budgeting basics or the 50/30/20 rule!", False
         
         except httpx.TimeoutException:
-            return "The chatbot took too long to respond. Try asking about budgets or money-saving tips instead!"
+            return "The chatbot took too long to respond. Try asking about budgets or money-saving tips instead!", False
         except Exception as e:
             # Provide helpful fallback instead of error message
-            return "I'm working on your question! In the meantime, remember the 50/30/20 budget rule: 50% for needs, 30% for wants, 20% for savings. What specific area would you like help with?"
+            return "I'm working on your question! In the meantime, remember the 50/30/20 budget rule: 50% for needs, 30% for wants, 20% for savings. What specific area would you like help with?", False
     
     def get_budget_advice(self, total_income: float) -> dict:
         """
@@ -0,0 +1,231 @@
+"""
+Deferred classification of new transactions
+With FINORA_CLASSIFICATION_MODE=deferred, create_transaction inserts the
+row straight away with a provisional category (merchant override or
+keywords) and classification_status="pending". It then enqueues the id
+here. A worker thread drains the queue in batches, asks the model-backed
+classifier (classify_with_hf, on the app's event loop) for the final
+category, and moves the row plus its rollup/budget contribution if the
+category changed.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, update
+
+from classifier import classify_with_hf
+from models import SessionLocal, Transaction
+from rollups import RollupDeltas
+
+CLASSIFICATION_MODE = os.getenv("FINORA_CLASSIFICATION_MODE", "inline")  # "inline" or "deferred"
+DEFERRED_CLASSIFICATION = CLASSIFICATION_MODE == "deferred"
+WORKER_BATCH_SIZE = int(os.getenv("FINORA_CLASSIFICATION_BATCH_SIZE", "64"))
+# Seconds to wait for the remote classifier before the batch counts as failed
+WORKER_TIMEOUT = float(os.getenv("FINORA_CLASSIFICATION_TIMEOUT", "30"))
+# A failed batch is retried this many times, first after WORKER_RETRY_DELAY seconds, doubling each time
+WORKER_MAX_RETRIES = int(os.getenv("FINORA_CLASSIFICATION_RETRIES", "4"))
+WORKER_RETRY_DELAY = float(os.getenv("FINORA_CLASSIFICATION_RETRY_DELAY", "1"))
+
+
+class ClassificationWorker:
+    """
+    In-process queue of transaction ids awaiting their final category
+
+    The queue lives in memory. On start, rows still marked pending in the
+    database are re-enqueued, so a restart loses no work. Refinement is
+    written with a conditional UPDATE
+    (WHERE classification_status = 'pending' AND category_name = provisional).
+    A user recategorizing the transaction in the meantime therefore always
+    wins, and a failed batch can safely be retried. After the retries run
+    out its rows stay pending until the next start.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self._thread = None
+        self._loop = None
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._stop_requested = threading.Event()  # Cuts a retry backoff short
+        self.processed = 0
+        self.changed = 0
+        self.failed_batches = 0
+        self.retries = 0
+        self.last_lag_seconds = None
+        self.max_lag_seconds = 0.0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """
+        Start the worker thread (app startup, deferred mode only); remote
+        calls run on `loop` so they share the app's pooled HF client and
+        circuit breaker
+        """
+        with self._lock:
+            self._loop = loop
+            if self.is_running():
+                return
+            self._stopping = False
+            self._stop_requested.clear()
+            self._thread = threading.Thread(target=self._run, name="classification-worker", daemon=True)
+            self._thread.start()
+        self._recover_pending()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping = True
+        self._stop_requested.set()
+        self.queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def enqueue(self, transaction_id: int) -> bool:
+        """
+        Queue a committed pending row; a no-op (False) when the worker isn't
+        running, since it re-enqueues every pending row when it starts
+        """
+        if not self.is_running():
+            return False
+        self.queue.put((transaction_id, time.monotonic()))
+        return True
+
+    def _recover_pending(self):
+        db = SessionLocal()
+        try:
+            ids = [row[0] for row in db.query(Transaction.id).filter(
+                Transaction.classification_status == "pending"
+            ).order_by(Transaction.id)]
+        finally:
+            db.close()
+        now = time.monotonic()
+        for transaction_id in ids:
+            self.queue.put((transaction_id, now))
+
+    def _next_batch(self) -> List:
+        batch = [self.queue.get()]
+        while len(batch) < WORKER_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping:
+            batch = self._next_batch()
+            items = [item for item in batch if item is not None]
+            if not items or not self._refine_with_retry(items):
+                continue
+            lag = time.monotonic() - min(enqueued_at for _, enqueued_at in items)
+            self.last_lag_seconds = round(lag, 3)
+            self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+
+    def _refine_with_retry(self, items: List) -> bool:
+        """_refine with exponential backoff; False once the retries run out (the rows stay pending)"""
+        for attempt in range(WORKER_MAX_RETRIES + 1):
+            try:
+                self._refine(items)
+                return True
+            except Exception as e:
+                print(f"Deferred classification failed (attempt {attempt + 1}): {str(e)}")
+            if attempt == WORKER_MAX_RETRIES or self._stop_requested.wait(WORKER_RETRY_DELAY * 2 ** attempt):
+                break
+            self.retries += 1
+        self.failed_batches += 1
+        return False
+
+    def _classify(self, descriptions: List[str]) -> List[Dict]:
+        async def classify_all():
+            return await asyncio.gather(*(classify_with_hf(d) for d in descriptions))
+
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            raise RuntimeError("the app's event loop is not running")
+        return asyncio.run_coroutine_threadsafe(classify_all(), loop).result(WORKER_TIMEOUT)
+
+    def _refine(self, items: List):
+        ids = list(dict.fromkeys(transaction_id for transaction_id, _ in items))
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                Transaction.id, Transaction.user_id, Transaction.description, Transaction.category_name,
+                Transaction.transaction_type, Transaction.amount, Transaction.date
+            ).filter(
+                Transaction.id.in_(ids), Transaction.classification_status == "pending"
+            ).all()
+            if not rows:
+                return
+
+            results = self._classify([row.description or "" for row in rows])
+
+            transactions = Transaction.__table__
+            rollup = RollupDeltas()
+            for row, result in zip(rows, results):
+                updated = db.execute(
+                    update(transactions)
+                    .where(
+                        transactions.c.id == row.id,
+                        transactions.c.classification_status == "pending",
+                        transactions.c.category_name == row.category_name
+                    )
+                    .values(category_name=result["category"], classification_status="refined")
+                ).rowcount
+                self.processed += updated
+                if updated and result["category"] != row.category_name:
+                    self.changed += 1
+                    rollup.add(row.user_id, row.date, row.category_name, row.transaction_type, row.amount, sign=-1)
+                    rollup.add(row.user_id, row.date, result["category"], row.transaction_type, row.amount)
+            rollup.apply(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def oldest_pending_seconds(self) -> Optional[float]:
+        with self.queue.mutex:
+            ages = [time.monotonic() - item[1] for item in self.queue.queue if item is not None]
+        return round(max(ages), 3) if ages else None
+
+    def stats(self) -> Dict:
+        return {
+            "mode": CLASSIFICATION_MODE,
+            "queue_depth": self.queue.qsize(),
+            "oldest_queued_seconds": self.oldest_pending_seconds(),
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "processed": self.processed,
+            "changed": self.changed,
+            "failed_batches": self.failed_batches,
+            "retries": self.retries,
+            "worker_alive": self.is_running(),
+        }
+
+
+classification_worker = ClassificationWorker()
+
+
+def pending_status(db, user_id: int) -> Dict:
+    """Deferred classification progress for one user's transactions"""
+    pending = db.query(Transaction).filter(
+        Transaction.user_id == user_id, Transaction.classification_status == "pending"
+    )
+    oldest = pending.with_entities(func.min(Transaction.created_at)).scalar()
+    return {
+        "mode": CLASSIFICATION_MODE,
+        "pending": pending.count(),
+        "pending_transaction_ids": [
+            row[0] for row in pending.with_entities(Transaction.id).order_by(Transaction.id).limit(100)
+        ],
+        "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else None,
+        "queue_depth": classification_worker.queue.qsize(),
+    }
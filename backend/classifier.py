@@ -3,81 +3,395 @@ Expense classification service using Hugging Face
 Classifies transactions into Bills, Needs, Wants, Goals categories
 """
 
-import httpx
+import hashlib
+import json
 import os
-from typing import Dict, List
-
-HF_API_TOKEN = os.getenv("HUGGINGFACE_API_KEY", "")
-HF_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"  # Default
-HF_API_URL = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
-
-# Category keywords for classification
-CATEGORY_KEYWORDS = {
-    "Bills": {
-        "keywords": ["rent", "utilities", "electricity", "water", "gas", "internet", "phone", "insurance", "mortgage", "taxes"],
-        "emoji": "🏠",
-        "color": "#10B981"
-    },
-    "Groceries": {
-        "keywords": ["grocery", "groceries", "supermarket", "market", "food", "walmart", "costco", "trader joe", "whole foods"],
-        "emoji": "🛒",
-        "color": "#3B82F6"
-    },
-    "Rent": {
-        "keywords": ["rent", "lease", "landlord"],
-        "emoji": "🏡",
-        "color": "#10B981"
-    },
-    "Vacation": {
-        "keywords": ["vacation", "hotel", "airbnb", "flight", "travel", "resort", "beach", "trip"],
-        "emoji": "🏖️",
-        "color": "#A78BFA"
-    },
-    "Utilities": {
-        "keywords": ["electric", "water", "gas bill", "utility"],
-        "emoji": "⚡",
-        "color": "#F59E0B"
-    },
-    "Dining": {
-        "keywords": ["restaurant", "cafe", "coffee", "pizza", "burger", "sushi", "lunch", "dinner"],
-        "emoji": "🍽️",
-        "color": "#EC4899"
-    },
-    "Transportation": {
-        "keywords": ["uber", "lyft", "taxi", "gas station", "petrol", "parking", "car"],
-        "emoji": "🚗",
-        "color": "#06B6D4"
-    },
-    "Entertainment": {
-        "keywords": ["movie", "cinema", "netflix", "spotify", "gaming", "concert", "game"],
-        "emoji": "🎬",
-        "color": "#8B5CF6"
-    },
-    "Shopping": {
-        "keywords": ["amazon", "mall", "store", "shop", "clothing", "fashion", "online"],
-        "emoji": "🛍️",
-        "color": "#EC4899"
-    },
-    "Fitness": {
-        "keywords": ["gym", "fitness", "yoga", "sport", "exercise"],
-        "emoji": "💪",
-        "color": "#06B6D4"
-    },
-}
-
-CATEGORY_TYPE_MAP = {
-    "Bills": "Bills",
-    "Rent": "Bills",
-    "Utilities": "Bills",
-    "Insurance": "Bills",
-    "Groceries": "Needs",
-    "Dining": "Needs",
-    "Transportation": "Needs",
-    "Fitness": "Needs",
-    "Vacation": "Wants",
-    "Entertainment": "Wants",
-    "Shopping": "Wants",
-}
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+from cache import LRUCache, SQLiteCache
+from learned_classifier import learned_classifier, MIN_CONFIDENCE as LEARNED_MIN_CONFIDENCE
+
+# Versioned category taxonomy (keywords, emoji, colors, types); edit the file
+# and bump "version" to roll out a change without a restart
+TAXONOMY_PATH = os.getenv(
+    "FINORA_TAXONOMY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "taxonomy.json")
+)
+# How often (seconds) classification calls check the file for changes
+TAXONOMY_POLL_SECONDS = float(os.getenv("FINORA_TAXONOMY_POLL_SECONDS", "5"))
+
+# Bump when scoring changes so persisted cache entries are discarded
+CLASSIFIER_VERSION = 2
+
+CLASSIFIER_CACHE_SIZE = int(os.getenv("FINORA_CLASSIFIER_CACHE_SIZE", "50000"))
+CLASSIFIER_CACHE_PATH = os.getenv("FINORA_CLASSIFIER_CACHE_PATH", "classifier_cache.db")  # "" disables the disk tier
+CLASSIFIER_CACHE_DISK_ROWS = int(os.getenv("FINORA_CLASSIFIER_CACHE_DISK_ROWS", "1000000"))
+
+_DIGIT_RUNS = re.compile(r"\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_description(description: str) -> str:
+    """
+    Merchant key for a description: lowercase, digit runs -> "#",
+    whitespace collapsed ("TESCO STORES 1234" -> "tesco stores #"). Used
+    for overrides and the learned model; keyword scoring uses the lighter
+    CompiledTaxonomy.match_key so its results don't change.
+    """
+    return _WHITESPACE.sub(" ", _DIGIT_RUNS.sub("#", description.lower())).strip()
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Regex alternation for `words` factored into a prefix trie
+
+    Optional suffixes are greedy, so at a given position the longest word
+    that matches there is returned.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        alternation = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{alternation})?" if "" in node else alternation
+
+    return build(trie)
+
+
+class CompiledTaxonomy:
+    """
+    A taxonomy's keywords compiled into one regex scanned once per description
+
+    Scoring matches the original per-keyword loop: a category scores one
+    point for each of its keywords occurring anywhere in the lowercased
+    description (plain substring, overlaps allowed), and ties go to the
+    category listed first. The pattern is a zero-width lookahead around a
+    keyword trie, so every start position reports the longest keyword
+    beginning there; shorter keywords that are prefixes of it ("gas" in
+    "gas station") are added from a precomputed table.
+    """
+
+    def __init__(self, categories: Dict[str, Dict], type_map: Dict[str, str], default: str = "Shopping",
+                 version: int = 0):
+        self.info = categories
+        self.type_map = type_map
+        self.categories = list(categories)
+        self.default = default
+        self.version = version
+        self.all_categories = [
+            {"name": name, "type": type_map.get(name, "Wants"), "emoji": info["emoji"], "color": info["color"]}
+            for name, info in categories.items()
+        ]
+        self.category_map = {c["name"]: c for c in self.all_categories}
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [CLASSIFIER_VERSION, categories, type_map, default], sort_keys=True
+        ).encode()).hexdigest()[:16]
+
+        # Keywords are matched as written, like the original loop did
+        listed = [info["keywords"] for info in categories.values()]
+        keywords = sorted({k for category_keywords in listed for k in category_keywords if k})
+        # An empty keyword is a substring of every description
+        self.base_scores = [category_keywords.count("") for category_keywords in listed]
+
+        # keyword -> category indexes, repeated if a category lists it twice
+        self.keyword_categories = {
+            keyword: [i for i, category_keywords in enumerate(listed) for k in category_keywords if k == keyword]
+            for keyword in keywords
+        }
+        # Digit runs can only be folded into "#" if no keyword could tell them apart
+        self.folds_digits = not any(c.isdigit() or c == "#" for keyword in keywords for c in keyword)
+        self.scans_joined = not any("\n" in keyword for keyword in keywords)
+        self.prefixes = {
+            keyword: [k for k in keywords if keyword.startswith(k)]
+            for keyword in keywords
+        }
+        self.pattern = re.compile("(?=(" + _trie_pattern(keywords) + "))") if keywords else None
+
+    def match_key(self, description: str) -> str:
+        """
+        The lowercased description, with digit runs as "#" when that can't
+        change which keywords match ("TESCO STORES 1234" -> "tesco stores #").
+        Whitespace is left alone: "gas  station" must not match "gas station".
+        """
+        text = description.lower()
+        return _DIGIT_RUNS.sub("#", text) if self.folds_digits else text
+
+    def keywords_in(self, text: str) -> set:
+        """Distinct keywords occurring in a match_key text"""
+        found = set()
+        if self.pattern is not None:
+            for match in self.pattern.finditer(text):
+                found.update(self.prefixes[match.group(1)])
+        return found
+
+    def score(self, keywords: set):
+        """(best category, matches) for a set of matched keywords"""
+        scores = list(self.base_scores)
+        for keyword in keywords:
+            for i in self.keyword_categories[keyword]:
+                scores[i] += 1
+        max_matches = max(scores, default=0)
+        if not max_matches:
+            return self.default, 0
+        return self.categories[scores.index(max_matches)], max_matches
+
+    def keywords_in_many(self, texts: List[str]) -> List[set]:
+        """
+        keywords_in for many match_key texts with a single regex scan
+
+        Texts are joined with newlines, so no match can cross a boundary
+        unless a keyword contains a newline (those taxonomies scan each text
+        on its own); each hit is mapped back to its text by bisecting the
+        start offsets.
+        """
+        if not self.scans_joined:
+            return [self.keywords_in(text) for text in texts]
+        found = [set() for _ in texts]
+        if self.pattern is None or not texts:
+            return found
+        starts = list(accumulate((len(text) + 1 for text in texts[:-1]), initial=0))
+        for match in self.pattern.finditer("\n".join(texts)):
+            found[bisect_right(starts, match.start()) - 1].update(self.prefixes[match.group(1)])
+        return found
+
+    def classify(self, text: str) -> Dict:
+        """Classification result for a match_key text"""
+        return self.result(*self.score(self.keywords_in(text)))
+
+    def classify_many(self, texts: List[str]) -> List[Dict]:
+        """classify for many match_key texts, scanned in one pass"""
+        return [self.result(*self.score(keywords)) for keywords in self.keywords_in_many(texts)]
+
+    def result(self, best_category: str, max_matches: int = 0, confidence: Optional[float] = None) -> Dict:
+        """Result dict for a scored category (or one with a known confidence)"""
+        category_info = self.info.get(best_category, self.info[self.default])
+        if confidence is None:
+            confidence = min(0.95, 0.5 + (max_matches * 0.15))  # Higher confidence with more matches
+        return {
+            "category": best_category,
+            "category_type": self.type_map.get(best_category, "Wants"),
+            "emoji": category_info["emoji"],
+            "color": category_info["color"],
+            "confidence": confidence
+        }
+
+
+class ClassificationCache:
+    """
+    match_key text -> classification result, in two tiers
+
+    A bounded in-process LRU sits in front of a SQLite file that survives
+    restarts. Entries are scoped to a namespace (taxonomy fingerprint):
+    memory keys include it, and the disk tier drops other namespaces when
+    it changes. Keys in both tiers also carry the learned model version, so
+    a retrain only stops old entries being read; they age out of the
+    bounded tiers instead of the disk tier being wiped on every retrain.
+    The disk tier is opened on first use; if it can't be opened the cache
+    carries on memory-only.
+    """
+
+    def __init__(self, maxsize: int, path: str, max_disk_rows: int):
+        self.memory = LRUCache(maxsize)
+        self.path = path
+        self.max_disk_rows = max_disk_rows
+        self._disk = None
+        self._disk_failed = not path
+        self._lock = threading.Lock()
+
+    def _disk_tier(self, namespace: str) -> Optional[SQLiteCache]:
+        if self._disk is None and not self._disk_failed:
+            with self._lock:
+                if self._disk is None and not self._disk_failed:
+                    try:
+                        self._disk = SQLiteCache(self.path, namespace, self.max_disk_rows)
+                    except sqlite3.Error as e:
+                        print(f"Classifier disk cache disabled ({self.path}): {str(e)}")
+                        self._disk_failed = True
+        if self._disk is not None:
+            self._disk.set_namespace(namespace)
+        return self._disk
+
+    def get_many(self, namespace: str, version: str, keys: List[str]) -> Dict[str, Dict]:
+        found = {}
+        for key in keys:
+            value = self.memory.get((namespace, version, key))
+            if value is not None:
+                found[key] = value
+
+        missing = [key for key in keys if key not in found]
+        disk = self._disk_tier(namespace) if missing else None
+        if disk is not None:
+            stored = disk.get_many([f"{version}:{key}" for key in missing])
+            for key in missing:
+                value = stored.get(f"{version}:{key}")
+                if value is not None:
+                    self.memory.set((namespace, version, key), value)
+                    found[key] = value
+        return found
+
+    def put_many(self, namespace: str, version: str, results: Dict[str, Dict]):
+        for key, value in results.items():
+            self.memory.set((namespace, version, key), value)
+        disk = self._disk_tier(namespace)
+        if disk is not None:
+            disk.set_many({f"{version}:{key}": value for key, value in results.items()}, namespace=namespace)
+
+    def clear(self):
+        self.memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self._disk.stats() if self._disk is not None else None,
+        }
+
+
+def load_taxonomy(path: str) -> CompiledTaxonomy:
+    """
+    Read, validate and compile a taxonomy file
+
+    Raises:
+        ValueError: if the file is not valid JSON or not a usable taxonomy
+        OSError: if it can't be read
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    version = data.get("version")
+    categories = data.get("categories")
+    type_map = data.get("category_types", {})
+    default = data.get("default_category", "Shopping")
+    if not isinstance(version, int):
+        raise ValueError("taxonomy needs an integer \"version\"")
+    if not isinstance(categories, dict) or not categories:
+        raise ValueError("taxonomy needs a non-empty \"categories\" object")
+    for name, info in categories.items():
+        if not isinstance(info.get("keywords"), list) or not all(isinstance(k, str) for k in info["keywords"]):
+            raise ValueError(f"category {name!r} needs a list of keyword strings")
+        if "emoji" not in info or "color" not in info:
+            raise ValueError(f"category {name!r} needs an emoji and a color")
+    if default not in categories:
+        raise ValueError(f"default category {default!r} is not defined")
+
+    return CompiledTaxonomy(categories, type_map, default, version)
+
+
+class TaxonomyStore:
+    """
+    The live CompiledTaxonomy, reloaded when its file changes
+
+    get() stats the file at most every TAXONOMY_POLL_SECONDS. A changed
+    file is compiled off to the side and published with a single reference
+    assignment, so callers holding the previous taxonomy finish with it
+    while new calls see the new one. A file whose version isn't higher
+    than the live one, or that fails validation, is rejected and the live
+    taxonomy stays in place. Each worker process polls on its own, so all
+    of them pick up the change without a restart. Callbacks registered with
+    subscribe() run with the new taxonomy after it is published.
+    """
+
+    def __init__(self, path: str, poll_seconds: float):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._signature = self._file_signature()
+        self.current = load_taxonomy(path)
+        self._checked_at = time.monotonic()
+        self.reloads = 0
+        self.last_error = None
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call callback(taxonomy) whenever a new taxonomy is published"""
+        self._subscribers.append(callback)
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> CompiledTaxonomy:
+        now = time.monotonic()
+        if now - self._checked_at >= self.poll_seconds:
+            self._checked_at = now  # Other threads keep using the current taxonomy meanwhile
+            self.reload()
+        return self.current
+
+    def reload(self, force: bool = False) -> Dict:
+        """Check the file now and swap in a newer version if there is one"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                signature = self._file_signature()
+                if signature == self._signature and not force:
+                    return self.status(reloaded=False)
+                taxonomy = load_taxonomy(self.path)
+                self._signature = signature
+                if taxonomy.version <= self.current.version:
+                    if taxonomy.fingerprint != self.current.fingerprint:
+                        raise ValueError(
+                            f"file changed but version {taxonomy.version} is not higher than "
+                            f"the live version {self.current.version}"
+                        )
+                    self.last_error = None
+                    return self.status(reloaded=False)
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+                print(f"Keeping taxonomy v{self.current.version}: {str(e)}")
+                return self.status(reloaded=False)
+
+            _publish(taxonomy)
+            self.current = taxonomy
+            self.reloads += 1
+            self.last_error = None
+            for callback in self._subscribers:
+                callback(taxonomy)
+            print(f"✅ Loaded taxonomy v{taxonomy.version} ({len(taxonomy.categories)} categories)")
+            return self.status(reloaded=True)
+
+    def status(self, reloaded: bool = False) -> Dict:
+        return {
+            "version": self.current.version,
+            "fingerprint": self.current.fingerprint,
+            "categories": len(self.current.categories),
+            "path": self.path,
+            "reloaded": reloaded,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+def _publish(taxonomy: CompiledTaxonomy):
+    """Point the module-level names older callers read at a new taxonomy"""
+    global CATEGORY_KEYWORDS, CATEGORY_TYPE_MAP
+    CATEGORY_KEYWORDS = taxonomy.info
+    CATEGORY_TYPE_MAP = taxonomy.type_map
+
+
+taxonomy_store = TaxonomyStore(TAXONOMY_PATH, TAXONOMY_POLL_SECONDS)
+CATEGORY_KEYWORDS = taxonomy_store.current.info  # Snapshot of the live taxonomy; prefer get_taxonomy()
+CATEGORY_TYPE_MAP = taxonomy_store.current.type_map
+
+
+def get_taxonomy() -> CompiledTaxonomy:
+    """The live taxonomy; hold on to the returned object for a consistent view"""
+    return taxonomy_store.get()
+
+
+classification_cache = ClassificationCache(CLASSIFIER_CACHE_SIZE, CLASSIFIER_CACHE_PATH, CLASSIFIER_CACHE_DISK_ROWS)
 
 
 def classify_transaction(description: str, amount: float = 0.0) -> Dict:
@@ -98,44 +412,76 @@ def classify_transaction(description: str, amount: float = 0.0) -> Dict:
         }
     """
     
-    description_lower = description.lower()
+    return classify_batch([description])[0]
+
+
+def classify_batch(descriptions: List[str]) -> List[Dict]:
+    """
+    Classify many descriptions at once, in input order
     
-    # Keyword-based classification (fast, reliable)
-    max_matches = 0
-    best_category = "Shopping"  # Default
+    Descriptions are reduced to their match_key first, so repeats that
+    differ only in case or digits (common in bank feeds) are classified
+    once. Cache lookups are batched. Misses go to the model learned from
+    user corrections first (it reads normalize_description text); anything
+    it isn't confident about is keyword matched, all in one scan. Results come from the classification cache
+    where possible and are shared between equal keys - treat them as
+    read-only.
+    """
     
-    for category, info in CATEGORY_KEYWORDS.items():
-        matches = sum(1 for keyword in info["keywords"] if keyword in description_lower)
-        if matches > max_matches:
-            max_matches = matches
-            best_category = category
+    taxonomy = get_taxonomy()
+    # Results only depend on the learned model once it is consulted
+    model = learned_classifier.model
+    model_version = f"m{model.version}" if learned_classifier.is_active(model) else "k"
+    keys = [taxonomy.match_key(description) for description in descriptions]
+    unique_keys = list(dict.fromkeys(keys))
     
-    category_type = CATEGORY_TYPE_MAP.get(best_category, "Wants")
-    category_info = CATEGORY_KEYWORDS.get(best_category, CATEGORY_KEYWORDS["Shopping"])
+    results = classification_cache.get_many(taxonomy.fingerprint, model_version, unique_keys)
+    missing = [key for key in unique_keys if key not in results]
+    if missing:
+        computed = {}
+        predictions = learned_classifier.predict_many([normalize_description(key) for key in missing], model) or []
+        for key, (label, probability) in zip(missing, predictions):
+            if label in taxonomy.info and probability >= LEARNED_MIN_CONFIDENCE:
+                computed[key] = taxonomy.result(label, confidence=round(min(0.99, probability), 4))
+        unmatched = [key for key in missing if key not in computed]
+        computed.update(zip(unmatched, taxonomy.classify_many(unmatched)))
+        classification_cache.put_many(taxonomy.fingerprint, model_version, computed)
+        results.update(computed)
     
+    return [results[key] for key in keys]
+
+
+def taxonomy_fingerprint() -> str:
+    """Identifies the current keyword taxonomy (changes when it does)"""
+    return get_taxonomy().fingerprint
+
+
+def category_result(category: str, confidence: float) -> Dict:
+    """Result dict for a category chosen outside the classifier (e.g. an override)"""
+    return get_taxonomy().result(category, confidence=confidence)
+
+
+def classifier_stats() -> Dict:
+    """Classification cache and learned model counters for /metrics"""
     return {
-        "category": best_category,
-        "category_type": category_type,
-        "emoji": category_info["emoji"],
-        "color": category_info["color"],
-        "confidence": min(0.95, 0.5 + (max_matches * 0.15))  # Higher confidence with more matches
+        "taxonomy": taxonomy_store.status(),
+        **classification_cache.stats(),
+        "learned_model": learned_classifier.stats(),
     }
 
 
 async def classify_with_hf(description: str) -> Dict:
     """
-    Optional: Use Hugging Face for more advanced classification
-    Falls back to keyword-based if API fails
+    Classify with the remote zero-shot model (see hf_classifier)
+    Falls back to keyword-based if it is disabled, slow or failing
     """
     
+    from hf_classifier import hf_classifier, HF_CLASSIFIER_ENABLED
+    
+    if not HF_CLASSIFIER_ENABLED:
+        return classify_transaction(description)
     try:
-        if not HF_API_TOKEN:
-            return classify_transaction(description)
-        
-        # Use keyword-based as primary (faster, more reliable)
-        result = classify_transaction(description)
-        return result
-        
+        return await hf_classifier.classify(description)
     except Exception as e:
         print(f"Error in HF classification: {str(e)}")
         # Fallback to keyword-based
@@ -144,17 +490,14 @@ async def classify_with_hf(description: str) -> Dict:
 
 def get_category_type_map() -> Dict[str, str]:
     """Get mapping of categories to types"""
-    return CATEGORY_TYPE_MAP
+    return get_taxonomy().type_map
 
 
 def get_all_categories() -> List[Dict]:
     """Get all available categories"""
-    categories = []
-    for category, info in CATEGORY_KEYWORDS.items():
-        categories.append({
-            "name": category,
-            "type": CATEGORY_TYPE_MAP.get(category, "Wants"),
-            "emoji": info["emoji"],
-            "color": info["color"]
-        })
-    return categories
+    return get_taxonomy().all_categories
+
+
+def get_category_map() -> Dict[str, Dict]:
+    """Get categories keyed by name (built with the taxonomy; treat as read-only)"""
+    return get_taxonomy().category_map
@@ -0,0 +1,374 @@
+"""
+Bounded store for chatbot sessions (conversation history + spending context)
+Sessions are kept in LRU order of last use. Each one holds at most
+max_messages compact (role, content) records; sessions idle for longer than
+idle_ttl are dropped, and the least recently used go once the estimated size
+of all sessions passes max_bytes. With a SQLite path, every change is also
+saved to disk by a background flusher and a session missing from memory is
+loaded back from there, so memory stays flat however many users have chatted.
+"""
+
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+USER = "user"
+ASSISTANT = "assistant"
+
+# Rough per-object costs (CPython, 64-bit) for the memory budget
+_SESSION_OVERHEAD = sys.getsizeof(deque(maxlen=20)) + 200  # deque, slots object, dict entry, key
+_MESSAGE_OVERHEAD = sys.getsizeof((USER, ""))  # the tuple; role strings are shared
+
+_PURGE_INTERVAL = 60.0  # Seconds between deletes of expired sessions on disk
+_NOT_READ = object()  # _stored()/_get(): the disk hasn't been read yet
+
+
+class Session:
+    __slots__ = ("messages", "context", "last_seen", "size")
+
+    def __init__(self, max_messages: int, messages=(), context: Optional[dict] = None):
+        self.messages = deque(messages, maxlen=max_messages)
+        self.context = context
+        self.last_seen = time.time()
+        self.size = 0
+
+    def measure(self) -> int:
+        self.size = _SESSION_OVERHEAD + sum(_MESSAGE_OVERHEAD + sys.getsizeof(content) for _, content in self.messages)
+        if self.context:
+            self.size += sys.getsizeof(json.dumps(self.context, default=str))
+        return self.size
+
+
+class SessionDisk:
+    """user_id -> session JSON in its own SQLite file (stdlib sqlite3, like cache.SQLiteCache)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            " user_id TEXT PRIMARY KEY, messages TEXT NOT NULL, context TEXT, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_chat_sessions_updated_at ON chat_sessions (updated_at)")
+
+    def load(self, user_id: str) -> Optional[Tuple[list, Optional[dict], float]]:
+        row = self._conn.execute(
+            "SELECT messages, context, updated_at FROM chat_sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return [tuple(m) for m in json.loads(row[0])], json.loads(row[1]) if row[1] else None, row[2]
+
+    def write(self, changes: Dict[str, Optional[Tuple[list, Optional[dict], float]]], clear_all: bool = False,
+              idle_before: Optional[float] = None):
+        """
+        Apply a batch in one transaction: optionally delete everything (or
+        sessions idle since idle_before), then upsert each (messages,
+        context, last_seen) snapshot and delete users mapped to None
+        """
+        self._conn.execute("BEGIN")
+        try:
+            if clear_all:
+                self._conn.execute("DELETE FROM chat_sessions")
+            elif idle_before is not None:
+                self._conn.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (idle_before,))
+            self._conn.executemany(
+                "DELETE FROM chat_sessions WHERE user_id = ?",
+                [(user_id,) for user_id, record in changes.items() if record is None]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chat_sessions (user_id, messages, context, updated_at) VALUES (?, ?, ?, ?)",
+                [(user_id, json.dumps(messages), json.dumps(context, default=str) if context else None, last_seen)
+                 for user_id, record in changes.items() if record is not None
+                 for messages, context, last_seen in (record,)]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class ConversationStore:
+    """
+    Per-user chat sessions with message caps, idle TTL and a memory budget
+
+    Disk writes never happen on the caller's thread (the chat handlers run
+    on the event loop): a change only records a snapshot of the session in
+    a dirty map, and a flusher thread with its own connection writes what
+    has accumulated in one transaction. Loads look at the snapshots not yet
+    committed before the disk, so a session evicted before its flush
+    doesn't come back stale. Async callers await restore() first, which
+    reads a session missing from memory in a worker thread; the sync
+    methods still read the disk inline on a miss.
+
+    The disk tier is opened on first use; if it can't be opened the store
+    carries on memory-only (evicted sessions are then forgotten). Memory is
+    per process: workers sharing a disk file only see each other's changes
+    for sessions they don't hold in memory.
+    """
+
+    def __init__(self, max_messages: int, idle_ttl: float, max_bytes: int, path: str = ""):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.path = path
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None  # Reader connection, used under _disk_lock
+        self._disk_lock = threading.Lock()
+        self._disk_failed = not path
+        # user_id -> [restore() calls reading it, changed since they started]
+        self._restoring: Dict[str, list] = {}
+        # user_id -> (messages, context, last_seen) snapshot, or None to delete
+        self._dirty: Dict[str, Optional[tuple]] = {}
+        self._writing: Dict[str, Optional[tuple]] = {}  # The batch the flusher is committing
+        self._clear_all = False
+        self._clearing = False
+        self._flush_wanted = threading.Event()
+        self._flusher = None
+        self._stopping = False
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_loads = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def _disk_tier(self) -> Optional[SessionDisk]:
+        if self._disk is None and not self._disk_failed:
+            try:
+                self._disk = SessionDisk(self.path)
+            except sqlite3.Error as e:
+                print(f"Chat session disk tier disabled ({self.path}): {str(e)}")
+                self._disk_failed = True
+                return None
+            self._flusher = threading.Thread(target=self._flush_loop, name="chat-session-flusher", daemon=True)
+            self._flusher.start()
+        return self._disk
+
+    def _flush_loop(self):
+        writer = SessionDisk(self.path)
+        purged_at = 0.0
+        try:
+            while True:
+                self._flush_wanted.wait(_PURGE_INTERVAL)
+                self._flush_wanted.clear()
+                now = time.time()
+                with self._lock:
+                    self._writing, self._dirty = self._dirty, {}
+                    self._clearing, self._clear_all = self._clear_all, False
+                    batch, clear_all, stopping = self._writing, self._clearing, self._stopping
+                purge = now - purged_at > _PURGE_INTERVAL
+                if batch or clear_all or purge:
+                    try:
+                        writer.write(batch, clear_all, idle_before=now - self.idle_ttl if purge else None)
+                        self.flushes += 1
+                        if purge:
+                            purged_at = now
+                    except sqlite3.Error as e:
+                        self.flush_errors += 1
+                        print(f"Chat session flush failed: {str(e)}")
+                        with self._lock:
+                            # Keep the batch for the next attempt unless it was changed again since
+                            self._dirty = {**batch, **self._dirty}
+                            self._clear_all = self._clear_all or clear_all
+                with self._lock:
+                    self._writing = {}
+                    self._clearing = False
+                if stopping:
+                    return
+        finally:
+            writer.close()
+
+    def _stored(self, user_id: str, read=_NOT_READ) -> Optional[Tuple[list, Optional[dict], float]]:
+        """
+        Latest saved state: pending snapshots first, then the disk (or what
+        restore() already read from it); call with the lock held
+        """
+        for pending in (self._dirty, self._writing):
+            if user_id in pending:
+                return pending[user_id]
+        if self._clear_all or self._clearing:
+            return None
+        if read is not _NOT_READ:
+            return read
+        return self._read(self._disk_tier(), user_id)
+
+    def _read(self, disk: Optional[SessionDisk], user_id: str) -> Optional[Tuple[list, Optional[dict], float]]:
+        """disk.load under the reader connection's own lock (the store lock isn't needed)"""
+        if disk is None:
+            return None
+        with self._disk_lock:
+            return disk.load(user_id)
+
+    def _read_in_thread(self, user_id: str) -> Optional[Tuple[list, Optional[dict], float]]:
+        with self._lock:
+            disk = self._disk_tier()  # Opening the file also stays off the event loop
+        return self._read(disk, user_id)
+
+    def _drop(self, user_id: str) -> Session:
+        session = self._sessions.pop(user_id)
+        self.bytes -= session.size
+        return session
+
+    def _expire(self, now: float):
+        """Drop idle sessions; the least recently used are at the front (the flusher purges the disk)"""
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            self._drop(user_id)
+            self.expirations += 1
+
+    def _get(self, user_id: str, create: bool, read=_NOT_READ) -> Optional[Session]:
+        """Live session for user_id (loaded from disk if needed), moved to the back; call with the lock held"""
+        now = time.time()
+        self._expire(now)
+        session = self._sessions.get(user_id)
+        if session is None:
+            stored = self._stored(user_id, read)
+            if stored is not None and stored[2] >= now - self.idle_ttl:
+                session = Session(self.max_messages, stored[0], stored[1])
+                self.disk_loads += 1
+            elif create:
+                session = Session(self.max_messages)
+            else:
+                return None
+            self._sessions[user_id] = session
+            self.bytes += session.measure()
+            self._fit()
+        else:
+            self._sessions.move_to_end(user_id)
+        session.last_seen = now
+        return session
+
+    def _fit(self):
+        """Evict least recently used sessions down to max_bytes (keeping the newest); call with the lock held"""
+        while self.bytes > self.max_bytes and len(self._sessions) > 1:
+            self._drop(next(iter(self._sessions)))
+            self.evictions += 1
+
+    def _changed(self, user_id: str, session: Session):
+        """Re-measure, queue the snapshot for the flusher and enforce the memory budget; call with the lock held"""
+        old_size = session.size
+        self.bytes += session.measure() - old_size
+        if user_id in self._restoring:
+            self._restoring[user_id][1] = True
+        if self._disk_tier() is not None:
+            self._dirty[user_id] = (list(session.messages), session.context, session.last_seen)
+            self._flush_wanted.set()
+        self._fit()
+
+    async def restore(self, user_id: str):
+        """
+        Bring user_id's session into memory (an empty one if there is none),
+        reading the disk in a worker thread so the calls that follow don't
+        block the event loop
+        """
+        with self._lock:
+            if user_id in self._sessions or self._disk_failed:
+                return
+            if any(user_id in pending for pending in (self._dirty, self._writing)) or self._clear_all or self._clearing:
+                self._get(user_id, create=True)  # Known without the disk
+                return
+            restoring = self._restoring.setdefault(user_id, [0, False])
+            restoring[0] += 1
+        read = _NOT_READ
+        try:
+            read = await asyncio.to_thread(self._read_in_thread, user_id)
+        finally:
+            with self._lock:
+                restoring[0] -= 1
+                if not restoring[0]:
+                    del self._restoring[user_id]
+                # A change meanwhile (e.g. clear) may have made the read stale; the next call reads again
+                if read is not _NOT_READ and user_id not in self._sessions and not restoring[1]:
+                    self._get(user_id, create=True, read=read)
+
+    def history(self, user_id: str) -> List[Dict]:
+        """Messages oldest first as {"role", "content"} dicts (a copy)"""
+        with self._lock:
+            session = self._get(user_id, create=False)
+            if session is None:
+                return []
+            return [{"role": role, "content": content} for role, content in session.messages]
+
+    def context(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            session = self._get(user_id, create=False)
+            return session.context if session is not None else None
+
+    def append(self, user_id: str, *messages: Tuple[str, str]):
+        """Add (role, content) messages; the oldest fall off past max_messages"""
+        with self._lock:
+            session = self._get(user_id, create=True)
+            session.messages.extend(messages)
+            self._changed(user_id, session)
+
+    def set_context(self, user_id: str, context: dict):
+        with self._lock:
+            session = self._get(user_id, create=True)
+            session.context = context
+            self._changed(user_id, session)
+
+    def clear(self, user_id: Optional[str] = None):
+        """Forget one user's session, or every session, in both tiers"""
+        with self._lock:
+            for restoring_id, restoring in self._restoring.items():
+                if user_id is None or restoring_id == user_id:
+                    restoring[1] = True
+            if user_id is None:
+                self._sessions.clear()
+                self.bytes = 0
+            elif user_id in self._sessions:
+                self._drop(user_id)
+            if self._disk_tier() is not None:
+                if user_id is None:
+                    self._dirty = {}
+                    self._clear_all = True
+                else:
+                    self._dirty[user_id] = None
+                self._flush_wanted.set()
+
+    def close(self, timeout: float = 5.0):
+        """Write out pending changes and stop the flusher (app shutdown)"""
+        flusher = self._flusher
+        if flusher is None:
+            return
+        with self._lock:
+            self._stopping = True
+        self._flush_wanted.set()
+        flusher.join(timeout)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_messages": self.max_messages,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "disk_path": self.path if self._disk is not None else None,
+            "disk_loads": self.disk_loads,
+            "pending_writes": len(self._dirty) + len(self._writing),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
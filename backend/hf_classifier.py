@@ -0,0 +1,272 @@
+"""
+Remote zero-shot classification through the Hugging Face Inference API
+Concurrent classify() calls are collected into micro-batches and sent over
+one pooled keep-alive httpx.AsyncClient. In-flight batches are capped by
+a semaphore and each call has a deadline. A circuit breaker stops calling
+a failing endpoint for a while. Anything that doesn't get a usable remote
+answer falls back to the keyword classifier.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from cache import LRUCache
+from classifier import (
+    category_result, classify_batch, get_taxonomy, normalize_description, taxonomy_fingerprint
+)
+
+HF_API_TOKEN = os.getenv("HUGGINGFACE_API_KEY", "")
+HF_CLASSIFIER_MODEL = os.getenv("HF_CLASSIFIER_MODEL", "facebook/bart-large-mnli")
+# Point at a local stand-in (benchmarks/mock_hf_server.py) for tests and benchmarks
+HF_CLASSIFIER_URL = os.getenv(
+    "HF_CLASSIFIER_URL", f"https://api-inference.huggingface.co/models/{HF_CLASSIFIER_MODEL}"
+)
+# Remote calls need a token, or an explicitly configured endpoint
+HF_CLASSIFIER_ENABLED = bool(HF_API_TOKEN or os.getenv("HF_CLASSIFIER_URL"))
+
+MAX_BATCH_SIZE = int(os.getenv("HF_CLASSIFIER_MAX_BATCH", "32"))
+BATCH_WINDOW = float(os.getenv("HF_CLASSIFIER_BATCH_WINDOW_MS", "10")) / 1000  # Wait to fill a batch
+MAX_CONCURRENCY = int(os.getenv("HF_CLASSIFIER_MAX_CONCURRENCY", "8"))  # Batches in flight
+CALL_DEADLINE = float(os.getenv("HF_CLASSIFIER_DEADLINE", "3.0"))  # Seconds per classify() call
+REQUEST_TIMEOUT = float(os.getenv("HF_CLASSIFIER_TIMEOUT", "10.0"))  # Seconds per HTTP request
+MIN_REMOTE_CONFIDENCE = float(os.getenv("HF_CLASSIFIER_MIN_CONFIDENCE", "0.4"))
+RESULT_CACHE_SIZE = int(os.getenv("HF_CLASSIFIER_CACHE_SIZE", "20000"))
+
+
+async def aclose_client(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]):
+    """
+    Close a pooled client created on `loop` from the loop running now
+
+    Its connections belong to `loop`. A loop still running in another thread
+    closes them itself. Once that loop has closed, aclose() can only empty
+    the pool, and the sockets are released with their transports.
+    """
+    if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    try:
+        await client.aclose()
+    except RuntimeError:
+        pass  # Event loop is closed
+
+
+class _Rejected(Exception):
+    """Batch dropped because the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one probe is let through (half-open) and its
+    outcome closes or re-opens the circuit
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.probing:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class HFBatchClassifier:
+    """
+    Micro-batching client for a zero-shot classification endpoint
+
+    classify() queues the normalized description and waits on a future.
+    The first item in an empty queue starts a BATCH_WINDOW timer, and a
+    full batch is flushed immediately. Each batch is one POST with
+    {"inputs": [...], "parameters": {"candidate_labels": [...]}}.
+    Everything runs on the event loop, so no locks are needed.
+    """
+
+    def __init__(self, url: str, token: str = ""):
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.client = None
+        self.breaker = CircuitBreaker()
+        self.results = LRUCache(RESULT_CACHE_SIZE)
+        self._semaphore = None
+        self._loop = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle = None
+        self._batches = set()  # In-flight _send tasks; the loop itself only keeps weak references
+        self.stats_counters = {
+            "calls": 0, "batches": 0, "batched_items": 0, "remote_results": 0,
+            "fallbacks": 0, "deadline_exceeded": 0, "http_errors": 0, "breaker_rejections": 0,
+        }
+
+    async def start(self):
+        """
+        Create the pooled client (called at app startup; also done lazily)
+
+        The client and semaphore belong to the event loop that created them,
+        so a different running loop (e.g. TestClient without a context
+        manager) gets fresh ones and the old client is closed.
+        """
+        loop = asyncio.get_running_loop()
+        if self.client is None or self._loop is not loop:
+            stale, stale_loop = self.client, self._loop
+            self._loop = loop
+            self._pending = []
+            self._flush_handle = None
+            self._batches = set()
+            self.client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+            )
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+            if stale is not None:
+                await aclose_client(stale, stale_loop)
+
+    async def close(self):
+        if self.client is not None:
+            batches = list(self._batches)
+            for task in batches:
+                task.cancel()
+            await asyncio.gather(*batches, return_exceptions=True)
+            client, loop = self.client, self._loop
+            self.client = self._loop = None
+            await aclose_client(client, loop)
+
+    async def classify(self, description: str) -> Dict:
+        """Remote classification, or the keyword result if none arrives in time"""
+        self.stats_counters["calls"] += 1
+        key = normalize_description(description)
+        cache_key = (taxonomy_fingerprint(), key)
+        cached = self.results.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if not self.breaker.allow():
+            self.stats_counters["breaker_rejections"] += 1
+            return self._fallback(description)
+
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, future))
+        if len(self._pending) >= MAX_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(BATCH_WINDOW, self._flush)
+
+        try:
+            # shield: a caller giving up must not cancel the batch for everyone else
+            result = await asyncio.wait_for(asyncio.shield(future), CALL_DEADLINE)
+        except asyncio.TimeoutError:
+            self.stats_counters["deadline_exceeded"] += 1
+            result = None
+
+        if result is None:
+            return self._fallback(description)
+        self.results.set(cache_key, result)
+        return result
+
+    def _fallback(self, description: str) -> Dict:
+        self.stats_counters["fallbacks"] += 1
+        return classify_batch([description])[0]
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch, self._pending = self._pending[:MAX_BATCH_SIZE], self._pending[MAX_BATCH_SIZE:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = list(dict.fromkeys(key for key, _ in batch))
+        # Labels follow the live taxonomy, so a reload changes what the model chooses from
+        labels = get_taxonomy().categories
+        results = {}
+        try:
+            async with self._semaphore:
+                # Batches queued behind the semaphore don't pile onto an endpoint that just failed
+                if self.breaker.state == "open":
+                    self.stats_counters["breaker_rejections"] += len(batch)
+                    raise _Rejected()
+                response = await self.client.post(
+                    self.url,
+                    json={"inputs": texts, "parameters": {"candidate_labels": labels, "multi_label": False}},
+                    headers=self.headers,
+                )
+            response.raise_for_status()
+            results = self._parse(texts, response.json())
+            self.breaker.record_success()
+        except _Rejected:
+            pass
+        except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+            self.stats_counters["http_errors"] += 1
+            if self.breaker.state == "closed":
+                print(f"Error in HF classification: {str(e)}")
+            self.breaker.record_failure()
+        finally:
+            # Also on cancellation (close()), so waiting callers fall back right away
+            self.stats_counters["batches"] += 1
+            self.stats_counters["batched_items"] += len(batch)
+            self.stats_counters["remote_results"] += sum(1 for key, _ in batch if results.get(key))
+            for key, future in batch:
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def _parse(self, texts: List[str], body) -> Dict[str, Optional[Dict]]:
+        """Zero-shot response -> {text: result or None}; one entry per input, same order"""
+        if isinstance(body, dict):
+            body = [body]
+        if len(body) != len(texts):
+            raise ValueError(f"expected {len(texts)} results, got {len(body)}")
+        parsed = {}
+        for text, item in zip(texts, body):
+            label, score = item["labels"][0], float(item["scores"][0])
+            parsed[text] = category_result(label, round(score, 4)) if score >= MIN_REMOTE_CONFIDENCE else None
+        return parsed
+
+    def stats(self) -> Dict:
+        counters = self.stats_counters
+        return {
+            "enabled": HF_CLASSIFIER_ENABLED,
+            **counters,
+            "mean_batch_size": round(counters["batched_items"] / counters["batches"], 2) if counters["batches"] else 0.0,
+            "breaker": {"state": self.breaker.state, "times_opened": self.breaker.times_opened},
+            "result_cache": self.results.stats(),
+        }
+
+
+hf_classifier = HFBatchClassifier(HF_CLASSIFIER_URL, HF_API_TOKEN)
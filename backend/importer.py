@@ -0,0 +1,388 @@
+"""
+Streaming bank statement importer (CSV, OFX, QIF)
+Statements are read incrementally from disk, normalized, and written in
+batches through ingest.insert_transactions. Progress is checkpointed with
+every batch, so an interrupted job resumes from its last byte offset.
+"""
+
+import csv
+import html
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+from models import SessionLocal, ImportJob
+from ingest import insert_transactions
+
+IMPORT_DIR = os.getenv("FINORA_IMPORT_DIR", "./imports")
+MAX_IMPORT_BYTES = int(os.getenv("FINORA_IMPORT_MAX_BYTES", "0"))  # Larger uploads get a 413; 0 means no limit
+IMPORT_BATCH_SIZE = 2000
+READ_CHUNK_SIZE = 1024 * 1024  # OFX is scanned in 1 MB chunks
+SUPPORTED_FORMATS = ("csv", "ofx", "qif")
+
+# Jobs running in this process, so a resume can't run the same job twice
+_active_jobs = set()
+_active_lock = threading.Lock()
+
+# Header names (lowercase) recognised for each CSV column role, in priority order
+CSV_COLUMN_ALIASES = {
+    "date": ("date", "transaction date", "posted date", "posting date", "value date", "booking date"),
+    "description": ("description", "transaction description", "details", "narrative", "payee", "name", "memo", "reference"),
+    "amount": ("amount", "transaction amount", "value"),
+    "debit": ("debit", "debit amount", "paid out", "money out", "withdrawal", "withdrawals"),
+    "credit": ("credit", "credit amount", "paid in", "money in", "deposit", "deposits"),
+}
+
+ISO_DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+DAY_FIRST_FORMATS = ["%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y", "%d %b %Y", "%d %B %Y"]
+MONTH_FIRST_FORMATS = ["%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y"]
+
+OFX_FIELD = re.compile(rb"<(\w+)>([^<\r\n]*)")
+OFX_OPEN = b"<STMTTRN>"
+OFX_CLOSE = b"</STMTTRN>"
+
+
+# ==================== NORMALIZATION ====================
+
+class DateParser:
+    """Parse statement dates, remembering the format that last worked"""
+
+    def __init__(self, day_first: bool = True):
+        ambiguous = DAY_FIRST_FORMATS + MONTH_FIRST_FORMATS if day_first else MONTH_FIRST_FORMATS + DAY_FIRST_FORMATS
+        self.formats = ISO_DATE_FORMATS + ambiguous
+        self.last_format = None
+
+    def parse(self, value: str) -> datetime:
+        value = value.strip().replace("'", "/")
+        # OFX: YYYYMMDD[HHMMSS[.XXX][TZ]]
+        if len(value) >= 8 and value[:8].isdigit():
+            return datetime.strptime(value[:8], "%Y%m%d")
+        if self.last_format:
+            try:
+                return datetime.strptime(value, self.last_format)
+            except ValueError:
+                pass
+        for fmt in self.formats:
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            self.last_format = fmt
+            return parsed
+        raise ValueError(f"Unrecognised date: {value!r}")
+
+
+def parse_amount(value: str) -> float:
+    """Parse '£1,234.50', '(12.00)' or '12.00-' into a signed float"""
+    value = re.sub(r"[£$€,\s]", "", value or "")
+    negative = False
+    if value.startswith("(") and value.endswith(")"):
+        value, negative = value[1:-1], True
+    elif value.endswith("-"):
+        value, negative = value[:-1], True
+    amount = float(value)
+    return -amount if negative else amount
+
+
+def normalize_record(record: Dict, dates: DateParser, account_id: int) -> Dict:
+    """
+    Turn a raw parsed record into an ingest.insert_transactions item
+
+    Negative amounts become expenses, positive amounts income.
+
+    Raises:
+        ValueError: if the date, amount or description is unusable
+    """
+    if record.get("amount"):
+        amount = parse_amount(record["amount"])
+    else:
+        credit = abs(parse_amount(record["credit"])) if record.get("credit") else 0.0
+        debit = abs(parse_amount(record["debit"])) if record.get("debit") else 0.0
+        amount = credit - debit
+
+    description = " ".join((record.get("description") or "").split())
+    if not description:
+        raise ValueError("Missing description")
+
+    return {
+        "account_id": account_id,
+        "amount": abs(amount),
+        "description": description,
+        "transaction_type": "income" if amount > 0 else "expense",
+        "date": dates.parse(record.get("date") or ""),
+        "notes": record.get("notes"),
+    }
+
+
+# ==================== PARSERS ====================
+# Each parser yields (raw_record, offset) where offset is the byte position
+# just after the record - restarting the parser there continues with the
+# next record.
+
+def _csv_columns(header) -> Dict[str, int]:
+    names = [h.strip().lower() for h in header]
+    columns = {}
+    for role, aliases in CSV_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[role] = names.index(alias)
+                break
+    if "date" not in columns or "description" not in columns:
+        raise ValueError("CSV needs date and description columns")
+    if "amount" not in columns and "debit" not in columns and "credit" not in columns:
+        raise ValueError("CSV needs an amount column (or debit/credit columns)")
+    return columns
+
+
+def parse_csv(f: BinaryIO, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """
+    Parse a CSV statement with a header row, one record per line
+
+    Quoted fields may contain commas but not line breaks.
+    """
+    f.seek(0)
+    header = next(csv.reader([f.readline().decode("utf-8-sig", errors="replace")]), [])
+    columns = _csv_columns(header)
+    if offset > f.tell():
+        f.seek(offset)
+
+    for line in iter(f.readline, b""):
+        text = line.decode("utf-8", errors="replace").strip()
+        if not text:
+            continue
+        values = next(csv.reader([text]))
+        yield {
+            role: values[index] if index < len(values) else ""
+            for role, index in columns.items()
+        }, f.tell()
+
+
+def parse_ofx(f: BinaryIO, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """Parse <STMTTRN> blocks from an OFX (SGML or XML) statement in chunks"""
+    f.seek(offset)
+    buffer = b""
+    base = offset  # File offset of buffer[0]
+
+    while True:
+        chunk = f.read(READ_CHUNK_SIZE)
+        buffer += chunk
+        pos = 0
+        while True:
+            start = buffer.find(OFX_OPEN, pos)
+            end = buffer.find(OFX_CLOSE, start) if start >= 0 else -1
+            if end < 0:
+                break
+            end += len(OFX_CLOSE)
+            fields = {
+                name.upper().decode(): html.unescape(value.decode("utf-8", errors="replace").strip())
+                for name, value in OFX_FIELD.findall(buffer[start:end])
+            }
+            name = fields.get("NAME") or fields.get("PAYEE") or fields.get("MEMO")
+            memo = fields.get("MEMO")
+            yield {
+                "date": fields.get("DTPOSTED"),
+                "amount": fields.get("TRNAMT"),
+                "description": name,
+                "notes": memo if memo and memo != name else None,
+            }, base + end
+            pos = end
+
+        if not chunk:
+            return
+        # Keep an unfinished block, or enough bytes to catch a tag split across chunks
+        keep_from = start if start >= 0 else max(pos, len(buffer) - len(OFX_OPEN))
+        buffer = buffer[keep_from:]
+        base += keep_from
+
+
+def parse_qif(f: BinaryIO, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """Parse a QIF statement: D(ate), T/U (amount), P(ayee), M(emo), ^ ends a record"""
+    f.seek(offset)
+    record = {}
+    for line in iter(f.readline, b""):
+        text = line.decode("utf-8", errors="replace").strip()
+        if not text or text.startswith("!"):
+            continue
+        code, value = text[0], text[1:].strip()
+        if code == "^":
+            if record:
+                yield record, f.tell()
+            record = {}
+        elif code == "D":
+            record["date"] = value
+        elif code in ("T", "U"):
+            record["amount"] = value
+        elif code == "P":
+            record["description"] = value
+        elif code == "M":
+            record["notes"] = value
+    if record.get("amount"):
+        yield record, f.tell()
+
+
+PARSERS = {"csv": parse_csv, "ofx": parse_ofx, "qif": parse_qif}
+
+
+def detect_format(filename: str, head: bytes) -> str:
+    """Guess the statement format from the file extension, then the content"""
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if extension in SUPPORTED_FORMATS:
+        return extension
+    head = head.lstrip().upper()
+    if head.startswith(b"OFXHEADER") or b"<OFX>" in head:
+        return "ofx"
+    if head.startswith(b"!TYPE") or head.startswith(b"!ACCOUNT"):
+        return "qif"
+    return "csv"
+
+
+# ==================== JOBS ====================
+
+def describe_job(job: ImportJob) -> Dict:
+    """Job fields plus derived progress_percent and rows_per_second"""
+    progress = (job.bytes_processed / job.total_bytes * 100) if job.total_bytes else 100.0
+    rate = (job.rows_processed / job.elapsed_seconds) if job.elapsed_seconds else 0.0
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "account_id": job.account_id,
+        "filename": job.filename,
+        "file_format": job.file_format,
+        "status": job.status,
+        "total_bytes": job.total_bytes,
+        "bytes_processed": job.bytes_processed,
+        "rows_processed": job.rows_processed,
+        "rows_failed": job.rows_failed,
+        "progress_percent": round(progress, 2),
+        "rows_per_second": round(rate, 1),
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def is_job_active(job_id: int) -> bool:
+    """Check if a job is currently running in this process"""
+    with _active_lock:
+        return job_id in _active_jobs
+
+
+def _checkpoint(db, job: ImportJob, batch, failed: int, offset: int, since: float):
+    """Insert a batch and advance the job's offset in the same DB transaction"""
+    results = insert_transactions(db, job.user_id, batch) if batch else []
+    created = sum(1 for r in results if r["status"] == "created")
+    job.rows_processed += created
+    job.rows_failed += failed + len(results) - created
+    job.bytes_processed = offset
+    job.elapsed_seconds += time.perf_counter() - since
+    job.updated_at = datetime.utcnow()
+    db.commit()
+
+
+def run_import(job_id: int):
+    """
+    Run (or resume) an import job to completion
+
+    Safe to call again after a crash: parsing restarts at bytes_processed,
+    which is only advanced together with the rows it covers.
+    """
+    with _active_lock:
+        if job_id in _active_jobs:
+            return
+        _active_jobs.add(job_id)
+
+    db = SessionLocal()
+    try:
+        job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+        if not job or job.status == "completed":
+            return
+
+        job.status = "running"
+        job.error = None
+        db.commit()
+
+        parser = PARSERS[job.file_format]
+        dates = DateParser(job.day_first)
+        batch, failed = [], 0
+        offset = job.bytes_processed
+        since = time.perf_counter()
+
+        with open(job.file_path, "rb") as f:
+            for record, offset in parser(f, job.bytes_processed):
+                try:
+                    batch.append(normalize_record(record, dates, job.account_id))
+                except (ValueError, TypeError):
+                    failed += 1
+                if len(batch) + failed >= IMPORT_BATCH_SIZE:
+                    _checkpoint(db, job, batch, failed, offset, since)
+                    batch, failed = [], 0
+                    since = time.perf_counter()
+
+        _checkpoint(db, job, batch, failed, job.total_bytes, since)
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        os.remove(job.file_path)
+
+    except Exception as e:
+        db.rollback()
+        job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+        if job:
+            job.status = "failed"
+            job.error = str(e)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+        with _active_lock:
+            _active_jobs.discard(job_id)
+
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+
+    from models import init_db
+
+    parser = argparse.ArgumentParser(description="Import a bank statement file")
+    parser.add_argument("--user", type=int, help="user id (new import)")
+    parser.add_argument("--account", type=int, help="account id (new import)")
+    parser.add_argument("--month-first", action="store_true", help="dates are MM/DD")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="resume an existing job")
+    parser.add_argument("path", nargs="?")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    if args.resume:
+        job_id = args.resume
+    else:
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        with open(args.path, "rb") as src:
+            file_format = detect_format(args.path, src.read(1024))
+        stored_path = os.path.join(IMPORT_DIR, f"{int(time.time() * 1000)}-{os.path.basename(args.path)}")
+        shutil.copyfile(args.path, stored_path)
+        new_job = ImportJob(
+            user_id=args.user,
+            account_id=args.account,
+            filename=os.path.basename(args.path),
+            file_format=file_format,
+            file_path=stored_path,
+            day_first=not args.month_first,
+            total_bytes=os.path.getsize(stored_path)
+        )
+        session.add(new_job)
+        session.commit()
+        job_id = new_job.id
+
+    run_import(job_id)
+    session.expire_all()
+    final = describe_job(session.query(ImportJob).filter(ImportJob.id == job_id).first())
+    session.close()
+    print(f"Job {job_id}: {final['status']} - {final['rows_processed']:,} rows "
+          f"({final['rows_failed']:,} failed) at {final['rows_per_second']:,.0f} rows/s"
+          + (f"\nError: {final['error']}" if final["error"] else ""))
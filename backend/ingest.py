@@ -0,0 +1,109 @@
+"""
+Batched transaction write path
+Shared by the bulk transactions endpoint and the statement importer
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import bindparam, insert
+from sqlalchemy.orm import Session
+
+from models import Account, Transaction
+from merchant_overrides import classify_for_user
+from rollups import RollupDeltas
+
+
+def insert_transactions(db: Session, user_id: int, items: List[Dict]) -> List[Dict]:
+    """
+    Classify and insert a batch of transactions for one user
+
+    Accounts are validated with one query, the batch is classified together
+    (the user's merchant overrides first), rows are inserted with a single
+    executemany, each account balance is moved once by its net delta and
+    monthly rollups get one upsert. Nothing is committed - the caller owns
+    the transaction.
+
+    Args:
+        db: Database session
+        user_id: Owner of the transactions
+        items: Dicts with account_id, amount, description and optionally
+            transaction_type, date, notes
+
+    Returns:
+        Per-row results in input order: {"index", "status", "id",
+        "category_name", "detail"}
+    """
+
+    account_ids = {item["account_id"] for item in items}
+    existing_accounts = {
+        row[0] for row in db.query(Account.id).filter(Account.id.in_(account_ids))
+    }
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if item["account_id"] not in existing_accounts:
+            results[index] = {"index": index, "status": "error", "detail": "Account not found"}
+        else:
+            valid.append((index, item))
+
+    if not valid:
+        return results
+
+    classifications = classify_for_user(
+        db, user_id,
+        [item["description"] for _, item in valid],
+        [item["amount"] for _, item in valid],
+        [item["account_id"] for _, item in valid]
+    )
+
+    now = datetime.utcnow()
+    rows = []
+    balance_deltas = defaultdict(float)
+    rollup = RollupDeltas()
+    for (_, item), classification in zip(valid, classifications):
+        transaction_type = item.get("transaction_type") or "expense"
+        rows.append({
+            "user_id": user_id,
+            "account_id": item["account_id"],
+            "amount": item["amount"],
+            "description": item["description"],
+            "category_name": classification["category"],
+            "category_id": None,
+            "transaction_type": transaction_type,
+            "date": item.get("date") or now,
+            "notes": item.get("notes"),
+            "created_at": now,
+        })
+        sign = -1 if transaction_type == "expense" else 1
+        balance_deltas[item["account_id"]] += sign * item["amount"]
+        rollup.add(user_id, rows[-1]["date"], classification["category"], transaction_type, item["amount"])
+
+    # Single executemany; RETURNING keeps ids aligned with input order
+    new_ids = db.execute(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+
+    # One UPDATE per account with the net balance change
+    accounts = Account.__table__
+    db.execute(
+        accounts.update()
+        .where(accounts.c.id == bindparam("account_id"))
+        .values(balance=accounts.c.balance + bindparam("delta")),
+        [{"account_id": account_id, "delta": delta} for account_id, delta in balance_deltas.items()]
+    )
+
+    rollup.apply(db)
+
+    for (index, _), row, new_id in zip(valid, rows, new_ids):
+        results[index] = {
+            "index": index,
+            "status": "created",
+            "id": new_id,
+            "category_name": row["category_name"],
+        }
+
+    return results
@@ -0,0 +1,353 @@
+"""
+Local classifier learned from user corrections
+Every time a user re-categorizes a transaction, the (description, category)
+pair is stored in category_corrections. This module trains a multinomial
+logistic regression over hashed n-gram features from those pairs. It is
+CPU-only, has no dependencies, and classifier.classify_batch consults it
+before falling back to keywords.
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# Feature space size (hashes are masked to this many bits)
+HASH_BITS = 20
+HASH_MASK = (1 << HASH_BITS) - 1
+
+MODEL_PATH = os.getenv("FINORA_CLASSIFIER_MODEL_PATH", "classifier_model.json")
+# Below this many training examples the model is not consulted at all
+MIN_EXAMPLES = int(os.getenv("FINORA_CLASSIFIER_MIN_EXAMPLES", "20"))
+# Predictions below this probability fall back to keyword matching
+MIN_CONFIDENCE = float(os.getenv("FINORA_CLASSIFIER_MIN_CONFIDENCE", "0.7"))
+
+# Seconds to wait after a correction so a burst of them is trained together
+TRAIN_DELAY = float(os.getenv("FINORA_CLASSIFIER_TRAIN_DELAY", "5"))
+
+LEARNING_RATE = 0.2
+EPOCHS = 5
+# Older corrections mixed into each incremental update so it doesn't forget them
+REPLAY_SAMPLE = 1000
+# Recent transactions labelled by the remote model (deferred refinement) and
+# never corrected, as contrast. Keyword or learned labels would only teach
+# the model its own mistakes.
+BACKGROUND_SAMPLE = 1000
+TRAIN_BATCH_SIZE = 5000
+
+
+def extract_features(text: str) -> List[int]:
+    """
+    Hashed features for a normalized description
+
+    Word unigrams and bigrams, plus character trigrams with boundary markers
+    so "sainsburys" and "sainsbury's" still share most features. crc32 is
+    used instead of hash() because it is stable across processes.
+    """
+    words = text.split()
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return list({zlib.crc32(g.encode()) & HASH_MASK for g in grams})
+
+
+class LinearModel:
+    """
+    Sparse multinomial logistic regression
+
+    weights maps feature hash -> {label index: weight}, so only features
+    seen in training take memory. Instances are replaced, not mutated,
+    once published, so readers never see a half-trained model.
+    """
+
+    def __init__(self, labels: Optional[List[str]] = None, weights: Optional[Dict[int, Dict[int, float]]] = None,
+                 bias: Optional[List[float]] = None, version: int = 0, trained_through: int = 0,
+                 examples: int = 0):
+        self.labels = labels or []
+        self.weights = weights or {}
+        self.bias = bias or [0.0] * len(self.labels)
+        self.version = version
+        self.trained_through = trained_through  # Highest category_corrections.id seen
+        self.examples = examples
+
+    def copy(self) -> "LinearModel":
+        return LinearModel(
+            list(self.labels), {f: dict(w) for f, w in self.weights.items()}, list(self.bias),
+            self.version, self.trained_through, self.examples
+        )
+
+    def _scores(self, features: List[int]) -> List[float]:
+        scores = list(self.bias)
+        weights = self.weights
+        for feature in features:
+            row = weights.get(feature)
+            if row:
+                for label, weight in row.items():
+                    scores[label] += weight
+        return scores
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """(label, probability) for a normalized description"""
+        if not self.labels:
+            return None, 0.0
+        scores = self._scores(extract_features(text))
+        top = max(scores)
+        total = sum(math.exp(s - top) for s in scores)
+        best = scores.index(top)
+        return self.labels[best], 1.0 / total
+
+    def label_index(self, label: str) -> int:
+        if label not in self.labels:
+            self.labels.append(label)
+            self.bias.append(0.0)
+        return self.labels.index(label)
+
+    def fit(self, examples: List[Tuple[str, str]], epochs: int = EPOCHS, seed: int = 0):
+        """SGD over (normalized text, label) pairs, starting from current weights"""
+        data = [(extract_features(text), self.label_index(label)) for text, label in examples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for features, target in data:
+                scores = self._scores(features)
+                top = max(scores)
+                exps = [math.exp(s - top) for s in scores]
+                total = sum(exps)
+                for label, e in enumerate(exps):
+                    gradient = e / total - (1.0 if label == target else 0.0)
+                    if abs(gradient) < 1e-4:
+                        continue
+                    step = LEARNING_RATE * gradient
+                    self.bias[label] -= step
+                    for feature in features:
+                        row = self.weights.setdefault(feature, {})
+                        row[label] = row.get(label, 0.0) - step
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": self.version,
+            "trained_through": self.trained_through,
+            "examples": self.examples,
+            "hash_bits": HASH_BITS,
+            "labels": self.labels,
+            "bias": self.bias,
+            "weights": {
+                str(feature): {str(label): round(w, 6) for label, w in row.items()}
+                for feature, row in self.weights.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LinearModel":
+        if data.get("hash_bits") != HASH_BITS:
+            raise ValueError("model was trained with a different feature space")
+        return cls(
+            labels=data["labels"],
+            weights={
+                int(feature): {int(label): w for label, w in row.items()}
+                for feature, row in data["weights"].items()
+            },
+            bias=data["bias"],
+            version=data["version"],
+            trained_through=data["trained_through"],
+            examples=data["examples"],
+        )
+
+
+class LearnedClassifier:
+    """
+    Lazily loaded, incrementally retrained LinearModel
+
+    The model file is read on first use. train() fits only corrections
+    newer than the model, plus a replay sample of older corrections and
+    recent transactions whose stored category was left alone. Then it
+    writes the file atomically and swaps the in-memory model. Only one
+    training run happens at a time. schedule_training() debounces bursts
+    of corrections into one run on a timer thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        self._schedule_lock = threading.Lock()
+        self._timer = None
+        self.last_training = None
+
+    @property
+    def model(self) -> LinearModel:
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self) -> LinearModel:
+        try:
+            with open(self.path) as f:
+                return LinearModel.from_dict(json.load(f))
+        except FileNotFoundError:
+            return LinearModel()
+        except (ValueError, KeyError) as e:
+            print(f"Ignoring unreadable classifier model {self.path}: {str(e)}")
+            return LinearModel()
+
+    def _save(self, model: LinearModel):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(model.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    @property
+    def version(self) -> int:
+        return self.model.version
+
+    @staticmethod
+    def is_active(model: LinearModel) -> bool:
+        """Whether predict_many returns predictions for this model (enough examples and labels)"""
+        return model.examples >= MIN_EXAMPLES and len(model.labels) >= 2
+
+    def predict_many(self, texts: List[str],
+                     model: Optional[LinearModel] = None) -> Optional[List[Tuple[Optional[str], float]]]:
+        """
+        (label, probability) per normalized text, or None when the model
+        has too few examples to be trusted
+
+        Pass `model` (a snapshot of .model) to predict with the same model
+        a cache key's version was taken from.
+        """
+        model = model or self.model
+        if not self.is_active(model):
+            return None
+        return [model.predict(text) for text in texts]
+
+    def train(self, full: bool = False) -> Optional[Dict]:
+        """
+        Fit corrections not yet seen by the model (all of them if full)
+
+        Returns:
+            Summary dict, or None if another training run is in progress
+        """
+        if not self._train_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._train(full)
+        finally:
+            self._train_lock.release()
+
+    def _train(self, full: bool) -> Dict:
+        from classifier import get_taxonomy, normalize_description
+        from models import SessionLocal, CategoryCorrection, Transaction
+
+        started = time.perf_counter()
+        # Versions keep increasing across full retrains; they are part of cache keys
+        model = LinearModel(version=self.model.version) if full else self.model.copy()
+        # Custom category names are per-user; the shared model only learns taxonomy categories
+        categories = get_taxonomy().categories
+        known = CategoryCorrection.category_name.in_(categories)
+
+        db = SessionLocal()
+        try:
+            new_examples = db.query(
+                CategoryCorrection.id, CategoryCorrection.description, CategoryCorrection.category_name
+            ).filter(
+                CategoryCorrection.id > model.trained_through, known
+            ).order_by(CategoryCorrection.id).limit(TRAIN_BATCH_SIZE).all()
+
+            if not new_examples:
+                return {"trained": 0, "version": model.version}
+
+            replay = []
+            if model.trained_through:
+                replay = db.query(CategoryCorrection.description, CategoryCorrection.category_name).filter(
+                    CategoryCorrection.id <= model.trained_through, known
+                ).order_by(CategoryCorrection.id.desc()).limit(REPLAY_SAMPLE).all()
+
+            corrected = db.query(CategoryCorrection.transaction_id).filter(
+                CategoryCorrection.transaction_id.is_not(None)
+            )
+            background = db.query(Transaction.description, Transaction.category_name).filter(
+                Transaction.classification_status == "refined",
+                Transaction.category_name.in_(categories),
+                Transaction.id.not_in(corrected)
+            ).order_by(Transaction.id.desc()).limit(BACKGROUND_SAMPLE).all()
+        finally:
+            db.close()
+
+        examples = [(normalize_description(d or ""), c) for _, d, c in new_examples]
+        examples += [(normalize_description(d or ""), c) for d, c in [*replay, *background]]
+        model.fit(examples, seed=model.version)
+        model.trained_through = new_examples[-1][0]
+        model.examples += len(new_examples)
+        model.version += 1
+
+        self._save(model)
+        self._model = model
+        self.last_training = {
+            "trained": len(new_examples),
+            "replayed": len(replay) + len(background),
+            "version": model.version,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        return self.last_training
+
+    def schedule_training(self):
+        """Train TRAIN_DELAY seconds from now unless a run is already scheduled"""
+        with self._schedule_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(TRAIN_DELAY, self._run_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_scheduled(self):
+        with self._schedule_lock:
+            self._timer = None
+        self.train_until_current()
+
+    def train_until_current(self):
+        """Keep training until no corrections are pending"""
+        try:
+            while True:
+                summary = self.train()
+                if not summary or not summary["trained"]:
+                    return
+        except Exception as e:
+            print(f"Classifier training failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        model = self.model
+        return {
+            "version": model.version,
+            "examples": model.examples,
+            "labels": len(model.labels),
+            "features": len(model.weights),
+            "active": self.is_active(model),
+            "last_training": self.last_training,
+        }
+
+
+learned_classifier = LearnedClassifier(MODEL_PATH)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from models import init_db
+
+    parser = argparse.ArgumentParser(description="Train the correction-based classifier")
+    parser.add_argument("--full", action="store_true", help="retrain from scratch instead of incrementally")
+    args = parser.parse_args()
+
+    init_db()
+    summary = learned_classifier.train(full=args.full)
+    while summary and summary["trained"]:
+        print(f"✅ Trained on {summary['trained']:,} corrections -> model v{summary['version']}")
+        summary = learned_classifier.train()
+    print(f"Model: {learned_classifier.stats()}")
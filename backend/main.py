@@ -3,31 +3,72 @@ Finora Budget Tracking App - Backend API
 FastAPI server with endpoints for transactions, budgets, analytics, and AI chatbot
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Optional
+import asyncio
+import csv
+import io
 import json
+import os
+import uuid
 
 from models import (
-    init_db, get_db, User, Account, Transaction, Category, Budget, Goal
+    init_db, get_db, SessionLocal, User, Account, Transaction, Category, Budget, Goal, ImportJob,
+    ReclassifyJob, CategoryRule,
+    CategoryCorrection, MonthlyRollup
 )
 from schemas import (
     User as UserSchema, UserCreate,
     Account as AccountSchema, AccountCreate,
     Transaction as TransactionSchema, TransactionCreate, TransactionUpdate,
-    Budget as BudgetSchema, BudgetCreate, BudgetUpdate,
+    TransactionBulkCreate, TransactionBulkResponse,
+    ImportJob as ImportJobSchema, ReclassifyJob as ReclassifyJobSchema,
+    CategoryRule as CategoryRuleSchema, CategoryRuleCreate, CategoryRuleUpdate, RuleApplyResult,
+    Budget as BudgetSchema, BudgetCreate, BudgetUpdate, BudgetStatus,
     Goal as GoalSchema, GoalCreate, GoalUpdate,
     ChatRequest, ChatResponse,
-    MonthlyAnalytics, BudgetAdvice,
-    ClassificationResult
+    MonthlyAnalytics, TrendAnalytics, TrendSeries, BudgetAdvice,
+    ClassificationResult, ClassificationBatchRequest, ClassificationBatchResponse,
+    ClassificationQueueStatus
 )
 from classifier import (
-    classify_transaction, get_all_categories, classify_with_hf
+    classify_transaction, classify_batch, get_all_categories, get_category_map, classify_with_hf,
+    classifier_stats, taxonomy_store
+)
+from learned_classifier import learned_classifier
+from merchant_overrides import classify_for_user, record_override, override_index
+from category_rules import (
+    apply_rules_to_history, rule_index, rules_changed, validate_pattern
+)
+from hf_classifier import hf_classifier
+from chat_client import chat_upstream
+from classification_queue import (
+    classification_worker, pending_status, DEFERRED_CLASSIFICATION
 )
 from chatbot_enhanced import (
-    finora_chat, chat_with_context, get_budget_advice
+    ChatStreamError, finora_chat, chat_with_context, get_budget_advice, response_cache
+)
+from analytics import (
+    analytics_cache, compute_etag, mark_analytics_stale, month_bounds, monthly_totals_from_rollups,
+    month_range, month_over_month, moving_average, trend_series
+)
+from ingest import insert_transactions
+from rollups import RollupDeltas
+from importer import (
+    IMPORT_DIR, MAX_IMPORT_BYTES, detect_format, describe_job, is_job_active, run_import
+)
+from reclassify import (
+    create_job as create_reclassify_job, describe_job as describe_reclassify_job,
+    is_job_active as is_reclassify_job_active, run_reclassify
+)
+from pagination import (
+    encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 )
 
 # Initialize database
@@ -47,9 +88,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
+@app.on_event("startup")
+async def start_background_services():
+    """Open pooled outbound HTTP clients and workers on the server's event loop"""
+    await hf_classifier.start()
+    await chat_upstream.start()
+    if DEFERRED_CLASSIFICATION:
+        classification_worker.start(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    classification_worker.stop()
+    finora_chat.sessions.close()
+    await hf_classifier.close()
+    await chat_upstream.close()
+
+
 # ==================== USER ENDPOINTS ====================
 
 @app.post("/users", response_model=UserSchema)
@@ -133,8 +192,12 @@ def create_transaction(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Classify transaction
-    classification = classify_transaction(transaction.description, transaction.amount)
+    # Classify transaction (the user's rules and merchant overrides win over the classifier).
+    # In deferred mode a keyword result is provisional and the worker refines it; rule and override results are final.
+    classification = classify_for_user(
+        db, user_id, [transaction.description], [transaction.amount], [transaction.account_id]
+    )[0]
+    deferred = DEFERRED_CLASSIFICATION and "source" not in classification
     
     # Create transaction
     db_transaction = Transaction(
@@ -145,11 +208,17 @@ def create_transaction(
         category_name=classification["category"],
         category_id=None,  # Set to category lookup if needed
         transaction_type=transaction.transaction_type,
-        notes=transaction.notes
+        date=datetime.utcnow(),
+        notes=transaction.notes,
+        classification_status="pending" if deferred else None
     )
     
     db.add(db_transaction)
     
+    rollup = RollupDeltas()
+    rollup.add_transaction(db_transaction)
+    rollup.apply(db)
+    
     # Update account balance
     if transaction.transaction_type == "expense":
         account.balance -= transaction.amount
@@ -158,37 +227,179 @@ def create_transaction(
     
     db.commit()
     db.refresh(db_transaction)
+    if deferred:
+        classification_worker.enqueue(db_transaction.id)
     
     return db_transaction
 
 
+@app.post("/transactions/bulk", response_model=TransactionBulkResponse)
+def create_transactions_bulk(
+    user_id: int,
+    bulk: TransactionBulkCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Create many transactions in one request (e.g. a bank sync)
+    
+    Rows referencing unknown accounts are reported as errors; all other rows
+    are classified, inserted and applied to balances in one DB transaction.
+    """
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    results = insert_transactions(db, user_id, [item.model_dump() for item in bulk.transactions])
+    db.commit()
+    
+    created = sum(1 for r in results if r["status"] == "created")
+    return TransactionBulkResponse(
+        created=created,
+        failed=len(results) - created,
+        results=results
+    )
+
+
+def _transaction_filters(user_id: int, month: Optional[str], category: Optional[str]) -> list:
+    """Build the WHERE conditions shared by transaction listing and export"""
+    conditions = [Transaction.user_id == user_id]
+    
+    if month:
+        # Format: "2025-10"
+        start_date, end_date = month_bounds(month)
+        conditions += [Transaction.date >= start_date, Transaction.date < end_date]
+    
+    if category:
+        conditions.append(Transaction.category_name == category)
+    
+    return conditions
+
+
 @app.get("/users/{user_id}/transactions", response_model=List[TransactionSchema])
 def get_user_transactions(
     user_id: int,
+    response: Response,
     month: Optional[str] = None,
     category: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
     db: Session = Depends(get_db)
 ):
-    """Get transactions for user (optionally filtered by month/category)"""
+    """
+    Get transactions for user (optionally filtered by month/category)
     
-    query = db.query(Transaction).filter(Transaction.user_id == user_id)
+    Newest first. Pass `limit` to page through the history; when more rows
+    exist the next page's cursor is returned in the X-Next-Cursor header.
+    Without `limit` or `cursor` the full list is returned.
+    """
     
-    if month:
-        # Format: "2025-10"
-        start_date = datetime.strptime(f"{month}-01", "%Y-%m-%d")
-        end_date = start_date + timedelta(days=31)
-        query = query.filter(
-            Transaction.date >= start_date,
-            Transaction.date < end_date
-        )
+    query = db.query(Transaction).filter(*_transaction_filters(user_id, month, category))
     
-    if category:
-        query = query.filter(Transaction.category_name == category)
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Row-value comparison lets SQLite seek straight into the
+        # (user_id, [category_name,] date) index instead of skipping rows
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < (cursor_date, cursor_id))
+    
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+    
+    if limit is None and cursor is None:
+        return query.all()
+    
+    page_size = limit or DEFAULT_PAGE_SIZE
+    transactions = query.limit(page_size + 1).all()
+    if len(transactions) > page_size:
+        transactions = transactions[:page_size]
+        last = transactions[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.date, last.id)
     
-    transactions = query.order_by(Transaction.date.desc()).all()
     return transactions
 
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = [
+    "id", "date", "description", "amount", "transaction_type",
+    "category_name", "account_id", "notes", "created_at"
+]
+
+
+def _export_rows(user_id: int, month: Optional[str], category: Optional[str], fmt: str):
+    """
+    Stream transactions as CSV/NDJSON text chunks
+    
+    Uses its own session and reads plain rows in EXPORT_BATCH_SIZE batches
+    (yield_per), so memory stays constant and the first chunk is sent
+    before the query has walked the whole history.
+    """
+    columns = [Transaction.__table__.c[name] for name in EXPORT_COLUMNS]
+    statement = (
+        select(*columns)
+        .where(*_transaction_filters(user_id, month, category))
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        
+        for batch in db.execute(statement).partitions():
+            for row in batch:
+                values = [v.isoformat() if isinstance(v, datetime) else v for v in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # CSV header for an empty export
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+@app.get("/users/{user_id}/transactions/classification-status", response_model=ClassificationQueueStatus)
+def get_classification_status(user_id: int, db: Session = Depends(get_db)):
+    """Transactions still waiting for deferred classification"""
+    return pending_status(db, user_id)
+
+
+@app.get("/users/{user_id}/transactions/export")
+def export_user_transactions(
+    user_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv or ndjson"),
+    month: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """Stream a user's transactions as CSV or NDJSON (optionally filtered by month/category)"""
+    
+    if month:
+        try:
+            datetime.strptime(f"{month}-01", "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"transactions-{user_id}{'-' + month if month else ''}.{format}"
+    
+    return StreamingResponse(
+        _export_rows(user_id, month, category, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @app.get("/transactions/{transaction_id}", response_model=TransactionSchema)
 def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
     """Get transaction by ID"""
@@ -204,22 +415,50 @@ def update_transaction(
     transaction_update: TransactionUpdate,
     db: Session = Depends(get_db)
 ):
-    """Update a transaction"""
+    """
+    Update a transaction
+
+    A changed category_name becomes the user's override for that merchant,
+    is recorded as a correction and the learned classifier is retrained on
+    it in the background.
+    """
     transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    # Move the transaction's contribution from its old rollup to its new one
+    rollup = RollupDeltas()
+    rollup.add_transaction(transaction, sign=-1)
+    corrected = False
+    
     # Update fields
     if transaction_update.amount is not None:
         transaction.amount = transaction_update.amount
     if transaction_update.description is not None:
         transaction.description = transaction_update.description
     if transaction_update.category_name is not None:
+        if transaction_update.category_name != transaction.category_name:
+            db.add(CategoryCorrection(
+                user_id=transaction.user_id,
+                transaction_id=transaction.id,
+                description=transaction.description,
+                previous_category=transaction.category_name,
+                category_name=transaction_update.category_name
+            ))
+            record_override(db, transaction.user_id, transaction.description, transaction_update.category_name)
+            # The deferred classifier must not overwrite the user's choice
+            transaction.classification_status = "manual"
+            corrected = True
         transaction.category_name = transaction_update.category_name
     if transaction_update.notes is not None:
         transaction.notes = transaction_update.notes
     
+    rollup.add_transaction(transaction)
+    rollup.apply(db)
+    
     db.commit()
+    if corrected:
+        learned_classifier.schedule_training()
     db.refresh(transaction)
     return transaction
 
@@ -231,11 +470,132 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    rollup = RollupDeltas()
+    rollup.add_transaction(transaction, sign=-1)
+    rollup.apply(db)
+    
     db.delete(transaction)
     db.commit()
     return {"status": "deleted"}
 
 
+# ==================== IMPORT ENDPOINTS ====================
+
+@app.post("/users/{user_id}/imports", response_model=ImportJobSchema)
+async def import_statement(
+    user_id: int,
+    account_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = "statement",
+    format: Optional[str] = Query(None, pattern="^(csv|ofx|qif)$", description="Detected if omitted"),
+    day_first: bool = Query(True, description="Read 03/04/2025 as 3 April"),
+    background: bool = Query(False, description="Return immediately and import as a job"),
+    db: Session = Depends(get_db)
+):
+    """
+    Import a bank statement (CSV, OFX or QIF) sent as the raw request body
+    
+    e.g. curl --data-binary @statement.csv "/users/1/imports?account_id=1&filename=statement.csv"
+    
+    The body is streamed to disk, then parsed and inserted in batches. Poll
+    GET /imports/{job_id} for progress; failed jobs can be resumed. If
+    FINORA_IMPORT_MAX_BYTES is set, larger bodies are rejected with 413.
+    """
+    
+    too_large = HTTPException(status_code=413, detail=f"Statement exceeds {MAX_IMPORT_BYTES:,} bytes")
+    declared = request.headers.get("content-length")
+    if MAX_IMPORT_BYTES and declared and declared.isdigit() and int(declared) > MAX_IMPORT_BYTES:
+        raise too_large
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    account = db.query(Account).filter(Account.id == account_id).first()
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    file_path = os.path.join(IMPORT_DIR, f"{uuid.uuid4().hex}.upload")
+    head = b""
+    total_bytes = 0
+    # File I/O runs in the threadpool so a slow disk doesn't stall the event loop
+    out = await run_in_threadpool(open, file_path, "wb")
+    try:
+        async for chunk in request.stream():
+            if len(head) < 1024:
+                head += chunk[:1024]
+            total_bytes += len(chunk)
+            if MAX_IMPORT_BYTES and total_bytes > MAX_IMPORT_BYTES:
+                # Chunked uploads have no Content-Length to check up front
+                raise too_large
+            await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(os.remove, file_path)
+        raise
+    await run_in_threadpool(out.close)
+    
+    if total_bytes == 0:
+        await run_in_threadpool(os.remove, file_path)
+        raise HTTPException(status_code=400, detail="Empty statement")
+    
+    job = ImportJob(
+        user_id=user_id,
+        account_id=account_id,
+        filename=filename,
+        file_format=format or detect_format(filename, head),
+        file_path=file_path,
+        day_first=day_first,
+        total_bytes=total_bytes
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    if background:
+        background_tasks.add_task(run_import, job.id)
+    else:
+        await run_in_threadpool(run_import, job.id)
+        db.refresh(job)
+    
+    return describe_job(job)
+
+
+@app.get("/imports/{job_id}", response_model=ImportJobSchema)
+def get_import_job(job_id: int, db: Session = Depends(get_db)):
+    """Get import progress (rows processed, rows/sec, percent of bytes read)"""
+    job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return describe_job(job)
+
+
+@app.post("/imports/{job_id}/resume", response_model=ImportJobSchema)
+async def resume_import_job(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Resume an interrupted or failed import from its last checkpoint"""
+    job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Import job already completed")
+    if is_job_active(job_id):
+        raise HTTPException(status_code=409, detail="Import job is already running")
+    
+    if background:
+        background_tasks.add_task(run_import, job.id)
+    else:
+        await run_in_threadpool(run_import, job.id)
+        db.refresh(job)
+    
+    return describe_job(job)
+
+
 # ==================== BUDGET ENDPOINTS ====================
 
 @app.post("/users/{user_id}/budgets", response_model=BudgetSchema)
@@ -250,14 +610,24 @@ def create_budget(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Start from what's already been spent; rollup deltas keep it current
+    spent = db.query(MonthlyRollup.total).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.month == budget.month,
+        MonthlyRollup.category_name == budget.category_name,
+        MonthlyRollup.transaction_type == "expense"
+    ).scalar()
+    
     db_budget = Budget(
         user_id=user_id,
         category_name=budget.category_name,
         month=budget.month,
-        allocated=budget.allocated
+        allocated=budget.allocated,
+        spent=spent or 0.0
     )
     
     db.add(db_budget)
+    mark_analytics_stale(db, [(user_id, budget.month)])
     db.commit()
     db.refresh(db_budget)
     return db_budget
@@ -280,6 +650,39 @@ def get_user_budgets(
     return budgets
 
 
+def _budget_status(budget: Budget) -> dict:
+    spent = budget.spent or 0.0
+    return {
+        "allocated": budget.allocated,
+        "spent": round(spent, 2),
+        "remaining": round(budget.allocated - spent, 2),
+        "percent_used": round((spent / budget.allocated * 100) if budget.allocated > 0 else 0, 2)
+    }
+
+
+@app.get("/users/{user_id}/budgets/status", response_model=List[BudgetStatus])
+def get_budget_status(
+    user_id: int,
+    month: str = Query(..., description="Month in format YYYY-MM"),
+    db: Session = Depends(get_db)
+):
+    """Get allocated vs spent for each of the user's budgets in a month"""
+    budgets = db.query(Budget).filter(
+        Budget.user_id == user_id,
+        Budget.month == month
+    ).all()
+    
+    return [
+        BudgetStatus(
+            budget_id=budget.id,
+            category_name=budget.category_name,
+            month=budget.month,
+            **_budget_status(budget)
+        )
+        for budget in budgets
+    ]
+
+
 @app.put("/budgets/{budget_id}", response_model=BudgetSchema)
 def update_budget(
     budget_id: int,
@@ -294,6 +697,7 @@ def update_budget(
     if budget_update.allocated is not None:
         budget.allocated = budget_update.allocated
     
+    mark_analytics_stale(db, [(budget.user_id, budget.month)])
     db.commit()
     db.refresh(budget)
     return budget
@@ -364,47 +768,19 @@ def update_goal(
 
 # ==================== ANALYTICS ENDPOINTS ====================
 
-@app.get("/users/{user_id}/analytics/monthly", response_model=MonthlyAnalytics)
-def get_monthly_analytics(
-    user_id: int,
-    month: str = Query(..., description="Month in format YYYY-MM"),
-    db: Session = Depends(get_db)
-):
-    """Get analytics for a specific month"""
+def _build_monthly_analytics(db: Session, user_id: int, month: str) -> MonthlyAnalytics:
+    """Compute the monthly analytics payload (uncached)"""
     
-    # Parse month
-    try:
-        start_date = datetime.strptime(f"{month}-01", "%Y-%m-%d")
-        end_date = start_date + timedelta(days=31)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
-    
-    # Get transactions
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == user_id,
-        Transaction.date >= start_date,
-        Transaction.date < end_date
-    ).all()
-    
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
-    total_spent = sum(t.amount for t in transactions if t.transaction_type == "expense")
+    # Totals and per-category spend from the pre-aggregated rollups
+    total_income, total_spent, spending_by_category_dict = monthly_totals_from_rollups(
+        db, user_id, month
+    )
     remaining = total_income - total_spent
     spending_percent = (total_spent / total_income * 100) if total_income > 0 else 0
     
-    # Group by category
-    spending_by_category_dict = {}
-    for transaction in transactions:
-        if transaction.transaction_type == "expense":
-            category = transaction.category_name
-            if category not in spending_by_category_dict:
-                spending_by_category_dict[category] = 0
-            spending_by_category_dict[category] += transaction.amount
-    
     # Format spending by category
     spending_by_category = []
-    all_categories = get_all_categories()
-    category_map = {c["name"]: c for c in all_categories}
+    category_map = get_category_map()
     
     for category, amount in spending_by_category_dict.items():
         cat_info = category_map.get(category, {})
@@ -423,15 +799,7 @@ def get_monthly_analytics(
         Budget.month == month
     ).all()
     
-    budget_status = {}
-    for budget in budgets:
-        spent = spending_by_category_dict.get(budget.category_name, 0)
-        budget_status[budget.category_name] = {
-            "allocated": budget.allocated,
-            "spent": round(spent, 2),
-            "remaining": round(budget.allocated - spent, 2),
-            "percent_used": round((spent / budget.allocated * 100) if budget.allocated > 0 else 0, 2)
-        }
+    budget_status = {budget.category_name: _budget_status(budget) for budget in budgets}
     
     # Generate insights
     insights = []
@@ -457,6 +825,89 @@ def get_monthly_analytics(
     )
 
 
+@app.get("/users/{user_id}/analytics/monthly", response_model=MonthlyAnalytics)
+def get_monthly_analytics(
+    user_id: int,
+    request: Request,
+    month: str = Query(..., description="Month in format YYYY-MM"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get analytics for a specific month
+    
+    Results are cached per user/month until a transaction or budget write
+    touches that month, or a new taxonomy is loaded. Responses carry an ETag; send it back in
+    If-None-Match to get a 304 when nothing changed.
+    """
+    
+    # Parse month
+    try:
+        month_bounds(month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+    
+    taxonomy_store.get()  # Picks up a taxonomy change (which clears the cache) before the lookup
+    cached = analytics_cache.get(user_id, month)
+    if cached:
+        etag, payload = cached
+    else:
+        generation = analytics_cache.generation(user_id)
+        payload = _build_monthly_analytics(db, user_id, month).model_dump(mode="json")
+        etag = compute_etag(payload)
+        analytics_cache.put(user_id, month, (etag, payload), generation)
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in client_etags or "*" in client_etags:
+        return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(payload, headers=headers)
+
+
+MAX_TREND_MONTHS = 60
+
+
+@app.get("/users/{user_id}/analytics/trend", response_model=TrendAnalytics)
+def get_trend_analytics(
+    user_id: int,
+    from_month: str = Query(..., alias="from", description="First month, YYYY-MM"),
+    to_month: str = Query(..., alias="to", description="Last month, YYYY-MM"),
+    window: int = Query(3, ge=1, le=12, description="Moving average window in months"),
+    db: Session = Depends(get_db)
+):
+    """Income, spend and per-category series for a range of months in one call"""
+    
+    try:
+        months = month_range(from_month, to_month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+    if not months:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if len(months) > MAX_TREND_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_TREND_MONTHS} months")
+    
+    income, spend, categories = trend_series(db, user_id, months)
+    
+    return TrendAnalytics(
+        months=months,
+        window=window,
+        income=TrendSeries(
+            values=[round(v, 2) for v in income],
+            month_over_month=month_over_month(income),
+            moving_average=moving_average(income, window)
+        ),
+        spend=TrendSeries(
+            values=[round(v, 2) for v in spend],
+            month_over_month=month_over_month(spend),
+            moving_average=moving_average(spend, window)
+        ),
+        categories={
+            category: [round(v, 2) for v in series] for category, series in categories.items()
+        }
+    )
+
+
 # ==================== CATEGORY ENDPOINTS ====================
 
 @app.get("/categories")
@@ -466,12 +917,211 @@ def get_categories():
 
 
 @app.post("/classify", response_model=ClassificationResult)
-async def classify_expense(description: str):
-    """Classify an expense description into a category"""
-    result = classify_transaction(description)
+async def classify_expense(description: str, remote: bool = False):
+    """
+    Classify an expense description into a category
+
+    remote=true asks the Hugging Face zero-shot model (micro-batched with
+    other concurrent requests), falling back to keywords on failure.
+    """
+    if remote:
+        result = await classify_with_hf(description)
+    else:
+        result = classify_transaction(description)
     return ClassificationResult(**result)
 
 
+@app.post("/classify/batch", response_model=ClassificationBatchResponse)
+def classify_expenses_batch(request: ClassificationBatchRequest):
+    """
+    Classify many descriptions in one request, results in request order
+
+    Runs classify_batch: normalization, cache lookups and keyword matching
+    are done once for the whole batch.
+    """
+    results = classify_batch([item.description for item in request.items])
+    return {"results": results}
+
+
+@app.get("/taxonomy")
+def get_taxonomy_status():
+    """Version and fingerprint of the category taxonomy this worker is using"""
+    return taxonomy_store.status()
+
+
+@app.post("/taxonomy/reload")
+def reload_taxonomy():
+    """
+    Re-read the taxonomy file now instead of waiting for the next poll
+
+    Only this worker reloads; the others pick the change up on their own
+    within FINORA_TAXONOMY_POLL_SECONDS. A file that fails validation or
+    doesn't raise the version is rejected and the current taxonomy stays.
+    """
+    status = taxonomy_store.reload(force=True)
+    if status["last_error"]:
+        raise HTTPException(status_code=400, detail=status["last_error"])
+    return status
+
+
+def _validate_rule(pattern: Optional[str], min_amount: Optional[float], max_amount: Optional[float]):
+    if pattern:
+        try:
+            validate_pattern(pattern)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        raise HTTPException(status_code=400, detail="min_amount is greater than max_amount")
+
+
+@app.post("/users/{user_id}/rules", response_model=CategoryRuleSchema)
+def create_category_rule(
+    user_id: int,
+    rule: CategoryRuleCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Create a categorization rule
+
+    New transactions take the category of the user's first matching rule
+    (lowest priority, then oldest), ahead of merchant overrides and the
+    classifier. Existing transactions change only through
+    POST /users/{user_id}/rules/apply.
+    """
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    _validate_rule(rule.description_pattern, rule.min_amount, rule.max_amount)
+    
+    db_rule = CategoryRule(user_id=user_id, **rule.model_dump())
+    db.add(db_rule)
+    rules_changed(db, user_id)
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+
+@app.get("/users/{user_id}/rules", response_model=List[CategoryRuleSchema])
+def get_category_rules(user_id: int, db: Session = Depends(get_db)):
+    """Get the user's rules in the order they are tried"""
+    return db.query(CategoryRule).filter(
+        CategoryRule.user_id == user_id
+    ).order_by(CategoryRule.priority, CategoryRule.id).all()
+
+
+@app.put("/rules/{rule_id}", response_model=CategoryRuleSchema)
+def update_category_rule(
+    rule_id: int,
+    rule_update: CategoryRuleUpdate,
+    db: Session = Depends(get_db)
+):
+    """Update a rule (fields left out are unchanged)"""
+    rule = db.query(CategoryRule).filter(CategoryRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    
+    for field, value in rule_update.model_dump(exclude_unset=True).items():
+        setattr(rule, field, value)
+    _validate_rule(rule.description_pattern, rule.min_amount, rule.max_amount)
+    
+    rules_changed(db, rule.user_id)
+    db.commit()
+    db.refresh(rule)
+    return rule
+
+
+@app.delete("/rules/{rule_id}")
+def delete_category_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Delete a rule"""
+    rule = db.query(CategoryRule).filter(CategoryRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    
+    rules_changed(db, rule.user_id)
+    db.delete(rule)
+    db.commit()
+    return {"message": "Rule deleted"}
+
+
+@app.post("/users/{user_id}/rules/apply", response_model=RuleApplyResult)
+def apply_category_rules(user_id: int, db: Session = Depends(get_db)):
+    """
+    Re-categorize the user's existing transactions with their rules
+
+    Runs as one set-based UPDATE followed by a rollup/budget rebuild for
+    the user. Transactions categorized by hand keep their category.
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    updated = apply_rules_to_history(db, user_id)
+    db.commit()
+    return {"transactions_updated": updated}
+
+
+@app.post("/reclassify-jobs", response_model=ReclassifyJobSchema)
+async def start_reclassify_job(
+    background_tasks: BackgroundTasks,
+    user_id: Optional[int] = Query(None, description="Only this user's transactions (default: everyone's)"),
+    background: bool = Query(False, description="Return immediately and run as a job"),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-classify existing transactions with the current taxonomy and model
+
+    Rows a user categorized by hand are skipped. Poll
+    GET /reclassify-jobs/{job_id} for rows/sec and time remaining; failed
+    jobs can be resumed.
+    """
+    if user_id is not None and not db.query(User).filter(User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    job = create_reclassify_job(db, user_id)
+    if background:
+        background_tasks.add_task(run_reclassify, job.id)
+    else:
+        await run_in_threadpool(run_reclassify, job.id)
+        db.refresh(job)
+
+    return describe_reclassify_job(job)
+
+
+@app.get("/reclassify-jobs/{job_id}", response_model=ReclassifyJobSchema)
+def get_reclassify_job(job_id: int, db: Session = Depends(get_db)):
+    """Get re-classification progress (rows processed/changed, rows/sec, ETA)"""
+    job = db.query(ReclassifyJob).filter(ReclassifyJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Reclassify job not found")
+    return describe_reclassify_job(job)
+
+
+@app.post("/reclassify-jobs/{job_id}/resume", response_model=ReclassifyJobSchema)
+async def resume_reclassify_job(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Resume an interrupted or failed re-classification from its last checkpoint"""
+    job = db.query(ReclassifyJob).filter(ReclassifyJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Reclassify job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Reclassify job already completed")
+    if is_reclassify_job_active(job_id):
+        raise HTTPException(status_code=409, detail="Reclassify job is already running")
+
+    if background:
+        background_tasks.add_task(run_reclassify, job.id)
+    else:
+        await run_in_threadpool(run_reclassify, job.id)
+        db.refresh(job)
+
+    return describe_reclassify_job(job)
+
+
 # ==================== CHATBOT ENDPOINTS ====================
 
 @app.post("/chat", response_model=ChatResponse)
@@ -489,6 +1139,46 @@ async def chat(request: ChatRequest, user_id: int = 1):
     return ChatResponse(**response)
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, user_id: int = 1):
+    """
+    Chat with Finora AI, streaming the reply as server-sent events
+    
+    Sends `event: token` with {"text": ...} for each piece as the model
+    generates it, then `event: done` with the same body as POST /chat.
+    The exchange is added to the conversation history when the reply is
+    complete. If the model fails mid-reply, `event: done` has
+    "status": "error" and an "error" message; the partial reply is not
+    added to the history.
+    """
+    
+    message = request.message
+    
+    if not message or len(message) > 500:
+        raise HTTPException(status_code=400, detail="Invalid message")
+    
+    async def events():
+        pieces = []
+        done = {"status": "ok"}
+        try:
+            async for piece in finora_chat.stream_response(str(user_id), message, request.user_context):
+                pieces.append(piece)
+                yield f"event: token\ndata: {json.dumps({'text': piece})}\n\n"
+        except ChatStreamError as e:
+            # The reply is truncated: tell the client instead of finishing normally
+            done = {"status": "error", "error": "The reply was interrupted. Please try again."}
+            print(f"Chat stream interrupted: {str(e)}")
+        done = {"reply": "".join(pieces).strip(), **done, "timestamp": datetime.utcnow().isoformat()}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies (nginx) would otherwise buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/budget-advice")
 def get_advice(total_income: float):
     """Get budget allocation advice (50/30/20 rule)"""
@@ -501,6 +1191,24 @@ def get_advice(total_income: float):
 
 
 
+# ==================== METRICS ENDPOINT ====================
+
+@app.get("/metrics")
+def get_metrics():
+    """In-process cache counters for this worker"""
+    return {
+        "analytics_cache": analytics_cache.stats(),
+        "classifier_cache": classifier_stats(),
+        "merchant_overrides": override_index.stats(),
+        "category_rules": rule_index.stats(),
+        "hf_classifier": hf_classifier.stats(),
+        "chat_upstream": chat_upstream.stats(),
+        "chat_response_cache": response_cache.stats(),
+        "chat_sessions": finora_chat.sessions.stats(),
+        "classification_queue": classification_worker.stats()
+    }
+
+
 # ==================== ROOT ENDPOINT ====================
 
 @app.get("/")
@@ -0,0 +1,133 @@
+"""
+Per-user merchant -> category overrides
+When a user recategorizes a transaction, its normalized description maps to
+the new category for that user. Later transactions from the same merchant
+take that category straight away, without going through the classifier.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from cache import LRUCache
+from category_rules import match_rules
+from classifier import category_result, classify_batch, normalize_description
+from models import MerchantOverride
+
+# Users whose overrides are kept in memory
+OVERRIDE_CACHE_USERS = int(os.getenv("FINORA_OVERRIDE_CACHE_USERS", "1000"))
+
+
+class MerchantOverrideIndex:
+    """
+    user_id -> {merchant_key: category_name} for recently active users
+
+    A user's dict is loaded with one indexed query on first use. Committed
+    upserts are applied to it in place. Like AnalyticsCache, a generation
+    counter (one for the index, since overrides change rarely) is bumped on
+    every commit and a loaded dict is only cached if it is unchanged, so a
+    load racing a commit can't cache the dict without the new override.
+    The mirror is per process, so another worker can miss an override
+    until that user's entry is evicted there.
+    """
+
+    def __init__(self, max_users: int):
+        self.users = LRUCache(max_users)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def for_user(self, db: Session, user_id: int) -> Dict[str, str]:
+        overrides = self.users.get(user_id)
+        if overrides is None:
+            generation = self._generation
+            overrides = dict(
+                db.query(MerchantOverride.merchant_key, MerchantOverride.category_name)
+                .filter(MerchantOverride.user_id == user_id)
+            )
+            with self._lock:
+                if self._generation == generation:
+                    self.users.set(user_id, overrides)
+        return overrides
+
+    def apply(self, changes: Dict):
+        with self._lock:
+            self._generation += 1
+            for (user_id, merchant_key), category_name in changes.items():
+                overrides = self.users.get(user_id)
+                if overrides is not None:
+                    overrides[merchant_key] = category_name
+
+    def stats(self) -> Dict:
+        return self.users.stats()
+
+
+override_index = MerchantOverrideIndex(OVERRIDE_CACHE_USERS)
+
+
+def record_override(db: Session, user_id: int, description: str, category_name: str):
+    """Upsert the user's override for this description's merchant (visible once db commits)"""
+    merchant_key = normalize_description(description or "")
+    if not merchant_key:
+        return
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(MerchantOverride).values(
+        user_id=user_id, merchant_key=merchant_key, category_name=category_name, updated_at=datetime.utcnow()
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "merchant_key"],
+        set_={"category_name": statement.excluded.category_name, "updated_at": statement.excluded.updated_at}
+    ))
+    db.info.setdefault("merchant_overrides", {})[(user_id, merchant_key)] = category_name
+
+
+def find_override(db: Session, user_id: int, description: str) -> Optional[str]:
+    """The user's category for this description's merchant, if they set one"""
+    return override_index.for_user(db, user_id).get(normalize_description(description))
+
+
+def classify_for_user(db: Session, user_id: int, descriptions: List[str],
+                      amounts: Optional[List[float]] = None, account_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    classify_batch, except the user's own choices come first (confidence
+    1.0): their first matching category rule, then their override for the
+    merchant. Rules on amount or account only apply when those are given.
+    Those results carry "source": "rule" or "override".
+    """
+    rule_categories = match_rules(db, user_id, descriptions, amounts, account_ids)
+    overrides = override_index.for_user(db, user_id)
+    if not overrides and not any(rule_categories):
+        return classify_batch(descriptions)
+
+    results = [None] * len(descriptions)
+    remaining = []
+    for i, description in enumerate(descriptions):
+        override = overrides.get(normalize_description(description))
+        if rule_categories[i] is not None:
+            results[i] = {**category_result(rule_categories[i], confidence=1.0), "source": "rule"}
+        elif override is not None:
+            results[i] = {**category_result(override, confidence=1.0), "source": "override"}
+        else:
+            remaining.append(i)
+
+    if remaining:
+        for i, result in zip(remaining, classify_batch([descriptions[i] for i in remaining])):
+            results[i] = result
+    return results
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session):
+    changes = session.info.pop("merchant_overrides", None)
+    if changes:
+        override_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop("merchant_overrides", None)
@@ -0,0 +1,136 @@
+"""
+Versioned schema migrations for the Finora database
+Each migration runs once per database file and is recorded in schema_migrations,
+so existing finora.db files pick up new indexes/columns without a rebuild
+"""
+
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# (version, description, function) - appended in version order by @migration
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, description: str):
+    """Register a migration function under a schema version"""
+    def decorator(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    """Check if a column exists (create_all may already have added it)"""
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+# ==================== MIGRATIONS ====================
+
+@migration(1, "Composite indexes on transactions for per-user date queries")
+def add_transaction_composite_indexes(conn: Connection):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_date "
+        "ON transactions (user_id, date)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_category_date "
+        "ON transactions (user_id, category_name, date)"
+    ))
+
+
+@migration(2, "Backfill monthly_rollups from existing transactions")
+def backfill_monthly_rollups(conn: Connection):
+    # monthly_rollups itself is created by create_all
+    from sqlalchemy.orm import Session
+    from rollups import rebuild_rollups
+
+    with Session(bind=conn) as session:
+        rebuild_rollups(session)
+
+
+@migration(3, "Index budgets by user/month and backfill budgets.spent")
+def backfill_budget_spent(conn: Connection):
+    from sqlalchemy.orm import Session
+    from rollups import sync_budget_spent
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_budgets_user_month ON budgets (user_id, month)"
+    ))
+    with Session(bind=conn) as session:
+        sync_budget_spent(session)
+
+
+@migration(4, "Add transactions.classification_status for deferred classification")
+def add_classification_status(conn: Connection):
+    if not has_column(conn, "transactions", "classification_status"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN classification_status VARCHAR"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_classification_status "
+        "ON transactions (classification_status)"
+    ))
+
+
+# ==================== RUNNER ====================
+
+def _ensure_migrations_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR NOT NULL, "
+            "applied_at DATETIME NOT NULL)"
+        ))
+
+
+def get_schema_version(engine: Engine) -> int:
+    """Get the highest applied migration version (0 if none)"""
+    _ensure_migrations_table(engine)
+    with engine.connect() as conn:
+        version = conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return version or 0
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Apply all pending migrations in version order
+
+    Each migration runs in its own transaction together with its
+    schema_migrations row, so a failed migration leaves no partial record.
+
+    Returns:
+        List of versions applied by this call
+    """
+    _ensure_migrations_table(engine)
+
+    with engine.connect() as conn:
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    newly_applied = []
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, description, applied_at) "
+                    "VALUES (:version, :description, :applied_at)"
+                ),
+                {"version": version, "description": description, "applied_at": datetime.utcnow()}
+            )
+        newly_applied.append(version)
+
+    return newly_applied
+
+
+if __name__ == "__main__":
+    from models import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    applied = run_migrations(engine)
+    for version in applied:
+        print(f"✅ Applied migration {version}")
+    print(f"Schema version: {get_schema_version(engine)}")
@@ -2,15 +2,19 @@
 Database models for Finora budget tracking app
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import os
 
-DATABASE_URL = "sqlite:///./finora.db"
+from migrations import run_migrations
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./finora.db")
+
+# check_same_thread is a sqlite3 option; other drivers reject it
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -73,11 +77,34 @@ class Transaction(Base):
     transaction_type = Column(String)  # "expense" or "income"
     date = Column(DateTime, default=datetime.utcnow)
     notes = Column(String, nullable=True)
+    # None: classified inline; "pending"/"refined": deferred classification; "manual": user set it
+    classification_status = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="transactions")
     account = relationship("Account", back_populates="transactions")
+    
+    # Per-user listing/analytics filter on user_id + date range and sort by date.
+    # SQLite appends the rowid (id) to every index entry, so (user_id, date)
+    # also serves ORDER BY date, id without a separate sort step.
+    __table_args__ = (
+        Index("ix_transactions_user_date", "user_id", "date"),
+        Index("ix_transactions_user_category_date", "user_id", "category_name", "date"),
+        Index("ix_transactions_classification_status", "classification_status"),
+    )
+
+
+class MonthlyRollup(Base):
+    """Pre-aggregated transaction totals per user/month/category/type"""
+    __tablename__ = "monthly_rollups"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(String, primary_key=True)  # "2025-10"
+    category_name = Column(String, primary_key=True)
+    transaction_type = Column(String, primary_key=True)  # "expense" or "income"
+    total = Column(Float, default=0.0)
+    count = Column(Integer, default=0)
 
 
 class Budget(Base):
@@ -90,11 +117,15 @@ class Budget(Base):
     category_name = Column(String)
     month = Column(String)  # "2025-10"
     allocated = Column(Float)  # Amount allocated
-    spent = Column(Float, default=0.0)
+    spent = Column(Float, default=0.0)  # Kept in sync by rollups.RollupDeltas
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="budgets")
+    
+    __table_args__ = (
+        Index("ix_budgets_user_month", "user_id", "month"),
+    )
 
 
 class Goal(Base):
@@ -115,10 +146,99 @@ class Goal(Base):
     user = relationship("User", back_populates="goals")
 
 
+class ImportJob(Base):
+    """Bank statement import job (resumable from bytes_processed)"""
+    __tablename__ = "import_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"))
+    filename = Column(String)
+    file_format = Column(String)  # "csv", "ofx" or "qif"
+    file_path = Column(String)  # Uploaded statement on disk
+    day_first = Column(Boolean, default=True)  # 03/04/2025 is 3 April
+    status = Column(String, default="pending")  # "pending", "running", "completed", "failed"
+    total_bytes = Column(Integer, default=0)
+    bytes_processed = Column(Integer, default=0)  # Resume offset
+    rows_processed = Column(Integer, default=0)
+    rows_failed = Column(Integer, default=0)
+    elapsed_seconds = Column(Float, default=0.0)  # Active time across runs
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ReclassifyJob(Base):
+    """Bulk re-classification of historical transactions (resumable from last_transaction_id)"""
+    __tablename__ = "reclassify_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # None: every user
+    status = Column(String, default="pending")  # "pending", "running", "completed", "failed"
+    taxonomy_version = Column(Integer, nullable=True)  # Taxonomy live when the job was created
+    max_transaction_id = Column(Integer, default=0)  # Rows inserted later are classified already
+    last_transaction_id = Column(Integer, default=0)  # Resume after this id
+    total_rows = Column(Integer, default=0)  # Eligible rows when the job was created
+    rows_processed = Column(Integer, default=0)
+    rows_changed = Column(Integer, default=0)
+    elapsed_seconds = Column(Float, default=0.0)  # Wall time across runs, throttling included
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class CategoryCorrection(Base):
+    """A user re-categorizing a transaction; training data for learned_classifier"""
+    __tablename__ = "category_corrections"
+    
+    id = Column(Integer, primary_key=True)  # Training resumes after the last seen id
+    user_id = Column(Integer, ForeignKey("users.id"))
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
+    description = Column(String)
+    previous_category = Column(String, nullable=True)
+    category_name = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CategoryRule(Base):
+    """A user's categorization rule; every condition that is set must hold"""
+    __tablename__ = "category_rules"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    name = Column(String, nullable=True)
+    description_pattern = Column(String, nullable=True)  # Regex, case-insensitive
+    min_amount = Column(Float, nullable=True)
+    max_amount = Column(Float, nullable=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
+    category_name = Column(String)
+    priority = Column(Integer, default=100)  # Lower runs first; ties go to the older rule
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class MerchantOverride(Base):
+    """A user's chosen category for a merchant (normalized description)"""
+    __tablename__ = "merchant_overrides"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    merchant_key = Column(String)  # classifier.normalize_description output
+    category_name = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ux_merchant_overrides_user_merchant", "user_id", "merchant_key", unique=True),
+    )
+
+
 # Create all tables
 def init_db():
-    """Initialize database"""
+    """Initialize database and apply pending schema migrations"""
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 
 def get_db():
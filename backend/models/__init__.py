@@ -1 +0,0 @@
-# Models package
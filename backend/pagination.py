@@ -0,0 +1,32 @@
+"""
+Keyset (cursor) pagination helpers
+A cursor is the (date, id) of the last row on a page, encoded as an opaque token
+"""
+
+import base64
+from datetime import datetime
+from typing import Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(date: datetime, row_id: int) -> str:
+    """Encode a (date, id) position as an opaque URL-safe cursor"""
+    raw = f"{date.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(date_str), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,280 @@
+"""
+Bulk re-classification of historical transactions
+After a taxonomy or model change, stored category_name values are stale.
+A job walks transactions in primary-key order, classifies each batch
+together (user rules, merchant overrides, learned model, keywords) and
+writes the rows whose category changed with one UPDATE per (old, new)
+category pair. The rollup/budget deltas and the job's checkpoint commit in
+the same DB transaction, so an interrupted job resumes after
+last_transaction_id without double counting. Rows the deferred worker
+refined with the remote model are never overwritten with the local
+classification: they are handed back to it (marked pending and
+re-enqueued) when it is running in this process, and left alone otherwise.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from classification_queue import classification_worker
+from classifier import get_taxonomy
+from merchant_overrides import classify_for_user
+from models import SessionLocal, ReclassifyJob, Transaction
+from rollups import RollupDeltas
+
+RECLASSIFY_BATCH_SIZE = int(os.getenv("FINORA_RECLASSIFY_BATCH_SIZE", "1000"))
+# Sleep this many times as long as each batch took, so foreground writes get
+# the SQLite write lock in between (0 disables throttling)
+RECLASSIFY_PAUSE_RATIO = float(os.getenv("FINORA_RECLASSIFY_PAUSE_RATIO", "1.0"))
+
+# Jobs running in this process, so a resume can't run the same job twice
+_active_jobs = set()
+_active_lock = threading.Lock()
+
+
+def _eligible(query, user_id: Optional[int] = None):
+    """
+    Rows a job may touch: inline or refined classifications only
+
+    "manual" rows keep the user's choice and "pending" rows belong to the
+    deferred classification worker. Refined rows go back to that worker
+    when it is running (see _reclassify_batch).
+    """
+    status = Transaction.classification_status
+    query = query.filter(or_(status.is_(None), status == "refined"))
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    return query
+
+
+def create_job(db: Session, user_id: Optional[int] = None) -> ReclassifyJob:
+    """
+    Create (but don't run) a job covering every transaction that exists now
+
+    Transactions inserted afterwards are classified with the new taxonomy
+    anyway, so the job stops at the current highest id.
+    """
+    max_id = db.query(Transaction.id).order_by(Transaction.id.desc()).limit(1).scalar() or 0
+    total = _eligible(db.query(Transaction.id), user_id).filter(Transaction.id <= max_id).count()
+    job = ReclassifyJob(
+        user_id=user_id,
+        taxonomy_version=get_taxonomy().version,
+        max_transaction_id=max_id,
+        total_rows=total
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def describe_job(job: ReclassifyJob) -> Dict:
+    """Job fields plus derived progress_percent, rows_per_second and eta_seconds"""
+    rate = (job.rows_processed / job.elapsed_seconds) if job.elapsed_seconds else 0.0
+    remaining = max(job.total_rows - job.rows_processed, 0)
+    if job.status == "completed":
+        progress, eta = 100.0, 0.0
+    else:
+        progress = (job.rows_processed / job.total_rows * 100) if job.total_rows else 0.0
+        eta = (remaining / rate) if rate else None
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "status": job.status,
+        "taxonomy_version": job.taxonomy_version,
+        "total_rows": job.total_rows,
+        "rows_processed": job.rows_processed,
+        "rows_changed": job.rows_changed,
+        "last_transaction_id": job.last_transaction_id,
+        "progress_percent": round(min(progress, 100.0), 2),
+        "rows_per_second": round(rate, 1),
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def is_job_active(job_id: int) -> bool:
+    """Check if a job is currently running in this process"""
+    with _active_lock:
+        return job_id in _active_jobs
+
+
+def _reclassify_batch(db: Session, job: ReclassifyJob, requeue: bool = False) -> Tuple[int, List[int]]:
+    """
+    Re-classify the next batch and checkpoint it in one DB transaction
+
+    With requeue, refined rows are only marked pending again; enqueue the
+    returned ids with the classification worker once the batch has
+    committed. Without it they are skipped.
+
+    Returns:
+        (number of rows read (0 when the job is done), ids to enqueue)
+    """
+    rows = _eligible(db.query(
+        Transaction.id, Transaction.user_id, Transaction.account_id, Transaction.description,
+        Transaction.category_name, Transaction.transaction_type, Transaction.amount, Transaction.date,
+        Transaction.classification_status
+    ), job.user_id).filter(
+        Transaction.id > job.last_transaction_id, Transaction.id <= job.max_transaction_id
+    ).order_by(Transaction.id).limit(RECLASSIFY_BATCH_SIZE).all()
+    if not rows:
+        return 0, []
+
+    transactions = Transaction.__table__
+    status = transactions.c.classification_status
+    refined_ids = [row.id for row in rows if row.classification_status == "refined"]
+    requeued = []
+    if refined_ids and requeue:
+        # The rows keep their category (and rollups) until the worker refines them again
+        requeued = db.execute(
+            update(transactions)
+            .where(transactions.c.id.in_(refined_ids), status == "refined")
+            .values(classification_status="pending")
+            .returning(transactions.c.id)
+        ).scalars().all()
+
+    by_user = defaultdict(list)
+    for row in rows:
+        if row.classification_status is None:
+            by_user[row.user_id].append(row)
+
+    # (old, new) -> rows moving between those categories
+    moves = defaultdict(dict)
+    for user_id, user_rows in by_user.items():
+        results = classify_for_user(
+            db, user_id,
+            [row.description or "" for row in user_rows],
+            [row.amount for row in user_rows],
+            [row.account_id for row in user_rows]
+        )
+        for row, result in zip(user_rows, results):
+            if result["category"] != row.category_name:
+                moves[(row.category_name, result["category"])][row.id] = row
+
+    rollup = RollupDeltas()
+    changed = 0
+    for (old_category, new_category), moved in moves.items():
+        # The WHERE re-checks what was read, so a row edited since (e.g. a
+        # manual recategorization) is left alone and its rollups stay right
+        updated_ids = db.execute(
+            update(transactions)
+            .where(
+                transactions.c.id.in_(list(moved)),
+                transactions.c.category_name.is_not_distinct_from(old_category),
+                status.is_(None)
+            )
+            .values(category_name=new_category)
+            .returning(transactions.c.id)
+        ).scalars().all()
+        for transaction_id in updated_ids:
+            row = moved[transaction_id]
+            rollup.add(row.user_id, row.date, old_category, row.transaction_type, row.amount, sign=-1)
+            rollup.add(row.user_id, row.date, new_category, row.transaction_type, row.amount)
+        changed += len(updated_ids)
+    rollup.apply(db)
+
+    job.last_transaction_id = rows[-1].id
+    job.rows_processed += len(rows)
+    job.rows_changed += changed
+    return len(rows), requeued
+
+
+def run_reclassify(job_id: int, progress: Optional[Callable[[Dict], None]] = None):
+    """
+    Run (or resume) a re-classification job to completion
+
+    Safe to call again after a crash: batches restart after
+    last_transaction_id, which is only advanced together with the rows it
+    covers. `progress` is called with describe_job() after every batch.
+    """
+    with _active_lock:
+        if job_id in _active_jobs:
+            return
+        _active_jobs.add(job_id)
+
+    db = SessionLocal()
+    try:
+        job = db.query(ReclassifyJob).filter(ReclassifyJob.id == job_id).first()
+        if not job or job.status == "completed":
+            return
+
+        job.status = "running"
+        job.error = None
+        db.commit()
+
+        # Without a worker here (inline mode, or the CLI) requeued rows would sit pending
+        requeue = classification_worker.is_running()
+        while True:
+            since = time.perf_counter()
+            read, requeued = _reclassify_batch(db, job, requeue)
+            batch_seconds = time.perf_counter() - since
+            if not read:
+                break
+            pause = batch_seconds * RECLASSIFY_PAUSE_RATIO
+            job.elapsed_seconds += batch_seconds + pause
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            # After the commit, so the worker sees them pending (a crash in
+            # between is covered by its recovery of pending rows on start)
+            for transaction_id in requeued:
+                classification_worker.enqueue(transaction_id)
+            if progress:
+                progress(describe_job(job))
+            if pause:
+                time.sleep(pause)
+
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        job.updated_at = job.finished_at
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        job = db.query(ReclassifyJob).filter(ReclassifyJob.id == job_id).first()
+        if job:
+            job.status = "failed"
+            job.error = str(e)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+        with _active_lock:
+            _active_jobs.discard(job_id)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from models import init_db
+
+    parser = argparse.ArgumentParser(description="Re-classify historical transactions")
+    parser.add_argument("--user", type=int, help="limit to one user")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="resume an existing job")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    job_id = args.resume or create_job(session, args.user).id
+
+    def report(status: Dict):
+        eta = f"{status['eta_seconds']:,.0f}s" if status["eta_seconds"] is not None else "-"
+        print(f"\r{status['rows_processed']:,}/{status['total_rows']:,} rows "
+              f"({status['rows_changed']:,} changed) at {status['rows_per_second']:,.0f} rows/s, "
+              f"ETA {eta}   ", end="", flush=True)
+
+    run_reclassify(job_id, progress=report)
+    session.expire_all()
+    final = describe_job(session.query(ReclassifyJob).filter(ReclassifyJob.id == job_id).first())
+    session.close()
+    print(f"\nJob {job_id}: {final['status']} - {final['rows_changed']:,} of {final['rows_processed']:,} rows "
+          f"changed at {final['rows_per_second']:,.0f} rows/s"
+          + (f"\nError: {final['error']}" if final["error"] else ""))
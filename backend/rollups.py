@@ -0,0 +1,279 @@
+"""
+Incrementally maintained monthly rollups
+monthly_rollups holds SUM(amount)/COUNT(*) per (user, month, category, type).
+Every transaction write applies its delta in the same DB transaction, so
+analytics read a few dozen rows instead of scanning transactions. Expense
+deltas are also applied to the matching budgets' spent column.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from analytics import mark_analytics_stale
+from models import Budget, MonthlyRollup, Transaction
+
+# Totals within half a penny count as matching when verifying
+DRIFT_TOLERANCE = 0.005
+
+
+def month_key(date: datetime) -> str:
+    """Rollup month for a transaction date, e.g. "2025-10" """
+    return date.strftime("%Y-%m")
+
+
+def _month_column(db: Session, date_column):
+    """SQL expression for month_key of a date column (strftime is SQLite-only)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(date_column, "YYYY-MM")
+    return func.strftime("%Y-%m", date_column)
+
+
+class RollupDeltas:
+    """Accumulates rollup changes for one unit of work, applied with one upsert"""
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0.0, 0])
+
+    def add(self, user_id: int, date: datetime, category_name: Optional[str],
+            transaction_type: str, amount: float, sign: int = 1):
+        key = (user_id, month_key(date), category_name or "", transaction_type)
+        delta = self._deltas[key]
+        delta[0] += sign * amount
+        delta[1] += sign
+
+    def add_transaction(self, transaction: Transaction, sign: int = 1):
+        """Count a transaction in (sign=1) or out of (sign=-1) its rollup"""
+        self.add(
+            transaction.user_id, transaction.date, transaction.category_name,
+            transaction.transaction_type, transaction.amount, sign
+        )
+
+    def touched_months(self) -> Set[Tuple[int, str]]:
+        """(user_id, month) pairs affected by these deltas"""
+        return {(user_id, month) for user_id, month, _, _ in self._deltas}
+
+    def apply(self, db: Session):
+        """
+        Upsert all non-zero deltas and drop rollup rows that reached zero rows
+
+        Cached analytics for the touched months are invalidated when db commits.
+        """
+        mark_analytics_stale(db, self.touched_months())
+        params = [
+            {
+                "user_id": user_id,
+                "month": month,
+                "category_name": category_name,
+                "transaction_type": transaction_type,
+                "total": total,
+                "count": count,
+            }
+            for (user_id, month, category_name, transaction_type), (total, count) in self._deltas.items()
+            if count or total
+        ]
+        if not params:
+            return
+
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(MonthlyRollup)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "month", "category_name", "transaction_type"],
+            set_={
+                "total": MonthlyRollup.total + statement.excluded.total,
+                "count": MonthlyRollup.count + statement.excluded.count,
+            }
+        )
+        db.execute(statement, params)
+
+        budget_params = [
+            {"b_user_id": p["user_id"], "b_month": p["month"], "b_category": p["category_name"], "b_delta": p["total"]}
+            for p in params
+            if p["transaction_type"] == "expense" and p["total"]
+        ]
+        if budget_params:
+            budgets = Budget.__table__
+            db.execute(
+                budgets.update()
+                .where(
+                    budgets.c.user_id == bindparam("b_user_id"),
+                    budgets.c.month == bindparam("b_month"),
+                    budgets.c.category_name == bindparam("b_category")
+                )
+                .values(spent=budgets.c.spent + bindparam("b_delta")),
+                budget_params
+            )
+
+        if any(p["count"] < 0 for p in params):
+            db.query(MonthlyRollup).filter(
+                MonthlyRollup.user_id.in_({p["user_id"] for p in params}),
+                MonthlyRollup.count <= 0
+            ).delete(synchronize_session=False)
+
+
+def _aggregate_transactions(db: Session, user_id: Optional[int] = None):
+    """GROUP BY query recomputing rollup rows from raw transactions"""
+    month = _month_column(db, Transaction.date)
+    category = func.coalesce(Transaction.category_name, "")
+    query = db.query(
+        Transaction.user_id, month, category, Transaction.transaction_type,
+        func.sum(Transaction.amount), func.count(Transaction.id)
+    )
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    return query.group_by(Transaction.user_id, month, category, Transaction.transaction_type)
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute rollups from raw transactions (all users, or one user)
+
+    Returns:
+        Number of rollup rows written
+    """
+    rollups = db.query(MonthlyRollup)
+    if user_id is not None:
+        rollups = rollups.filter(MonthlyRollup.user_id == user_id)
+    stale = set(rollups.with_entities(MonthlyRollup.user_id, MonthlyRollup.month).distinct())
+    rollups.delete(synchronize_session=False)
+
+    rows = [
+        {
+            "user_id": uid, "month": month, "category_name": category,
+            "transaction_type": transaction_type, "total": total, "count": count,
+        }
+        for uid, month, category, transaction_type, total, count in _aggregate_transactions(db, user_id)
+    ]
+    if rows:
+        db.execute(MonthlyRollup.__table__.insert(), rows)
+    mark_analytics_stale(db, stale | {(row["user_id"], row["month"]) for row in rows})
+    return len(rows)
+
+
+def expense_rollup_total(user_id, month, category_name):
+    """Correlated subquery: a budget's spend according to monthly_rollups"""
+    return select(func.coalesce(func.sum(MonthlyRollup.total), 0.0)).where(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.month == month,
+        MonthlyRollup.category_name == category_name,
+        MonthlyRollup.transaction_type == "expense"
+    ).scalar_subquery()
+
+
+def sync_budget_spent(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Set budgets.spent from monthly_rollups (all users, or one user)
+
+    Returns:
+        Number of budgets updated
+    """
+    budgets = db.query(Budget)
+    if user_id is not None:
+        budgets = budgets.filter(Budget.user_id == user_id)
+    mark_analytics_stale(db, set(budgets.with_entities(Budget.user_id, Budget.month).distinct()))
+    return budgets.update(
+        {Budget.spent: expense_rollup_total(Budget.user_id, Budget.month, Budget.category_name)},
+        synchronize_session=False
+    )
+
+
+def verify_budget_spent(db: Session, user_id: Optional[int] = None) -> List[Dict]:
+    """
+    Compare budgets.spent with expenses recomputed from raw transactions
+
+    Returns:
+        One dict per drifted budget
+    """
+    transaction_month = _month_column(db, Transaction.date)
+    expected_spent = select(func.coalesce(func.sum(Transaction.amount), 0.0)).where(
+        Transaction.user_id == Budget.user_id,
+        Transaction.category_name == Budget.category_name,
+        Transaction.transaction_type == "expense",
+        transaction_month == Budget.month
+    ).scalar_subquery()
+
+    query = db.query(Budget.id, Budget.user_id, Budget.month, Budget.category_name, Budget.spent, expected_spent)
+    if user_id is not None:
+        query = query.filter(Budget.user_id == user_id)
+
+    return [
+        {
+            "budget_id": budget_id, "user_id": uid, "month": month, "category_name": category,
+            "expected_spent": round(expected, 2), "stored_spent": round(stored or 0.0, 2),
+        }
+        for budget_id, uid, month, category, stored, expected in query
+        if abs((stored or 0.0) - expected) > DRIFT_TOLERANCE
+    ]
+
+
+def verify_rollups(db: Session, user_id: Optional[int] = None) -> List[Dict]:
+    """
+    Compare rollups with a fresh aggregate of raw transactions
+
+    Returns:
+        One dict per drifted key with expected vs stored total/count
+    """
+    expected = {
+        (uid, month, category, transaction_type): (total, count)
+        for uid, month, category, transaction_type, total, count in _aggregate_transactions(db, user_id)
+    }
+    query = db.query(MonthlyRollup)
+    if user_id is not None:
+        query = query.filter(MonthlyRollup.user_id == user_id)
+    stored = {
+        (r.user_id, r.month, r.category_name, r.transaction_type): (r.total, r.count)
+        for r in query
+    }
+
+    drift = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        expected_total, expected_count = expected.get(key, (0.0, 0))
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        if expected_count != stored_count or abs(expected_total - stored_total) > DRIFT_TOLERANCE:
+            drift.append({
+                "user_id": key[0], "month": key[1], "category_name": key[2], "transaction_type": key[3],
+                "expected_total": round(expected_total, 2), "stored_total": round(stored_total, 2),
+                "expected_count": expected_count, "stored_count": stored_count,
+            })
+    return drift
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from models import init_db, SessionLocal
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild monthly rollups")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--user", type=int, help="limit to one user")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild_rollups(session, args.user)
+            budgets_synced = sync_budget_spent(session, args.user)
+            session.commit()
+            print(f"✅ Rebuilt {written:,} rollup rows and {budgets_synced:,} budget totals")
+        else:
+            drifted = verify_rollups(session, args.user)
+            for d in drifted:
+                print(f"❌ user {d['user_id']} {d['month']} {d['category_name'] or '-'} {d['transaction_type']}: "
+                      f"expected {d['expected_total']} ({d['expected_count']} rows), "
+                      f"stored {d['stored_total']} ({d['stored_count']} rows)")
+            drifted_budgets = verify_budget_spent(session, args.user)
+            for d in drifted_budgets:
+                print(f"❌ budget {d['budget_id']} (user {d['user_id']} {d['month']} {d['category_name']}): "
+                      f"expected spent {d['expected_spent']}, stored {d['stored_spent']}")
+            if drifted or drifted_budgets:
+                print(f"{len(drifted)} drifted rollup rows, {len(drifted_budgets)} drifted budgets")
+            else:
+                print("✅ No drift")
+            raise SystemExit(1 if drifted or drifted_budgets else 0)
+    finally:
+        session.close()
@@ -86,12 +86,120 @@ class Transaction(TransactionBase):
     account_id: int
     category_id: Optional[int]
     date: datetime
+    classification_status: Optional[str] = None  # "pending" until deferred classification finishes
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class BulkTransactionItem(BaseModel):
+    account_id: int
+    amount: float
+    description: str
+    transaction_type: str = "expense"  # "expense" or "income"
+    date: Optional[datetime] = None  # Defaults to now
+    notes: Optional[str] = None
+
+
+class TransactionBulkCreate(BaseModel):
+    transactions: List[BulkTransactionItem] = Field(..., min_length=1, max_length=5000)
+
+
+class BulkTransactionResult(BaseModel):
+    index: int  # Position in the request
+    status: str  # "created" or "error"
+    id: Optional[int] = None
+    category_name: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class TransactionBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkTransactionResult]
+
+
+# Import Schemas
+class ImportJob(BaseModel):
+    id: int
+    user_id: int
+    account_id: int
+    filename: str
+    file_format: str
+    status: str
+    total_bytes: int
+    bytes_processed: int
+    rows_processed: int
+    rows_failed: int
+    progress_percent: float
+    rows_per_second: float
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+
+class ReclassifyJob(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    status: str
+    taxonomy_version: Optional[int] = None
+    total_rows: int
+    rows_processed: int
+    rows_changed: int
+    last_transaction_id: int
+    progress_percent: float
+    rows_per_second: float
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+
+# Category Rule Schemas
+class CategoryRuleBase(BaseModel):
+    name: Optional[str] = None
+    description_pattern: Optional[str] = None  # Regex, case-insensitive
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    account_id: Optional[int] = None
+    category_name: str
+    priority: int = 100
+
+
+class CategoryRuleCreate(CategoryRuleBase):
+    pass
+
+
+class CategoryRuleUpdate(BaseModel):
+    name: Optional[str] = None
+    description_pattern: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    account_id: Optional[int] = None
+    category_name: Optional[str] = None
+    priority: Optional[int] = None
+    is_active: Optional[bool] = None
+
+
+class CategoryRule(CategoryRuleBase):
+    id: int
+    user_id: int
+    is_active: bool
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class RuleApplyResult(BaseModel):
+    transactions_updated: int
+
+
 # Budget Schemas
 class BudgetBase(BaseModel):
     category_name: str
@@ -110,7 +218,7 @@ class BudgetUpdate(BaseModel):
 class Budget(BudgetBase):
     id: int
     user_id: int
-    category_id: int
+    category_id: Optional[int]
     spent: float
     created_at: datetime
     
@@ -118,6 +226,16 @@ class Budget(BudgetBase):
         from_attributes = True
 
 
+class BudgetStatus(BaseModel):
+    budget_id: int
+    category_name: str
+    month: str
+    allocated: float
+    spent: float
+    remaining: float
+    percent_used: float
+
+
 # Goal Schemas
 class GoalBase(BaseModel):
     name: str
@@ -176,10 +294,24 @@ class MonthlyAnalytics(BaseModel):
     remaining: float
     spending_percent: float
     spending_by_category: List[SpendingByCategory]
-    budget_status: Dict[str, float]
+    budget_status: Dict[str, Dict[str, float]]
     insights: List[str]
 
 
+class TrendSeries(BaseModel):
+    values: List[float]
+    month_over_month: List[Optional[float]]
+    moving_average: List[float]
+
+
+class TrendAnalytics(BaseModel):
+    months: List[str]
+    window: int  # Moving average window in months
+    income: TrendSeries
+    spend: TrendSeries
+    categories: Dict[str, List[float]]  # Spend per category, aligned with months
+
+
 class BudgetAdvice(BaseModel):
     rule: str
     description: str
@@ -195,3 +327,24 @@ class ClassificationResult(BaseModel):
     emoji: str
     color: str
     confidence: float
+
+
+class ClassificationItem(BaseModel):
+    description: str = Field(..., max_length=500)
+    amount: float = 0.0
+
+
+class ClassificationBatchRequest(BaseModel):
+    items: List[ClassificationItem] = Field(..., min_length=1, max_length=10000)
+
+
+class ClassificationBatchResponse(BaseModel):
+    results: List[ClassificationResult]  # Same order as the request items
+
+
+class ClassificationQueueStatus(BaseModel):
+    mode: str  # "inline" or "deferred"
+    pending: int  # This user's transactions still awaiting classification
+    pending_transaction_ids: List[int]  # Oldest first, at most 100
+    oldest_pending_seconds: Optional[float] = None
+    queue_depth: int  # All users, this worker
@@ -3,10 +3,11 @@ Hugging Face Chatbot API endpoint
 Uses Hugging Face Inference API for free budget advice
 """
 
-import httpx
 import os
 from fastapi import APIRouter, HTTPException
 
+from chat_client import chat_upstream
+
 router = APIRouter()
 
 HF_API_TOKEN = os.getenv("HUGGINGFACE_API_KEY", "")
@@ -53,25 +54,24 @@ async def get_hf_response(user_message: str) -> str:
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                HF_API_URL,
-                json=payload,
-                headers=headers,
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    text = result[0].get("generated_text", "")
-                    # Extract only the assistant's response
-                    if "Assistant:" in text:
-                        return text.split("Assistant:")[-1].strip()
-                    return text.strip()
-                return "I couldn't generate a response. Please try again."
-            else:
-                return f"API Error: {response.status_code}. Make sure your HF API key is valid."
+        response = await chat_upstream.post(
+            HF_API_URL,
+            json=payload,
+            headers=headers,
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            if isinstance(result, list) and len(result) > 0:
+                text = result[0].get("generated_text", "")
+                # Extract only the assistant's response
+                if "Assistant:" in text:
+                    return text.split("Assistant:")[-1].strip()
+                return text.strip()
+            return "I couldn't generate a response. Please try again."
+        else:
+            return f"API Error: {response.status_code}. Make sure your HF API key is valid."
     
     except Exception as e:
         return f"Error connecting to chatbot: {str(e)}"
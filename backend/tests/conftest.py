@@ -0,0 +1,59 @@
+"""
+Shared setup for the backend tests
+Points the app at a throwaway SQLite file (never ./finora.db), a scratch
+import directory and a copy of taxonomy.json before any backend module is
+imported, with the remote classifier and chat model switched off.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+_SCRATCH = tempfile.mkdtemp(prefix="finora-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_SCRATCH, 'test.db')}"
+os.environ["FINORA_IMPORT_DIR"] = os.path.join(_SCRATCH, "imports")
+os.environ["FINORA_CLASSIFIER_CACHE_PATH"] = ""
+# A copy the tests can edit; polled on every call
+os.environ["FINORA_TAXONOMY_PATH"] = shutil.copy(os.path.join(BACKEND_DIR, "taxonomy.json"), _SCRATCH)
+os.environ["FINORA_TAXONOMY_POLL_SECONDS"] = "0"
+for name in ("HUGGINGFACE_API_KEY", "HF_CLASSIFIER_URL", "FINORA_CLASSIFICATION_MODE"):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def account(client):
+    """(user_id, account_id) for a fresh user with one checking account"""
+    user_id = client.post("/users", json={
+        "username": f"user{os.urandom(4).hex()}", "email": f"{os.urandom(4).hex()}@example.com"
+    }).json()["id"]
+    account_id = client.post(f"/users/{user_id}/accounts", json={
+        "name": "Current", "account_type": "checking", "balance": 0
+    }).json()["id"]
+    return user_id, account_id
+
+
+@pytest.fixture
+def mock_server():
+    """benchmarks/mock_hf_server.py on a free port"""
+    from mock_hf_server import start_mock_server
+
+    server = start_mock_server(latency_ms=20, per_item_ms=0)
+    yield server
+    server.shutdown()
@@ -0,0 +1,54 @@
+"""Monthly analytics cache and ETags"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from classifier import taxonomy_store
+
+
+@pytest.fixture
+def edit_taxonomy():
+    """Write a new taxonomy version; the original categories come back (one version up) afterwards"""
+    path = os.environ["FINORA_TAXONOMY_PATH"]
+    with open(path) as f:
+        original = json.load(f)
+
+    def edit(change):
+        with open(path) as f:
+            taxonomy = json.load(f)
+        change(taxonomy)
+        taxonomy["version"] += 1
+        with open(path, "w") as f:
+            json.dump(taxonomy, f)
+
+    yield edit
+    edit(lambda taxonomy: taxonomy.update(categories=original["categories"]))
+    taxonomy_store.reload()
+
+
+def test_new_taxonomy_invalidates_cached_analytics(client, account, edit_taxonomy):
+    user_id, account_id = account
+    client.post(f"/transactions?user_id={user_id}", json={
+        "account_id": account_id, "amount": 42.0, "description": "TESCO SUPERMARKET",
+        "category_name": "", "transaction_type": "expense"
+    })
+    url = f"/users/{user_id}/analytics/monthly?month={datetime.utcnow():%Y-%m}"
+
+    first = client.get(url)
+    etag = first.headers["etag"]
+    category = first.json()["spending_by_category"][0]["category"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    def recolor(taxonomy):
+        taxonomy["categories"][category].update(emoji="🧪", color="#123456")
+
+    edit_taxonomy(recolor)
+    second = client.get(url, headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+    assert second.json()["spending_by_category"][0] == {
+        **first.json()["spending_by_category"][0], "emoji": "🧪", "color": "#123456"
+    }
@@ -0,0 +1,23 @@
+"""Pooled upstream client for the chatbot"""
+
+import asyncio
+
+from chat_client import UpstreamClient
+
+
+def test_new_event_loop_closes_the_previous_client(mock_server):
+    upstream = UpstreamClient()
+
+    async def ask():
+        response = await upstream.post(mock_server.url, json={"inputs": "hello"})
+        response.raise_for_status()
+
+    asyncio.run(ask())
+    first = upstream.client
+    asyncio.run(ask())
+    assert first.is_closed
+    assert not upstream.client.is_closed
+    assert upstream.stats_counters["clients_created"] == 2
+
+    asyncio.run(upstream.close())
+    assert upstream.client is None
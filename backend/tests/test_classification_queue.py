@@ -0,0 +1,92 @@
+"""Deferred classification worker"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from classification_queue import ClassificationWorker, classification_worker
+from models import SessionLocal, Transaction
+from reclassify import create_job, run_reclassify
+
+
+@pytest.fixture
+def app_loop():
+    """An event loop running in a thread, standing in for the app's"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def add_transaction(account, description, category_name, status):
+    user_id, account_id = account
+    db = SessionLocal()
+    try:
+        row = Transaction(
+            user_id=user_id, account_id=account_id, amount=12.5, description=description,
+            category_name=category_name, transaction_type="expense", date=datetime.utcnow(),
+            classification_status=status
+        )
+        db.add(row)
+        db.commit()
+        return row.id
+    finally:
+        db.close()
+
+
+def stored(transaction_id):
+    db = SessionLocal()
+    try:
+        row = db.get(Transaction, transaction_id)
+        return row.category_name, row.classification_status
+    finally:
+        db.close()
+
+
+def test_enqueue_does_not_start_a_worker():
+    worker = ClassificationWorker()
+    assert worker.enqueue(1) is False
+    assert worker.queue.qsize() == 0 and not worker.is_running()
+
+
+def test_inline_mode_starts_no_worker(client, account):
+    user_id, account_id = account
+    response = client.post(f"/transactions?user_id={user_id}", json={
+        "account_id": account_id, "amount": 3.0, "description": "COSTA COFFEE", "category_name": "",
+        "transaction_type": "expense"
+    })
+    assert response.status_code == 200
+    assert not classification_worker.is_running()
+    assert stored(response.json()["id"])[1] is None
+
+
+def test_worker_refines_on_the_app_loop(client, account, app_loop):
+    transaction_id = add_transaction(account, "SAINSBURYS SUPERMARKET", "Shopping", "pending")
+    worker = ClassificationWorker()
+    worker.start(app_loop)
+    try:
+        deadline = time.monotonic() + 5
+        while stored(transaction_id)[1] == "pending" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert stored(transaction_id) == ("Groceries", "refined")
+        assert worker.enqueue(transaction_id) is True
+    finally:
+        worker.stop()
+    assert not worker.is_running() and worker.enqueue(transaction_id) is False
+
+
+def test_reclassify_without_a_worker_leaves_refined_rows(client, account):
+    transaction_id = add_transaction(account, "SAINSBURYS SUPERMARKET", "Dining", "refined")
+    db = SessionLocal()
+    try:
+        job_id = create_job(db, account[0]).id
+    finally:
+        db.close()
+    run_reclassify(job_id)
+    assert stored(transaction_id) == ("Dining", "refined")
@@ -0,0 +1,57 @@
+"""Keyword classification parity with the original per-keyword loop"""
+
+import random
+
+import pytest
+
+from classifier import classify_batch, classify_transaction, get_taxonomy
+
+
+def legacy_classify(description: str):
+    """The original nested loop from classify_transaction"""
+    taxonomy = get_taxonomy()
+    description_lower = description.lower()
+    max_matches = 0
+    best_category = taxonomy.default
+    for category, info in taxonomy.info.items():
+        matches = sum(1 for keyword in info["keywords"] if keyword in description_lower)
+        if matches > max_matches:
+            max_matches = matches
+            best_category = category
+    return best_category, min(0.95, 0.5 + (max_matches * 0.15))
+
+
+def outcome(result):
+    return result["category"], result["confidence"]
+
+
+MULTI_SPACE = [
+    "Gas  STATION", "SHELL GAS\tSTATION 42", "trader  joe's", "WHOLE\nFOODS MARKET", " gas  bill ",
+    "gas station", "Trader Joe  7", "whole foods   ", "COSTA  COFFEE 1234",
+]
+
+
+@pytest.mark.parametrize("description", MULTI_SPACE)
+def test_multi_space_matches_legacy(description):
+    assert outcome(classify_transaction(description)) == legacy_classify(description)
+
+
+def test_cached_spacing_variants_keep_their_own_results():
+    # The single-spaced form is cached first; the variants must not reuse its entry
+    descriptions = ["gas station", "gas  station", "GAS\tSTATION", "trader joe", "trader  joe"]
+    results = classify_batch(descriptions) + classify_batch(descriptions[::-1])[::-1]
+    assert [outcome(r) for r in results] == [legacy_classify(d) for d in descriptions * 2]
+
+
+def test_random_descriptions_match_legacy():
+    rng = random.Random(11)
+    keywords = [k for info in get_taxonomy().info.values() for k in info["keywords"]]
+    separators = [" ", "  ", "\t", " \n ", "", "-", "3"]
+    descriptions = [
+        "".join(rng.choice(separators) + rng.choice(keywords).upper() for _ in range(rng.randint(1, 4)))
+        + rng.choice(["", " 1234", " #12", "  ltd"])
+        for _ in range(5000)
+    ]
+    expected = [legacy_classify(d) for d in descriptions]
+    assert [outcome(r) for r in classify_batch(descriptions)] == expected
+    assert [outcome(classify_transaction(d)) for d in descriptions] == expected
@@ -0,0 +1,83 @@
+"""Chat sessions evicted to the disk tier come back without blocking the event loop"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from chatbot_enhanced import FinoraChat
+from conversation_store import ConversationStore, SessionDisk
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(max_messages=20, idle_ttl=3600, max_bytes=4096, path=str(tmp_path / "sessions.db"))
+    yield store
+    store.close()
+
+
+def evict(store, user_id):
+    """Push user_id out of memory with other users' sessions and wait for the flusher"""
+    filler = 0
+    while user_id in store._sessions:
+        store.append(f"filler-{filler}", ("user", "x" * 500))
+        filler += 1
+    deadline = time.monotonic() + 5
+    while store.stats()["pending_writes"]:
+        assert time.monotonic() < deadline, "flusher didn't catch up"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Threads SessionDisk.load ran on"""
+    threads = []
+    load = SessionDisk.load
+
+    def recording_load(disk, user_id):
+        threads.append(threading.current_thread())
+        return load(disk, user_id)
+
+    monkeypatch.setattr(SessionDisk, "load", recording_load)
+    return threads
+
+
+def test_restore_reads_the_disk_in_a_worker_thread(store, loads):
+    store.append("a", ("user", "hello"), ("assistant", "hi there"))
+    evict(store, "a")
+    loads.clear()  # The fillers were read inline
+
+    asyncio.run(store.restore("a"))
+    assert loads and all(thread is not threading.main_thread() for thread in loads)
+    loads.clear()
+    assert [message["content"] for message in store.history("a")] == ["hello", "hi there"]
+    assert loads == []  # Already in memory
+    assert store.stats()["disk_loads"] == 1
+
+
+def test_chat_handler_restores_before_touching_the_session(store, loads):
+    chat = FinoraChat(sessions=store)
+    store.append("a", ("user", "earlier question"), ("assistant", "earlier answer"))
+    evict(store, "a")
+    loads.clear()  # The fillers were read inline
+
+    asyncio.run(chat.get_response("a", "how do I budget?"))
+    assert loads and all(thread is not threading.main_thread() for thread in loads)
+    assert [message["content"] for message in store.history("a")][:2] == ["earlier question", "earlier answer"]
+
+
+def test_clear_during_restore_is_not_undone(store, monkeypatch):
+    store.append("a", ("user", "forget me"))
+    evict(store, "a")
+
+    read = store._read_in_thread
+
+    def slow_read(user_id):
+        stored = read(user_id)
+        store.clear("a")  # Lands while the read is in flight
+        return stored
+
+    monkeypatch.setattr(store, "_read_in_thread", slow_read)
+    asyncio.run(store.restore("a"))
+    assert store.history("a") == []
@@ -0,0 +1,56 @@
+"""Pooled client and batch task handling in hf_classifier"""
+
+import asyncio
+import gc
+import time
+
+from hf_classifier import HFBatchClassifier
+
+
+def test_new_event_loop_closes_the_previous_client(mock_server):
+    classifier = HFBatchClassifier(mock_server.url)
+    asyncio.run(classifier.classify("TESCO STORES 1234"))
+    first = classifier.client
+
+    asyncio.run(classifier.classify("UBER TRIP 5678"))
+    assert first.is_closed
+    assert classifier.client is not first and not classifier.client.is_closed
+    asyncio.run(classifier.close())
+
+
+def test_in_flight_batches_survive_garbage_collection(mock_server):
+    mock_server.latency_ms = 200
+    classifier = HFBatchClassifier(mock_server.url)
+
+    async def run():
+        await classifier.start()
+        calls = [asyncio.ensure_future(classifier.classify(f"merchant {i}")) for i in range(5)]
+        await asyncio.sleep(0.05)
+        assert len(classifier._batches) == 1
+        gc.collect()
+        results = await asyncio.gather(*calls)
+        assert classifier._batches == set()
+        await classifier.close()
+        return results
+
+    assert all(result is not None for result in asyncio.run(run()))
+    assert classifier.stats_counters["remote_results"] == 5
+    assert classifier.stats_counters["fallbacks"] == 0
+
+
+def test_close_releases_callers_waiting_on_a_batch(mock_server):
+    mock_server.latency_ms = 2000
+    classifier = HFBatchClassifier(mock_server.url)
+
+    async def run():
+        await classifier.start()
+        call = asyncio.ensure_future(classifier.classify("NETFLIX.COM"))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await classifier.close()
+        result = await call
+        return result, time.perf_counter() - start
+
+    result, waited = asyncio.run(run())
+    assert result["category"] and waited < 1.0
+    assert classifier.stats_counters["fallbacks"] == 1
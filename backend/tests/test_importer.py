@@ -0,0 +1,44 @@
+"""Statement uploads (POST /users/{user_id}/imports)"""
+
+import os
+
+import main
+
+ROW = b"2025-01-02,TESCO STORES 1234,-5.00\n"
+
+
+def statement(size: int) -> bytes:
+    """A CSV with one transaction, padded with blank lines to `size` bytes"""
+    body = b"date,description,amount\n" + ROW
+    return body + b"\n" * (size - len(body))
+
+
+def chunks(body: bytes, chunk_size: int = 1024 * 1024):
+    """Yield body in pieces, so the upload is chunked with no Content-Length"""
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+def upload(client, account, body, **params):
+    user_id, account_id = account
+    return client.post(
+        f"/users/{user_id}/imports", params={"account_id": account_id, "filename": "statement.csv", **params},
+        content=body
+    )
+
+
+def test_no_size_limit_by_default(client, account):
+    assert main.MAX_IMPORT_BYTES == 0
+    size = 60 * 1024 * 1024  # Over the old 50 MB default
+    response = upload(client, account, chunks(statement(size)))
+    assert response.status_code == 200, response.text
+    assert response.json()["total_bytes"] == size
+    assert response.json()["rows_processed"] == 1
+
+
+def test_limit_rejects_larger_uploads(client, account, monkeypatch):
+    monkeypatch.setattr(main, "MAX_IMPORT_BYTES", 4096)
+    assert upload(client, account, statement(4096)).status_code == 200
+    assert upload(client, account, statement(4097)).status_code == 413
+    assert upload(client, account, chunks(statement(8192), 1024)).status_code == 413
+    assert os.listdir(main.IMPORT_DIR) == []